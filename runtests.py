@@ -9,8 +9,18 @@ from tests.rule_engine.normalisation_rule import *
 from tests.rule_engine.normalisation_rule_block import *
 from tests.rule_engine.normalisation_rule_engine import *
 from tests.rule_engine.normalisation_functions import *
+from tests.rule_engine.deliminate_numbers import *
+from tests.rule_engine.triggers import *
+from tests.rule_engine.rule_cache import *
+from tests.rule_engine.timex_context import *
+from tests.rule_engine.rule_compiler import *
+from tests.rule_engine.condition_order import *
+from tests.rule_engine.compiled_patterns import *
+from tests.rule_engine.verb_table import *
 
 from tests.formats.xml_doc import *
+from tests.formats.xml_text import *
+from tests.formats.reconcile import *
 from tests.formats.timex2 import *
 from tests.formats.timex3 import *
 from tests.formats.timeml import *
@@ -19,6 +29,8 @@ from tests.formats.tempeval2 import *
 from tests.formats.gate import *
 
 from tests.timex import *
+from tests.sentence import *
+from tests.imports import *
 
 def main():
     unittest.main()
@@ -2,17 +2,24 @@ import os.path
 
 VERSION = '1.1dev'
 
+# If this is set, the NLTK is never imported, so documents must already be
+# split into sentences and tokens, and part-of-speech tagged
 no_NLTK = False
 
+# Where the default rules are cached once loaded, so later processes can start
+# up quicker. Caching is off (None) unless this is set, or the TERNIP_RULE_CACHE
+# environment variable names a directory.
+rule_cache_dir = os.environ.get('TERNIP_RULE_CACHE') or None
+
 
 def recogniser():
     """
     Returns the default recogniser, already configured.
     """
     from ternip.rule_engine.recognition_rule_engine import RecognitionRuleEngine
-    r = RecognitionRuleEngine()
-    r.load_rules(os.path.join(os.path.split(__file__)[0], 'rules', 'recognition'))
-    return r
+    from ternip.rule_engine.rule_cache import shared_engine
+    return shared_engine(RecognitionRuleEngine, os.path.join(os.path.split(__file__)[0], 'rules', 'recognition'),
+        rule_cache_dir)
 
 
 def normaliser():
@@ -20,6 +27,6 @@ def normaliser():
     Returns default normaliser, already configured.
     """
     from ternip.rule_engine.normalisation_rule_engine import NormalisationRuleEngine
-    n = NormalisationRuleEngine()
-    n.load_rules(os.path.join(os.path.split(__file__)[0], 'rules', 'normalisation'))
-    return n
+    from ternip.rule_engine.rule_cache import shared_engine
+    return shared_engine(NormalisationRuleEngine, os.path.join(os.path.split(__file__)[0], 'rules', 'normalisation'),
+        rule_cache_dir)
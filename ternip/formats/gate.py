@@ -1,4 +1,4 @@
-import copy
+from ternip.sentence import Sentence, copy_sents
 from ternip.timex import add_timex_ids
 
 
@@ -21,12 +21,12 @@ class GateDocument(object):
             if dct is None:
                 dct = parts[3]
             if parts[2] == 'I':
-                sent.append((parts[0], parts[1], set()))
+                sent.append((parts[0], parts[1]))
             else:
                 if len(sent) > 0:
-                    sents.append(sent)
-                sent = [(parts[0], parts[1], set())]
-        sents.append(sent)
+                    sents.append(Sentence.from_words(sent))
+                sent = [(parts[0], parts[1])]
+        sents.append(Sentence.from_words(sent))
 
         self._sents = sents
         self._dct = dct
@@ -36,7 +36,7 @@ class GateDocument(object):
         Returns a representation of this document in the
         [[(word, pos, timexes), ...], ...] format.
         """
-        return copy.deepcopy(self._sents)
+        return copy_sents(self._sents)
 
     def get_dct_sents(self):
         """
@@ -61,7 +61,7 @@ class GateDocument(object):
                 for t in ts:
                     all_ts.add(t)
         add_timex_ids(all_ts)
-        self._sents = copy.deepcopy(sents)
+        self._sents = copy_sents(sents)
 
     def _get_attrs(self, timex):
         attrs = []
@@ -0,0 +1,49 @@
+import importlib
+
+import ternip
+
+# NLTK takes a long time to import, and documents which are already
+# tokenised and part-of-speech tagged never need it, so it is only imported
+# when a document actually needs tokenising or tagging
+
+
+def sent_tokenize(text):
+    """
+    Split text into sentences using the NLTK
+    """
+    return _import('nltk.tokenize').sent_tokenize(text)
+
+
+def word_tokenize(sent):
+    """
+    Split a sentence into tokens using the NLTK
+    """
+    return _import('nltk.tokenize').word_tokenize(sent)
+
+
+def pos_tag(toks):
+    """
+    Part-of-speech tag a list of tokens using the NLTK
+    """
+    return _import('nltk.tag').pos_tag(toks)
+
+
+def _import(name):
+    """
+    Import an NLTK module, unless ternip.no_NLTK is set
+    """
+    if ternip.no_NLTK:
+        raise NLTKDisabledError(name)
+    return importlib.import_module(name)
+
+
+class NLTKDisabledError(Exception):
+    """
+    Error for when a document needs the NLTK, but ternip.no_NLTK is set
+    """
+
+    def __init__(self, module):
+        self._module = module
+
+    def __str__(self):
+        return 'The NLTK (' + self._module + ') is needed to tokenise or tag this document, but ternip.no_NLTK is set'
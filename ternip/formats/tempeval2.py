@@ -1,10 +1,9 @@
 #!/usr/bin/env python
 
 from collections import defaultdict
-import copy
-
-import nltk.tag
 
+from ternip.formats import nltk_support
+from ternip.sentence import Sentence, copy_sents
 from ternip.timex import add_timex_ids
 
 
@@ -72,7 +71,7 @@ class TempEval2Document(object):
 
                 tok_sents[i].insert(j, parts[3])
 
-        self._sents = [[(tok, pos, set()) for (tok, pos) in nltk.tag.pos_tag(tok_sent)] for tok_sent in tok_sents]
+        self._sents = [Sentence.from_words(nltk_support.pos_tag(tok_sent)) for tok_sent in tok_sents]
         self.dct = dct
 
     def get_sents(self):
@@ -80,7 +79,7 @@ class TempEval2Document(object):
         Returns a representation of this document in the
         [[(word, pos, timexes), ...], ...] format.
         """
-        return copy.deepcopy(self._sents)
+        return copy_sents(self._sents)
 
     def get_dct_sents(self):
         """
@@ -98,7 +97,7 @@ class TempEval2Document(object):
         """
         Update this document with the newly annotated tokens.
         """
-        self._sents = copy.deepcopy(sents)
+        self._sents = copy_sents(sents)
 
     def _get_timex_line(self, i, j, timex):
         return self.docid + "\t" + str(i) + "\t" + str(j) + "\ttimex3\tt" + str(timex.id) + "\t1"
@@ -1,9 +1,11 @@
+from bisect import bisect_left
+import heapq
 import xml.dom.minidom
 import logging
 
-import nltk.tag
-import nltk.tokenize
-
+from ternip.formats import nltk_support
+from ternip.formats.xml_text import XmlText
+from ternip.sentence import Sentence
 from ternip.timex import add_timex_ids
 
 LOGGER = logging.getLogger(__name__)
@@ -130,46 +132,39 @@ class XmlDocument(object):
         self._has_S = has_S
         self._has_LEX = has_LEX
         self._pos_attr = pos_attr
+        self._xml_text = None
 
     def _strip_tags(self, doc, tagname, node):
         """
-        Recursively remove a tag from this node
-        """
-
-        # Recursive step - depth-first search
-        for child in list(node.childNodes):
-            # Get the list of nodes which replace this one (if any)
-            rep = self._strip_tags(doc, tagname, child)
-
-            if len(rep) == 1:
-                # If it's a single node that's taking the place of this one (e.g.,
-                # if there was no change, or a timex tag that only had some text
-                # inside it), but only if the node's changed
-                if rep[0] is not child:
-                    node.replaceChild(rep[0], child)
-                    node.normalize()
-            else:
-                # There were multiple child nodes, need to insert all of them
-                # where in the same location, in order, where their parent
-                # node was. Unfortunately replaceChild can't do replacement
-                # of a node with multiple nodes.
-                before = child.nextSibling
-                node.removeChild(child)
-                for new_node in rep:
-                    node.insertBefore(new_node, before)
-                node.normalize()
-
-        # Base step
-        if node.nodeType == node.ELEMENT_NODE and node.tagName == tagname:
-            return [child for child in node.childNodes]
-        else:
-            return [node]
+        Remove a tag from this node, putting the children of each of those
+        elements in its place. The children of each node which loses one of the
+        elements are replaced in one go, and it is then normalised once.
+        """
+        elements = self._get_elements(tagname, node)
+        stripped = set(elements)
+
+        # The nodes which lose children, other than those being stripped
+        parents = []
+        seen = set()
+        for element in elements:
+            parent = element.parentNode
+            if parent not in stripped and parent not in seen:
+                parents.append(parent)
+                seen.add(parent)
+
+        children = [_unwrap(parent.childNodes, stripped) for parent in parents]
+        for element in elements:
+            _clear_children(element)
+        for (parent, new_children) in zip(parents, children):
+            _set_children(parent, new_children)
+            parent.normalize()
 
     def strip_tag(self, tagname):
         """
         Remove this tag from the document.
         """
         self._strip_tags(self._xml_doc, tagname, self._xml_body)
+        self._tags_changed()
 
     def strip_timexes(self):
         """
@@ -178,38 +173,38 @@ class XmlDocument(object):
         the output then.
         """
         self._strip_tags(self._xml_doc, self._timex_tag_name, self._xml_body)
+        self._tags_changed()
 
-    def _get_text_recurse(self, element, until=None):
+    def _body_text(self):
         """
-        Given an element, returns only the text only nodes in it concatenated
-        together, up until the node specified by until is reached.
+        Returns the XmlText of the body of this document, which is only made
+        the first time it's needed
         """
+        if self._xml_text is None or self._xml_text.body is not self._xml_body:
+            self._xml_text = XmlText(self._xml_body)
+        return self._xml_text
 
-        cont = True
-        text = ""
-
-        if element == until:
-            # Check if we need to stop
-            cont = False
-        elif element.nodeType == element.TEXT_NODE:
-            # If it's a text node, add the data, and no more recursion
-            text += element.data
-        else:
-            # depth-first search, recursive step
-            for child in element.childNodes:
-                (cont, t) = self._get_text_recurse(child, until)
-                text += t
-                if not cont:
-                    break
+    def _tags_changed(self):
+        """
+        Tags have been added to or stripped from the body, so the elements in
+        it need to be found again
+        """
+        if self._xml_text is not None:
+            self._xml_text.stale = True
 
-        return (cont, text)
+    def _get_elements(self, tagname, node=None):
+        """
+        Returns the elements called tagname in node, or the body if node is not
+        given
+        """
+        return self._body_text().elements(tagname, node)
 
     def _get_text(self, element, until=None):
         """
         Given an element, returns only the text only nodes in it concatenated
         together, up until the node specified by until is reached.
         """
-        return self._get_text_recurse(element, until)[1]
+        return self._body_text().text_of(element, until)
 
     def _can_align_node_sent(self, node, sent):
         """
@@ -363,163 +358,233 @@ class XmlDocument(object):
     def _add_LEX_tags(self, node, sent, LEX_name):
         """
         Given a node and a sentence, enclose the tokens in that sentence with
-        tags called LEX_name to mark token boundaries.
+        tags called LEX_name to mark token boundaries. Returns the tokens
+        which could not be aligned with the text in node.
+
+        The text nodes are gone through in order, and the tokens are found in
+        each in turn, until the next token can't be found in that text node.
+        Each text node which holds tokens is split up, and then the children of
+        each node holding those text nodes are replaced in one go.
         """
 
-        if len(sent) > 0:
-            # Drill down until we reach a text node, then align tokens so far in
-            # that text node.
-            if node.nodeType == node.TEXT_NODE:
-                tok = sent[0][0]
-                text = self._get_text(node)
-                start = text.find(tok[0])
+        text_nodes = []
+        _find_text_nodes(node, text_nodes)
 
-                # Include any whitespace
+        # The nodes which take the place of each text node with tokens in it
+        pieces = {}
+        j = 0
+        for text_node in text_nodes:
+            text = text_node.data
+            new_nodes = []
+            texti = 0
+            while j < len(sent):
+                (start, length) = _find_token(text, sent[j][0], texti)
                 if start == -1:
                     # Could not align in this node, so continue
-                    return sent
-                elif start > 0:
-                    before = self._xml_doc.createTextNode(text[:start])
-                    node.parentNode.insertBefore(before, node)
+                    break
+
+                # Include any whitespace
+                if start > texti:
+                    new_nodes.append(self._xml_doc.createTextNode(text[texti:start]))
 
                 # Now create the LEX tag
                 lex_tag = self._xml_doc.createElement(LEX_name)
-                lex_tag.appendChild(self._xml_doc.createTextNode(text[start:start + len(tok)]))
-                node.parentNode.insertBefore(lex_tag, node)
-
-                # Replace the text node with the list tail
-                new_text = self._xml_doc.createTextNode(text[start + len(tok):])
-                node.parentNode.replaceChild(new_text, node)
-
-                # Continue adding for the rest of this LEX node
-                sent = sent[1:]
-                return self._add_LEX_tags(new_text, sent, LEX_name)
-
+                lex_tag.appendChild(self._xml_doc.createTextNode(text[start:start + length]))
+                new_nodes.append(lex_tag)
+                texti = start + length
+                j += 1
+
+            if len(new_nodes) > 0:
+                if texti < len(text):
+                    new_nodes.append(self._xml_doc.createTextNode(text[texti:]))
+                pieces[text_node] = new_nodes
+
+        parents = []
+        seen = set()
+        for text_node in text_nodes:
+            if text_node in pieces and text_node.parentNode not in seen:
+                parents.append(text_node.parentNode)
+                seen.add(text_node.parentNode)
+        for parent in parents:
+            children = []
+            for child in parent.childNodes:
+                children.extend(pieces.get(child, [child]))
+            _set_children(parent, children)
+
+        return sent[j:]
+
+    def _add_timexes(self, sent, s_node):
+        """
+        Adds TIMEX tags for the timexes in sent to the node holding it.
+
+        Where the text each TIMEX covers starts and ends is worked out for all
+        of them up front, from the start of the first token of the timex to the
+        end of its last (or, for non-consuming timexes, just where the first
+        token starts). The tags are then spliced in to the document in order of
+        where they start, with timexes nested in others going inside them. Each
+        tag goes in the lowest node holding all of the text it covers, and if
+        it would only cover part of an element, a NestingError is logged and
+        that timex is left out.
+
+        Tokens which can't be found in the text (e.g., where the tokeniser has
+        changed the text of the token) are skipped over, and the TIMEX goes
+        from the first to the last token of the timex which could be found. If
+        none of them could be, an error is logged and that timex is left out.
+        """
+
+        text = self._body_text()
+        (s_start, s_end) = text.span(s_node)
+        s_text = text.text[s_start:s_end]
+
+        # Find where each token is in the text, in the same way as when
+        # aligning tokens anywhere else, leaving None for tokens which can't be
+        # found
+        bounds = []
+        texti = 0
+        for (tok, pos) in sent.words():
+            (offset, length) = _find_token(s_text, tok, texti)
+            if offset == -1:
+                bounds.append(None)
             else:
-                for child in list(node.childNodes):
-                    sent = self._add_LEX_tags(child, sent, LEX_name)
-
-        return sent
-
-    def _get_token_extent(self, node, sent):
-        if node.nodeType == node.TEXT_NODE:
-            i = 0
-            texti = 0
-            text = node.data
-            for (tok, pos, ts) in sent:
-                offset = text.find(tok[0], texti)
-                if offset < 0:
-                    return i
-                else:
-                    i += 1
-                    texti = offset + len(tok)
-        else:
-            i = 0
-            for child in node.childNodes:
-                extent = self._get_token_extent(child, sent)
-                sent = sent[extent:]
-                i += extent
-        return i
-
-    def _add_timex_child(self, timex, sent, node, start, end):
-        i = 0
-        timex_tag = None
-        for child in list(node.childNodes):
-            e = self._get_token_extent(child, sent[i:])
-            if (i + e) >= start and i <= start and e > 0:
-                if child.nodeType == node.TEXT_NODE:
-                    # get length of bit before TIMEX
-                    texti = 0
-                    for (tok, pos, ts) in sent[i:start]:
-                        offset = child.data.find(tok[0], texti)
-                        if offset == -1:
-                            raise TokeniseError('INTERNAL ERROR: Could not align timex start')
-                        texti = offset + len(tok)
-                        # Now whitespace before first token
-                    texti = child.data.find(sent[start][0][0], texti)
-                    if texti == -1:
-                        # The start of the TIMEX isn't in this text node
-                        texti = len(child.data)
-
-                    timex_tag = self._xml_doc.createElement(self._timex_tag_name)
-                    self._annotate_node_from_timex(timex, timex_tag)
-
-                    # Found our split point, so now create two nodes
-                    before_text = self._xml_doc.createTextNode(child.data[:texti])
-                    new_child = self._xml_doc.createTextNode(child.data[texti:])
-                    node.insertBefore(before_text, child)
-                    node.insertBefore(timex_tag, child)
-                    node.replaceChild(new_child, child)
-                    child = new_child
-                    i += self._get_token_extent(before_text, sent[i:])
-                    e = self._get_token_extent(child, sent[i:])
-
-            # This node is completely covered by this TIMEX, so include it
-            # inside the TIMEX, unless the timex is non consuming
-            if (i + e) <= end and i >= start and not timex.non_consuming and (
-            e > 0 or (i > start and (i + e) < end)) and (child.nodeType != node.TEXT_NODE or (i + e) < end):
-                if timex_tag is None:
-                    timex_tag = self._xml_doc.createElement(self._timex_tag_name)
-                    self._annotate_node_from_timex(timex, timex_tag)
-                    node.insertBefore(timex_tag, child)
-                timex_tag.appendChild(child)
-
-            if ((i + e) > end and i < end and not timex.non_consuming) or\
-               ((
-                i + e) == end and i >= start and not timex.non_consuming and e > 0 and child.nodeType == node.TEXT_NODE):
-                # This crosses the end boundary, so if our TIMEX consumes text
-                # then split the node in half (if it's a text node)
-                if child.nodeType == node.TEXT_NODE:
-                    texti = 0
-                    for (tok, pos, ts) in sent[i:end]:
-                        offset = child.data.find(tok[0], texti)
-                        if offset == -1:
-                            raise TokeniseError('INTERNAL ERROR: Could not align timex end ' + tok + ' ' + child.data)
-                        texti = offset + len(tok)
-
-                    # Found our split point, so now create two nodes
-                    new_child = self._xml_doc.createTextNode(child.data[texti:])
-                    timex_tag.appendChild(self._xml_doc.createTextNode(child.data[:texti]))
-                    node.replaceChild(new_child, child)
-
-                else:
-                    raise NestingError('Can not tag TIMEX (' + str(timex) + ') without causing invalid XML nesting')
-
-            i += e
-
-    def _add_timex(self, timex, sent, s_node):
-        # Find start:end indices for this TIMEX
-        start = 0
-        end = 0
-        t_reached = False
-        for (tok, pos, ts) in sent:
-            if timex not in ts and not t_reached:
-                start += 1
-                end += 1
-            if timex in ts:
-                t_reached = True
-                end += 1
-
-        start_extent = 0
-        for child in list(s_node.childNodes):
-            extent = self._get_token_extent(child, sent[start_extent:])
-            end_extent = start_extent + extent
-            if start_extent <= start and end_extent >= end:
-                # This child can completely contain the TIMEX, so recurse on it
-                # unless it's a text node
-                if child.nodeType == child.TEXT_NODE:
-                    self._add_timex_child(timex, sent, s_node, start, end)
-                    break
-                else:
-                    self._add_timex(timex, sent[start_extent:end_extent], child)
-                    break
-            elif start_extent < start and end_extent < end - 1 and end_extent >= start:
-                # This child contains the start of the TIMEX, but can't
-                # completely hold it, which must mean the parent node is the
-                # highest node which contains the TIMEX
-                self._add_timex_child(timex, sent, s_node, start, end)
-                break
-            start_extent = end_extent
+                texti = offset + length
+                bounds.append((s_start + offset, s_start + texti))
+
+        timexes = []
+        for (timex, (start, end)) in sent.spans().items():
+            found = [bound for bound in bounds[start:end] if bound is not None]
+            if len(found) == 0:
+                LOGGER.error('Could not align the tokens of TIMEX (' + str(timex) + ') with the text')
+            elif timex.non_consuming:
+                timexes.append((found[0][0], found[0][0], timex))
+            else:
+                timexes.append((found[0][0], found[-1][1], timex))
+
+        # Timexes are added in order of where they start, with non-consuming
+        # timexes going before others starting at the same place, and longer
+        # timexes before those they hold
+        timexes.sort(key=lambda (start, end, timex): (start, start != end, -end, timex.id))
+
+        # Work out which timexes are nested in which, as those go inside the
+        # TIMEX tags of the timexes holding them
+        roots = []
+        holding = []
+        for (n, (start, end, timex)) in enumerate(timexes):
+            while len(holding) > 0 and not (start < holding[-1][1] and end <= holding[-1][1]):
+                holding.pop()
+            splice = (start, end, timex, [])
+            if len(holding) > 0:
+                holding[-1][3].append((n, splice))
+            else:
+                roots.append((n, splice))
+            holding.append(splice)
+
+        self._splice_timexes(s_node, s_start, roots, [bound[0] for bound in bounds if bound is not None])
+
+    def _splice_timexes(self, node, start, timexes, starts):
+        """
+        Adds TIMEX tags to node, whose text starts at the offset start in the
+        text of the body. timexes is a list of (n, (start, end, timex, nested))
+        in the order they should be added, where start and end are the offsets
+        of the text the TIMEX covers, and nested holds the timexes which go
+        inside this one in the same form. starts is the offset of the start of
+        each token in the sentence.
+        """
+
+        text = self._body_text()
+        tokens_between = lambda i, j: bisect_left(starts, j) - bisect_left(starts, i)
+
+        def goes_inside((child, cstart, cend), tstart, tend):
+            # The TIMEX goes inside an element holding all of it, unless the
+            # element holds exactly the tokens of a TIMEX of more than one
+            # token, after other tokens in this node, in which case the TIMEX
+            # goes around the element
+            return child.nodeType == child.ELEMENT_NODE and cstart <= tstart and tend <= cend and (
+                tokens_between(tstart, tend) <= 1 or tokens_between(cstart, tstart) > 0 or
+                tokens_between(node_start, cstart) == 0)
+
+        # The children of this node, and where the text of each is. They are
+        # taken out of it, and put back along with the TIMEX tags at the end.
+        node_start = start
+        items = []
+        for child in node.childNodes:
+            end = start + text.length(child)
+            items.append((child, start, end))
+            start = end
+        _clear_children(node)
+
+        timexes = list(timexes)
+        children = []
+        k = 0
+        while len(timexes) > 0:
+            (n, (tstart, tend, timex, nested)) = heapq.heappop(timexes)
+
+            # Children before the TIMEX stay where they are
+            while k < len(items) and items[k][2] <= tstart:
+                children.append(items[k][0])
+                k += 1
+
+            if k < len(items) and goes_inside(items[k], tstart, tend):
+                # This goes in the element, along with any others which do
+                (child, cstart, cend) = items[k]
+                inside = [(n, (tstart, tend, timex, nested))]
+                outside = []
+                while len(timexes) > 0 and timexes[0][1][0] < cend:
+                    t = heapq.heappop(timexes)
+                    if goes_inside(items[k], t[1][0], t[1][1]):
+                        inside.append(t)
+                    else:
+                        outside.append(t)
+                for t in outside:
+                    heapq.heappush(timexes, t)
+                self._splice_timexes(child, cstart, inside, starts)
+                continue
+
+            try:
+                # Find the children the TIMEX covers, which can not include
+                # only part of an element
+                m = k
+                while m < len(items) and items[m][1] < tend:
+                    (child, cstart, cend) = items[m]
+                    if child.nodeType != child.TEXT_NODE and (cstart < tstart or cend > tend):
+                        raise NestingError('Can not tag TIMEX (' + str(timex) + ') without causing invalid XML nesting')
+                    m += 1
+            except NestingError as e:
+                LOGGER.exception("Error whilst attempting to add TIMEX")
+
+                # The timexes which would have gone inside this one can still
+                # be added
+                for t in nested:
+                    heapq.heappush(timexes, t)
+                continue
+
+            timex_tag = self._xml_doc.createElement(self._timex_tag_name)
+            self._annotate_node_from_timex(timex, timex_tag)
+
+            # Split text nodes at the ends of the TIMEX
+            covered = []
+            for i in range(k, m):
+                (child, cstart, cend) = items[i]
+                if child.nodeType != child.TEXT_NODE or (tstart <= cstart and cend <= tend):
+                    covered.append(child)
+                    continue
+                if cstart < tstart:
+                    children.append(self._xml_doc.createTextNode(child.data[:tstart - cstart]))
+                if max(cstart, tstart) < min(cend, tend):
+                    covered.append(self._xml_doc.createTextNode(child.data[max(cstart, tstart) - cstart:tend - cstart]))
+                if cend > tend:
+                    # What's left can hold more TIMEXes
+                    m -= 1
+                    items[m] = (self._xml_doc.createTextNode(child.data[tend - cstart:]), tend, cend)
+
+            _set_children(timex_tag, covered)
+            children.append(timex_tag)
+            k = m
+
+            if len(nested) > 0:
+                self._splice_timexes(timex_tag, tstart, nested, starts)
+
+        children.extend(child for (child, cstart, cend) in items[k:])
+        _set_children(node, children)
 
     def reconcile(self, sents, add_S=False, add_LEX=False, pos_attr=False):
         """
@@ -564,19 +629,19 @@ class XmlDocument(object):
 
             # Update what we consider to be our S tags
             self._has_S = add_S
+            self._tags_changed()
 
         # Now, get a list of the S nodes, which are used to reconcile individual
         # tokens
         if self._has_S:
-            s_nodes = self._xml_body.getElementsByTagName(self._has_S)
+            s_nodes = self._get_elements(self._has_S)
         else:
             # There are no S tokens in the text. So, going forward, only
             # consider there being one sentence, which belongs to the root node
             s_nodes = [self._xml_body]
-            new_sent = []
+            new_sent = Sentence()
             for sent in sents:
-                for part in sent:
-                    new_sent.append(part)
+                new_sent.extend(sent)
             sents = [new_sent]
 
         # Now, add LEX tags if need be
@@ -591,12 +656,13 @@ class XmlDocument(object):
 
             # Update what we consider to be our LEX tags
             self._has_LEX = add_LEX
+            self._tags_changed()
 
         # Now, add the POS attribute
         if pos_attr and self._has_LEX:
             # Get each LEX tag and add the attribute
             for i in range(len(sents)):
-                lex_tags = s_nodes[i].getElementsByTagName(self._has_LEX)
+                lex_tags = self._get_elements(self._has_LEX, s_nodes[i])
                 for j in range(len(sents[i])):
                     # Strip the existing attribute if need be
                     try:
@@ -613,28 +679,22 @@ class XmlDocument(object):
         # Strip old TIMEXes to avoid duplicates
         self.strip_timexes()
 
+        # Timexes are placed by their spans in each sentence
+        sents = [sent if isinstance(sent, Sentence) else Sentence(sent) for sent in sents]
+
         # For XML documents, TIMEXes need unique IDs
         all_ts = set()
         for sent in sents:
-            for (tok, pos, ts) in sent:
-                for t in ts:
-                    all_ts.add(t)
+            all_ts.update(sent.timexes())
         add_timex_ids(all_ts)
 
-        # Now iterate over each sentence
+        # Now add the TIMEXes in each sentence, which are placed by where their
+        # text is in the body
+        self._body_text().refresh()
         for i in range(len(sents)):
-            # Get all timexes in this sentence
-            timexes = set()
-            for (word, pos, ts) in sents[i]:
-                for t in ts:
-                    timexes.add(t)
-
-            # Now, for each timex, add it to the sentence
-            for timex in timexes:
-                try:
-                    self._add_timex(timex, sents[i], s_nodes[i])
-                except NestingError as e:
-                    LOGGER.exception("Error whilst attempting to add TIMEX")
+            self._add_timexes(sents[i], s_nodes[i])
+
+        self._tags_changed()
 
     def _nodes_to_sents(self, node, done_sents, nondone_sents, senti):
         """
@@ -725,13 +785,13 @@ class XmlDocument(object):
         # Is this pre-tokenised into sentences?
         if self._has_S:
             # easy
-            sents = [(self._get_text(sent), sent) for sent in self._xml_body.getElementsByTagName(self._has_S)]
+            sents = [(self._get_text(sent), sent) for sent in self._get_elements(self._has_S)]
         else:
             # Get the text, sentence tokenise it and then assign the content
             # nodes of a sentence to that sentence. This is used for identifying
             # LEX tags, if any, and TIMEX tags, if any, later.
             (nodesents, ndsents, i) = self._nodes_to_sents(self._xml_body, [],
-                [(sent, []) for sent in nltk.tokenize.sent_tokenize(self._get_text(self._xml_body))], 0)
+                [(sent, []) for sent in nltk_support.sent_tokenize(self._get_text(self._xml_body))], 0)
             if len(ndsents) > 0:
                 raise TokeniseError('INTERNAL ERROR: there appears to be sentences not assigned to nodes')
 
@@ -743,7 +803,7 @@ class XmlDocument(object):
                 for node in nodes:
                     # Mark any TIMEX nodes as found before the deep copy
                     if node.nodeType == node.ELEMENT_NODE or node.nodeType == node.DOCUMENT_NODE:
-                        for timex_tag in node.getElementsByTagName(self._timex_tag_name):
+                        for timex_tag in self._get_elements(self._timex_tag_name, node):
                             all_timex_nodes.add(timex_tag)
                     if node.nodeType == node.ELEMENT_NODE:
                         if node.tagName == self._timex_tag_name:
@@ -767,13 +827,13 @@ class XmlDocument(object):
                     elif node.nodeType == node.ELEMENT_NODE or node.nodeType == node.DOCUMENT_NODE:
                         # get any lex tags which are children of this node
                         # and add them
-                        for lex in node.getElementsByTagName(self._has_LEX):
+                        for lex in self._get_elements(self._has_LEX, node):
                             toks.append((self._get_text(lex), lex))
                 tsents.append((toks, s_node))
         else:
             # Don't need to keep nodes this time, so this is easier than
             # sentence tokenisation
-            tsents = [([(tok, None) for tok in nltk.tokenize.word_tokenize(sent)], nodes) for (sent, nodes) in sents]
+            tsents = [([(tok, None) for tok in nltk_support.word_tokenize(sent)], nodes) for (sent, nodes) in sents]
 
         # Right, now POS tag. If POS is an attribute on the LEX tag, then just
         # use that
@@ -782,15 +842,15 @@ class XmlDocument(object):
                       tsents]
         else:
             # use the NLTK
-            psents = [([t for t in nltk.tag.pos_tag([s for (s, a) in sent])], nodes) for (sent, nodes) in tsents]
+            psents = [([t for t in nltk_support.pos_tag([s for (s, a) in sent])], nodes) for (sent, nodes) in tsents]
 
         # Now do timexes - first get all timex tags in a sent
         txsents = []
         for (sent, s_node) in psents:
-            txsent = [(t, pos, set()) for (t, pos) in sent]
+            txsent = Sentence.from_words(sent)
 
             # Get all timexes in this sentence
-            timex_nodes = s_node.getElementsByTagName(self._timex_tag_name)
+            timex_nodes = self._get_elements(self._timex_tag_name, s_node)
 
             # Now, for each timex tag, create a timex object to
             # represent it
@@ -828,7 +888,7 @@ class XmlDocument(object):
 
         # Now get all TIMEX tags which are not inside <s> tags (and assume
         # they're non-consuming)
-        for timex_node in self._xml_body.getElementsByTagName(self._timex_tag_name):
+        for timex_node in self._get_elements(self._timex_tag_name):
             if timex_node not in all_timex_nodes:
                 # Found a TIMEX that has not been seen before
                 all_timex_nodes.add(timex_node)
@@ -872,6 +932,76 @@ class XmlDocument(object):
         pass
 
 
+def _find_token(text, tok, start):
+    """
+    Finds where a token is in text, from start onwards. Tokens are found by
+    their first character, as the tokeniser may have changed the rest (e.g.,
+    splitting "can't" into "ca" and "n't"), apart from the quotes `` and '',
+    which the NLTK tokeniser turns " into. Returns the offset of the token and
+    the length of its text, or (-1, 0) if it can't be found.
+    """
+    offset = text.find(tok[0], start)
+    if tok in _QUOTES:
+        quote = text.find('"', start)
+        if quote != -1 and (offset == -1 or quote < offset):
+            return (quote, 1)
+    if offset == -1:
+        return (-1, 0)
+    else:
+        return (offset, len(tok))
+
+
+# The tokens the NLTK tokeniser turns double quotes into
+_QUOTES = frozenset(['``', "''"])
+
+
+def _clear_children(node):
+    """
+    Takes all the child nodes out of node. They are taken from the front, so
+    each is found straight away, rather than searching the child nodes for it
+    as taking a node out from anywhere else means.
+    """
+    while node.firstChild is not None:
+        node.removeChild(node.firstChild)
+
+
+def _set_children(node, children):
+    """
+    Makes children the child nodes of node, in place of those it has. Any of
+    the children which are in some other node should have been taken out of it
+    with _clear_children first, else appending each one means searching for it
+    in the child nodes of its old parent.
+    """
+    _clear_children(node)
+    for child in children:
+        node.appendChild(child)
+
+
+def _unwrap(nodes, stripped):
+    """
+    Returns the nodes, with the elements in stripped replaced by their
+    children
+    """
+    children = []
+    for node in nodes:
+        if node in stripped:
+            children.extend(_unwrap(node.childNodes, stripped))
+        else:
+            children.append(node)
+    return children
+
+
+def _find_text_nodes(node, text_nodes):
+    """
+    Adds the text nodes in node to text_nodes, in document order
+    """
+    if node.nodeType == node.TEXT_NODE:
+        text_nodes.append(node)
+    else:
+        for child in node.childNodes:
+            _find_text_nodes(child, text_nodes)
+
+
 class TokeniseError(Exception):
     def __init__(self, s):
         self._s = s
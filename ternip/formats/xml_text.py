@@ -0,0 +1,160 @@
+from bisect import bisect_left
+
+
+class XmlText(object):
+    """
+    The text of the body of an XML document, along with where in that text
+    the text of each node starts and ends, and the elements with each tag name,
+    all found in one walk over the body. The text of any node, or of a node up
+    to some node inside it, can then be cut out of the text of the body rather
+    than by walking over the node again.
+
+    Adding tags around text, stripping tags, or splitting and joining text
+    nodes never changes the text itself, so the text of nodes which have been
+    indexed can still be looked up after the document has been changed like
+    that. Nodes created since then aren't indexed, so their text is worked out
+    the slow way, and the elements found with each tag name are out of date,
+    so once the document has changed, mark the index as stale and the elements
+    are found again the next time they are asked for.
+    """
+
+    __slots__ = ('body', 'text', 'stale', '_nodes', '_tags')
+
+    def __init__(self, body):
+        """
+        body is the node holding the body of the document
+        """
+        self.body = body
+        self.stale = False
+        self._index()
+
+    def _index(self):
+        # Each node is given its place in a depth-first walk of the body, which
+        # is used to find out what elements are inside it, and the span of its
+        # text
+        parts = []
+        offset = 0
+        nodes = {}
+        tags = {}
+        order = 0
+        stack = [(self.body, False)]
+        while len(stack) > 0:
+            (node, done) = stack.pop()
+            if done:
+                (start, first) = nodes[node]
+                nodes[node] = (start, offset, first, order)
+            elif node.nodeType == node.TEXT_NODE:
+                nodes[node] = (offset, offset + len(node.data), order, order + 1)
+                parts.append(node.data)
+                offset += len(node.data)
+                order += 1
+            else:
+                nodes[node] = (offset, order)
+                if node.nodeType == node.ELEMENT_NODE and node is not self.body:
+                    tags.setdefault(node.tagName, []).append((order, node))
+                order += 1
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(node.childNodes))
+
+        self.text = ''.join(parts)
+        self._nodes = nodes
+        self._tags = tags
+
+    def text_of(self, node, until=None):
+        """
+        Returns the text of the text nodes in node, concatenated together, up
+        until the node until is reached
+        """
+        if node is until:
+            return ''
+        elif node.nodeType == node.TEXT_NODE:
+            return node.data
+        elif node not in self._nodes:
+            return self._walk_text(node, until)[1]
+
+        (start, end, first, last) = self._nodes[node]
+        if until is not None and self._contains(node, until):
+            if until in self._nodes:
+                end = self._nodes[until][0]
+            else:
+                return self._walk_text(node, until)[1]
+        return self.text[start:end]
+
+    def span(self, node):
+        """
+        Returns the (start, end) offsets of the text of node in the text of the
+        body, or None if node hasn't been indexed
+        """
+        if node in self._nodes:
+            return self._nodes[node][:2]
+        else:
+            return None
+
+    def length(self, node):
+        """
+        Returns the length of the text of node
+        """
+        if node.nodeType == node.TEXT_NODE:
+            return len(node.data)
+        elif node in self._nodes:
+            (start, end, first, last) = self._nodes[node]
+            return end - start
+        else:
+            return len(self._walk_text(node, None)[1])
+
+    def refresh(self):
+        """
+        Indexes the body again, if it has been marked as stale
+        """
+        if self.stale:
+            self._index()
+            self.stale = False
+
+    def elements(self, tagname, node=None):
+        """
+        Returns a list of the elements called tagname inside node (or the whole
+        body if node is not given), in document order, as getElementsByTagName
+        would
+        """
+        if node is None:
+            node = self.body
+        self.refresh()
+        if node not in self._nodes:
+            return node.getElementsByTagName(tagname)
+        (start, end, first, last) = self._nodes[node]
+        elements = self._tags.get(tagname, [])
+        i = bisect_left(elements, (first + 1,))
+        j = bisect_left(elements, (last,))
+        return [element for (order, element) in elements[i:j]]
+
+    @staticmethod
+    def _contains(node, inner):
+        while inner is not None:
+            if inner is node:
+                return True
+            inner = inner.parentNode
+        return False
+
+    def _walk_text(self, element, until):
+        """
+        Works out the text of a node which hasn't been indexed, returning
+        whether until was not reached, and the text
+        """
+        cont = True
+        text = ""
+
+        if element is until:
+            # Check if we need to stop
+            cont = False
+        elif element.nodeType == element.TEXT_NODE:
+            # If it's a text node, add the data, and no more recursion
+            text += element.data
+        else:
+            # depth-first search, recursive step
+            for child in element.childNodes:
+                (cont, t) = self._walk_text(child, until)
+                text += t
+                if not cont:
+                    break
+
+        return (cont, text)
@@ -0,0 +1,71 @@
+class ConditionOrder(object):
+    """
+    Works out the order to check the conditions of a rule in (e.g., its guards
+    and match regex), where the rule only applies if they all hold.
+
+    The order doesn't change whether a rule applies, only how much work it
+    takes to find out, so conditions which are cheap to check and likely to
+    fail go first. Each condition starts off with an estimate of how much it
+    costs to check and how often it fails, and how often it actually fails is
+    then counted as the rule is used, and the order worked out again every so
+    often.
+    """
+
+    # How many conditions are checked between working out the order again
+    _REORDER_EVERY = 100
+
+    # How many checks the estimate of how often a condition fails counts for,
+    # compared to checks which have actually been made
+    _ESTIMATE_WEIGHT = 10
+
+    def __init__(self, conditions):
+        """
+        conditions is a list of (name, cost, failure_rate) tuples, where cost
+        is an estimate of how much work checking the condition is (relative to
+        the other conditions), and failure_rate an estimate of the proportion
+        of checks where the condition does not hold
+        """
+        self._names = [name for (name, cost, failure_rate) in conditions]
+        self._costs = dict((name, cost) for (name, cost, failure_rate) in conditions)
+        self._estimates = dict((name, failure_rate) for (name, cost, failure_rate) in conditions)
+        self._checked = dict((name, 0) for name in self._names)
+        self._failed = dict((name, 0) for name in self._names)
+        self._countdown = self._REORDER_EVERY
+        self.order = self._work_out_order()
+
+    def failure_rate(self, name):
+        """
+        The proportion of checks where the named condition does not hold, as
+        best as it is known
+        """
+        return float(self._failed[name] + self._estimates[name] * self._ESTIMATE_WEIGHT) / \
+               (self._checked[name] + self._ESTIMATE_WEIGHT)
+
+    def record(self, name, passed):
+        """
+        Record the result of checking the named condition
+        """
+        self._checked[name] += 1
+        if not passed:
+            self._failed[name] += 1
+        self._countdown -= 1
+        if self._countdown == 0:
+            self._countdown = self._REORDER_EVERY
+            self.order = self._work_out_order()
+
+    def describe(self):
+        """
+        Returns a list of (name, cost, failure_rate) tuples for the conditions,
+        in the order they are checked in
+        """
+        return [(name, self._costs[name], self.failure_rate(name)) for name in self.order]
+
+    def _work_out_order(self):
+        """
+        Conditions are checked in order of the expected cost of ruling
+        something out with them. Conditions which are as good as each other
+        are checked in the order they were given in.
+        """
+        position = dict((name, i) for (i, name) in enumerate(self._names))
+        return sorted(self._names,
+            key=lambda name: (self._costs[name] / max(self.failure_rate(name), 0.001), position[name]))
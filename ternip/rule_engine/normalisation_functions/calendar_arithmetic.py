@@ -0,0 +1,115 @@
+"""
+Date arithmetic on the proleptic Gregorian calendar, using day ordinals (as
+datetime.date.toordinal, where 1st January 1 AD is day 1) rather than datetime
+objects, so dates before 1900 (which strftime won't format) and outside the
+years datetime supports can be worked with too.
+"""
+
+# The number of days in each month (index 0 is unused), and before each month
+# in a year, in non-leap years
+_DAYS_IN_MONTH = [0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+_DAYS_BEFORE_MONTH = [0, 0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334]
+
+
+def is_leap(y):
+    """
+    Whether y is a leap year
+    """
+    return y % 4 == 0 and (y % 100 != 0 or y % 400 == 0)
+
+
+def days_in_month(y, m):
+    """
+    The number of days in month m of year y
+    """
+    if m == 2 and is_leap(y):
+        return 29
+    else:
+        return _DAYS_IN_MONTH[m]
+
+
+def check_date(y, m, d):
+    """
+    Raises ValueError if d/m/y is not a date
+    """
+    if not 1 <= m <= 12:
+        raise ValueError('month must be in 1..12')
+    if not 1 <= d <= days_in_month(y, m):
+        raise ValueError('day is out of range for month')
+
+
+def check_time(h, min, s):
+    """
+    Raises ValueError if h:min:s is not a time of day
+    """
+    if not 0 <= h <= 23:
+        raise ValueError('hour must be in 0..23')
+    if not 0 <= min <= 59:
+        raise ValueError('minute must be in 0..59')
+    if not 0 <= s <= 59:
+        raise ValueError('second must be in 0..59')
+
+
+def to_ordinal(y, m, d):
+    """
+    The day ordinal of a date
+    """
+    check_date(y, m, d)
+    before = y - 1
+    ordinal = before * 365 + before // 4 - before // 100 + before // 400 + _DAYS_BEFORE_MONTH[m] + d
+    if m > 2 and is_leap(y):
+        ordinal += 1
+    return ordinal
+
+
+def from_ordinal(ordinal):
+    """
+    The date (as a (y, m, d) tuple) of a day ordinal
+    """
+    # Count whole 400, 100, 4 and 1 year cycles since the start of 1 AD (as
+    # the datetime module does)
+    n = ordinal - 1
+    (n400, n) = divmod(n, 146097)
+    (n100, n) = divmod(n, 36524)
+    (n4, n) = divmod(n, 1461)
+    (n1, n) = divmod(n, 365)
+    y = n400 * 400 + n100 * 100 + n4 * 4 + n1 + 1
+
+    # The last day of a 4 or 400 year cycle
+    if n1 == 4 or n100 == 4:
+        return (y - 1, 12, 31)
+
+    # n is now the day of the year, counting from 0
+    leap = n1 == 3 and (n4 != 24 or n100 == 3)
+    m = (n + 50) >> 5
+    before = _DAYS_BEFORE_MONTH[m] + (m > 2 and leap)
+    if before > n:
+        m -= 1
+        before -= _DAYS_IN_MONTH[m] + (m == 2 and leap)
+    return (y, m, n - before + 1)
+
+
+def day_of_week(ordinal):
+    """
+    The day of the week of a day ordinal. Monday is 0.
+    """
+    return (ordinal + 6) % 7
+
+
+def week_of_year(ordinal):
+    """
+    The (y, w) year and week number of a day ordinal, where weeks start on a
+    Monday and days before the first Monday of the year are in week 0 (as %W
+    in strftime)
+    """
+    (y, m, d) = from_ordinal(ordinal)
+    day_of_year = ordinal - to_ordinal(y, 1, 1)
+    return (y, (day_of_year + 7 - day_of_week(ordinal)) // 7)
+
+
+def add_months(y, m, offset):
+    """
+    The (y, m) year and month offset months from month m of year y
+    """
+    (y, m) = divmod(y * 12 + m - 1 + offset, 12)
+    return (y, m + 1)
@@ -1,12 +1,11 @@
 #!/usr/bin/env python
 
-import calendar
-import datetime
-import dateutil.easter
 import re
 
+from ternip.rule_engine.normalisation_functions import calendar_arithmetic
 from ternip.rule_engine.normalisation_functions.string_conversions import *
 from ternip.rule_engine.normalisation_functions.words_to_num import *
+from ternip.rule_engine.normalisation_functions.lru_cache import lru_cache
 from ternip.rule_engine import expressions
 
 
@@ -25,26 +24,29 @@ def normalise_two_digit_year(y):
         return '%04d' % int(y[:4])
 
 
+@lru_cache(256)
 def easter_date(y):
     """
     Return the date of Easter for that year as a string
     """
-    return dateutil.easter.easter(int(y)).strftime('%Y%m%d')
+    import dateutil.easter
+    easter = dateutil.easter.easter(int(y))
+    return '%04d%02d%02d' % (easter.year, easter.month, easter.day)
 
 
 def date_to_week(y, m, d):
     """
     Convert a date into a week number string, with year
     """
-    return datetime.datetime(y, m, d).strftime(r'%YW%W')
+    return '%04dW%02d' % calendar_arithmetic.week_of_year(calendar_arithmetic.to_ordinal(y, m, d))
 
 
 def date_to_dow(y, m, d):
     """
     Gets the integer day of week for a date. Sunday is 0.
     """
-    # Python uses Monday week start, so wrap around
-    w = calendar.weekday(y, m, d) + 1
+    # day_of_week counts from Monday, so wrap around
+    w = calendar_arithmetic.day_of_week(calendar_arithmetic.to_ordinal(y, m, d)) + 1
     if w == 7:
         w = 0
     return w
@@ -72,86 +74,57 @@ def nth_dow_to_day((m, dow, n), y):
     return shift + (7 * n) - 6
 
 
+@lru_cache(1024)
 def date_to_iso(string):
     """
     A translation of GUTime's Date2ISO function. Given some date/time string
     representing an absolute date, then return a date string in the basic ISO
     format.
+
+    The same dates tend to come up again and again in a document, so the
+    conversions of the most recent strings are remembered.
     """
 
     # disregard tokenisation, if it's there, to make this an easier conversion for GUTime
-    string = re.sub(r'<([^~]*)~.+?>', r'\1 ', string)
+    string = _TOKEN.sub(r'\1 ', string)
+    unspaced = _WHITESPACE.sub('', string)
+
+    # Every format we understand has a digit in it somewhere
+    if _DIGIT.search(unspaced) is None:
+        return "XXXXXXXX"
 
     # Defaults
-    d = None
-    m = None
-    y = None
     h = None
     min = None
     s = None
     fs = None
     zone = None
 
+    # Times (and the ACE format) have colons in, so only look for them if
+    # there is one
+    colon = ':' in unspaced
+
     # ACE format
-    match = re.search(r'(\d\d\d\d\d\d\d\d:\d\d\d\d)', re.sub('\s', '', string))
+    match = _ACE.search(unspaced) if colon else None
     if match is not None:
-        d = match.group(1)
-        d = re.sub(r':', r'T', d)
-        return d
+        return match.group(1).replace(':', 'T')
 
     # Already in ISO format
-    match = re.search(r'(\d\d\d\d-?\d\d-?\d\d)(-?(T\d\d(:?\d\d)?(:?\d\d)?([+-]\d{1,4})?))?', re.sub('\s', '', string))
+    match = _ISO.search(unspaced)
     if match is not None:
-        d = match.group(1)
-        d = re.sub(r'-', r'', d)
+        d = match.group(1).replace('-', '')
         h = match.group(3)
         if h is not None:
-            h = re.sub(r':', r'', h)
-            return d + h
+            return d + h.replace(':', '')
         else:
             return d
 
     # some pre-processing
-    match = re.search('T\d\d(:?\d\d)?(:?\d\d)?([+-]\d{1,4})?', re.sub('\s', '', string))
-    if match is not None:
-        return re.sub(r':', r'', re.sub('\s', '', string))
+    if 'T' in unspaced and _ISO_TIME.search(unspaced) is not None:
+        return unspaced.replace(':', '')
 
     # extract date
-    if re.search(
-        r'(\d\d?|' + expressions.ORDINAL_WORDS + r'|' + expressions.ORDINAL_NUMS + r')\s+'
-        r'(' + expressions.MONTHS + r'|' + expressions.MONTH_ABBRS + r'\s*\.?)\s*,?\s+(\d\d(\s|\Z)|\d{4}\b)',
-        string, re.I) is not None:
-        match = re.search(
-            r'(\d\d?|' + expressions.ORDINAL_WORDS + r'|' + expressions.ORDINAL_NUMS + r')\s+'
-            r'(' + expressions.MONTHS + r'|' + expressions.MONTH_ABBRS + r'\s*\.?)\s*,?\s+(\d\d(\s|\Z)|\d{4}\b)',
-            string, re.I)
-        d = ordinal_to_num(match.group(1))
-        m = month_to_num(match.group(5))
-        y = match.group(7)
-
-    elif re.search(
-        r'(' + expressions.MONTHS + r'|' + expressions.MONTH_ABBRS + r'\s*\.?)\s+'
-        r'(\d\d?|' + expressions.ORDINAL_WORDS + r'|' + expressions.ORDINAL_NUMS + r')\b,?\s*(\d\d(\s|\Z)|\d{4}\b)',
-        string, re.I) is not None:
-        match = re.search(
-            r'(' + expressions.MONTHS + r'|' + expressions.MONTH_ABBRS + r'\s*\.?)\s+'
-            r'(\d\d?|' + expressions.ORDINAL_WORDS + r'|' + expressions.ORDINAL_NUMS + r')\b,?\s*(\d\d(\s|\Z)|\d{4}\b)',
-            string, re.I)
-        d = ordinal_to_num(match.group(4))
-        m = month_to_num(match.group(1))
-        y = match.group(7)
-
-    elif re.search(r'(\d\d\d\d)(\/|\-)(\d\d?)\2(\d\d?)', re.sub('\s', '', string)) is not None:
-        match = re.search(r'(\d\d\d\d)(\/|\-)(\d\d?)\2(\d\d?)', re.sub('\s', '', string))
-        m = match.group(3)
-        d = match.group(4)
-        y = match.group(1)
-
-    elif re.search(r'(\d\d?)(\/|\-|\.)(\d\d?)\2(\d\d(\d\d)?)', re.sub('\s', '', string)) is not None:
-        match = re.search(r'(\d\d?)(\/|\-|\.)(\d\d?)\2(\d\d(\d\d)?)', re.sub('\s', '', string))
-        m = match.group(1)
-        d = match.group(3)
-        y = match.group(4)
+    (d, m, y) = _extract_date(string, unspaced)
 
     if y is not None:
         # check for European style date
@@ -169,8 +142,7 @@ def date_to_iso(string):
         iso = "XXXXXXXX"
 
     # Extract time
-    match = re.search(r'(\d?\d):(\d\d)(:(\d\d)(\.\d+)?)?(([AP])\.?M\.?)?(([+\-]\d+|[A-Z][SD]T|GMT([+\-]\d+)?))?',
-        re.sub('\s', '', string), re.I)
+    match = _TIME.search(unspaced) if colon else None
     if match is not None:
         h = match.group(1)
         min = match.group(2)
@@ -183,13 +155,13 @@ def date_to_iso(string):
             h = str(int(h) + 12)
 
         if zone is not None:
-            zm = re.search(r'(GMT)([+\-]\d+)', zone)
+            zm = _GMT_OFFSET.search(zone)
             if zm is not None:
                 zone = zm.group(2)
             elif zone.lower().find('gmt') > -1:
                 zone = 'Z'
-            elif re.search(r'([A-Z])([SD])T', zone) is not None:
-                zm = re.search(r'([A-Z])([SD])T', zone)
+            else:
+                zm = _ZONE.search(zone)
                 # Timezone offsets from GMT
                 timezones = {
                     "R": 1,
@@ -198,7 +170,7 @@ def date_to_iso(string):
                     "M": -7,
                     "P": -8
                 }
-                if zm.group(1).upper() in timezones:
+                if zm is not None and zm.group(1).upper() in timezones:
                     zone = timezones[zm.group(1).upper()]
                     if zm.group(2).lower() == 'd':
                         zone += 1
@@ -206,14 +178,15 @@ def date_to_iso(string):
                         zone = '-%02d00' % (-1 * zone)
                     else:
                         zone = '+%02d00' % zone
-    elif re.search(r'(\d\d)(\d\d)\s+(h(ou)?rs?|(on\s+)?\d\d?\/\d)', string, re.I) is not None:
-        match = re.search(r'(\d\d)(\d\d)\s+(h(ou)?rs?|(on\s+)?\d\d?\/\d)', string, re.I)
-        h = match.group(1)
-        min = match.group(2)
+    else:
+        match = _HOURS.search(string)
+        if match is not None:
+            h = match.group(1)
+            min = match.group(2)
 
     if h is not None:
         if fs is not None:
-            fs = re.sub(r'\.', r'', fs)
+            fs = fs.replace('.', '')
             iso += 'T%02d%02d%02d.%02d' % (int(h), int(min), int(s), int(fs))
         elif s is not None:
             iso += 'T%02d%02d%02d' % (int(h), int(min), int(s))
@@ -226,6 +199,31 @@ def date_to_iso(string):
     return iso
 
 
+def _extract_date(string, unspaced):
+    """
+    Find the day, month and year of a date in the string (as written), which
+    is also given with the white space taken out. Returns (d, m, y), all of
+    which are None if there is no date.
+    """
+    match = _DAY_MONTH_YEAR.search(string)
+    if match is not None:
+        return (ordinal_to_num(match.group(1)), month_to_num(match.group(5)), match.group(7))
+
+    match = _MONTH_DAY_YEAR.search(string)
+    if match is not None:
+        return (ordinal_to_num(match.group(4)), month_to_num(match.group(1)), match.group(7))
+
+    match = _YEAR_MONTH_DAY.search(unspaced)
+    if match is not None:
+        return (match.group(4), match.group(3), match.group(1))
+
+    match = _MONTH_DAY_SHORT_YEAR.search(unspaced)
+    if match is not None:
+        return (match.group(3), match.group(1), match.group(4))
+
+    return (None, None, None)
+
+
 def extract_timezone(string):
     """
     Given some string, try and extract the timezone it refers to. Returns a
@@ -235,9 +233,9 @@ def extract_timezone(string):
     tz = ''
 
     # detokenise if need be
-    string = re.sub(r'<([^~]*)~[^>]*>', r'\1 ', string)
+    string = _TOKEN_WORD.sub(r'\1 ', string)
 
-    match = re.search(r'(\d|\b)([A-Z][SD]T)\b', string)
+    match = _ZONE_ABBR.search(string)
     if match is not None:
         tz = match.group(2)
 
@@ -247,9 +245,10 @@ def extract_timezone(string):
     elif string.lower().find('zulu') > -1:
         tz = 'GMT'
 
-    elif re.search(r'([a-z])[a-z]+\s+([ds])[a-z]+\s+time', string, re.I) is not None:
-        match = re.search(r'([a-z])[a-z]+\s+([ds])[a-z]+\s+time', string, re.I)
-        tz = match.group(1).upper() + match.group(2).upper() + 'T'
+    else:
+        match = _ZONE_NAME.search(string)
+        if match is not None:
+            tz = match.group(1).upper() + match.group(2).upper() + 'T'
 
     return tz
 
@@ -263,3 +262,28 @@ def convert_to_24_hours(time, ap):
         time += 12
 
     return time
+
+
+# The regular expressions used above, compiled once rather than each time they
+# are used, as there are too many across the helpers for re's own cache
+_TOKEN = re.compile(r'<([^~]*)~.+?>')
+_TOKEN_WORD = re.compile(r'<([^~]*)~[^>]*>')
+_WHITESPACE = re.compile(r'\s')
+_DIGIT = re.compile(r'\d')
+_ACE = re.compile(r'(\d\d\d\d\d\d\d\d:\d\d\d\d)')
+_ISO = re.compile(r'(\d\d\d\d-?\d\d-?\d\d)(-?(T\d\d(:?\d\d)?(:?\d\d)?([+-]\d{1,4})?))?')
+_ISO_TIME = re.compile(r'T\d\d(:?\d\d)?(:?\d\d)?([+-]\d{1,4})?')
+_DAY_MONTH_YEAR = re.compile(
+    r'(\d\d?|' + expressions.ORDINAL_WORDS + r'|' + expressions.ORDINAL_NUMS + r')\s+'
+    r'(' + expressions.MONTHS + r'|' + expressions.MONTH_ABBRS + r'\s*\.?)\s*,?\s+(\d\d(\s|\Z)|\d{4}\b)', re.I)
+_MONTH_DAY_YEAR = re.compile(
+    r'(' + expressions.MONTHS + r'|' + expressions.MONTH_ABBRS + r'\s*\.?)\s+'
+    r'(\d\d?|' + expressions.ORDINAL_WORDS + r'|' + expressions.ORDINAL_NUMS + r')\b,?\s*(\d\d(\s|\Z)|\d{4}\b)', re.I)
+_YEAR_MONTH_DAY = re.compile(r'(\d\d\d\d)(\/|\-)(\d\d?)\2(\d\d?)')
+_MONTH_DAY_SHORT_YEAR = re.compile(r'(\d\d?)(\/|\-|\.)(\d\d?)\2(\d\d(\d\d)?)')
+_TIME = re.compile(r'(\d?\d):(\d\d)(:(\d\d)(\.\d+)?)?(([AP])\.?M\.?)?(([+\-]\d+|[A-Z][SD]T|GMT([+\-]\d+)?))?', re.I)
+_GMT_OFFSET = re.compile(r'(GMT)([+\-]\d+)')
+_ZONE = re.compile(r'([A-Z])([SD])T')
+_HOURS = re.compile(r'(\d\d)(\d\d)\s+(h(ou)?rs?|(on\s+)?\d\d?\/\d)', re.I)
+_ZONE_ABBR = re.compile(r'(\d|\b)([A-Z][SD]T)\b')
+_ZONE_NAME = re.compile(r'([a-z])[a-z]+\s+([ds])[a-z]+\s+time', re.I)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+import collections
+import functools
+
+
+def lru_cache(maxsize):
+    """
+    Decorator which remembers the results of the last maxsize distinct calls to
+    a function, as functools.lru_cache does in later versions of Python. The
+    arguments to the function must be hashable, and it must always return the
+    same thing for the same arguments. Calls which raise an exception aren't
+    remembered.
+
+    The decorated function has a cache_clear function for emptying the cache.
+    """
+
+    def decorator(f):
+        cache = collections.OrderedDict()
+
+        @functools.wraps(f)
+        def cached(*args, **kwargs):
+            key = args
+            if kwargs:
+                key += (_KWARGS,) + tuple(sorted(kwargs.items()))
+            try:
+                result = cache.pop(key)
+            except KeyError:
+                result = f(*args, **kwargs)
+                if len(cache) >= maxsize:
+                    cache.popitem(last=False)
+            cache[key] = result
+            return result
+
+        cached.cache_clear = cache.clear
+        return cached
+
+    return decorator
+
+
+# Separates positional from keyword arguments in keys
+_KWARGS = object()
@@ -1,59 +1,47 @@
 #!/usr/bin/env python
 
-import datetime
-import calendar
-
 import re
 
+from ternip.rule_engine.normalisation_functions import calendar_arithmetic
 from ternip.rule_engine.normalisation_functions import string_conversions
 from ternip.rule_engine.normalisation_functions import date_functions
+from ternip.rule_engine.normalisation_functions.lru_cache import lru_cache
+from ternip.rule_engine.normalisation_functions.temporal_value import TemporalValue
 from ternip.rule_engine import expressions
+from ternip.rule_engine.verb_table import VerbTable
 
 
+@lru_cache(4096)
 def offset_from_date(v, offset, gran='D', exact=False):
     """
     Given a date string and some numeric offset, as well as a unit, then compute
     the offset from that value by offset gran's. Gran defaults to D. If exact
     is set to true, then the exact date is figured out, otherwise the level of
-    granuality given by gran is used. Returns a date string.
+    granuality given by gran is used. v can be a string or TemporalValue.
+    Returns a date string.
     """
 
     gran = string_conversions.units_to_gran(gran)
 
     # check for valid refdate
     if len(v) > 0:
-        # Extract date components into a datetime object for manipulation
-        y = int(v[:4])
-        m = int(v[4:6])
-
-        if len(v) >= 8:
-            d = int(v[6:8])
+        # Extract date components
+        value = TemporalValue.of(v)
+        if value.month is None:
+            raise ValueError(repr(str(v)) + ' has no month')
+        y = value.year
+        m = value.month
+        h = value.hour
+        min = value.minute
+        s = value.second
+
+        if value.day is not None:
+            d = value.day
             really_d = True
         else:
             really_d = False
             d = 1
 
-        if len(v) >= 11:
-            h = int(v[9:11])
-        else:
-            h = None
-            dt = datetime.datetime(y, m, d)
-
-        if len(v) >= 13:
-            min = int(v[11:13])
-        else:
-            min = None
-            if h is not None:
-                dt = datetime.datetime(y, m, d, h)
-
-        if len(v) >= 15:
-            s = int(v[13:15])
-            dt = datetime.datetime(y, m, d, h, min, s)
-        else:
-            s = None
-            if min is not None:
-                dt = datetime.datetime(y, m, d, h, min)
-
     elif offset >= 1:
         return 'FUTURE_REF'
 
@@ -61,72 +49,57 @@ def offset_from_date(v, offset, gran='D', exact=False):
         return 'PAST_REF'
 
     else:
-        return v
+        return str(v)
 
     # Do manipulations
-    if gran == 'TM':
-        # minutes
-        dt += datetime.timedelta(minutes=offset)
-        return dt.strftime('%Y%m%dT%H%M')
-
-    elif gran == 'TH':
-        # hours
-        dt += datetime.timedelta(hours=offset)
-        if exact:
-            return dt.strftime('%Y%m%dT%H%M')
-        else:
-            return dt.strftime('%Y%m%dT%H')
-
-    elif gran == 'D':
-        # days
-        dt += datetime.timedelta(days=offset)
-        if exact and min is not None:
-            return dt.strftime('%Y%m%dT%H%M')
-        elif exact and h is not None:
-            return dt.strftime('%Y%m%dT%H')
-        else:
-            return dt.strftime('%Y%m%d')
+    if gran in _GRAN_SECONDS:
+        # minutes, hours, days, weeks and fortnights are a fixed number of
+        # seconds, so count from the start of the calendar in seconds
+        (ordinal, seconds) = divmod(calendar_arithmetic.to_ordinal(y, m, d) * 86400 + (h or 0) * 3600 +
+                                    (min or 0) * 60 + (s or 0) + offset * _GRAN_SECONDS[gran], 86400)
+        ordinal = int(ordinal)
+        date = '%04d%02d%02d' % calendar_arithmetic.from_ordinal(ordinal)
+        hour = '%02d' % (seconds // 3600)
+        minute = '%02d' % (seconds % 3600 // 60)
+
+        if gran == 'TM':
+            return date + 'T' + hour + minute
+
+        elif gran == 'TH':
+            if exact:
+                return date + 'T' + hour + minute
+            else:
+                return date + 'T' + hour
+
+        elif gran == 'D':
+            if exact and min is not None:
+                return date + 'T' + hour + minute
+            elif exact and h is not None:
+                return date + 'T' + hour
+            else:
+                return date
 
-    elif gran == 'W' or gran == 'F':
-        # weeks/fortnights
-        if gran == 'F':
-            offset *= 2
-        dt += datetime.timedelta(weeks=offset)
-        if exact:
-            return dt.strftime('%Y%m%d')
         else:
-            return dt.strftime('%YW%W')
+            if exact:
+                return date
+            else:
+                return '%04dW%02d' % calendar_arithmetic.week_of_year(ordinal)
 
     elif gran == 'M':
-        # months - timedelta rather annoyingly doesn't support months, so we
-        # need to do a bit more work here
-        m += offset
-        if m > 12:
-            y += int(m / 12)
-            m %= 12
-        elif m < 0:
-            y += int(m / 12)
-            m %= 12
-
-        if m == 0:
-            m = 12
-            y -= 1
+        # months
+        (y, m) = calendar_arithmetic.add_months(y, m, offset)
 
         # avoid bad days
-        dt = None
-        while dt is None and d > 0:
-            try:
-                dt = datetime.datetime(y, m, d)
-            except ValueError:
-                d -= 1
+        if d > calendar_arithmetic.days_in_month(y, m):
+            d = calendar_arithmetic.days_in_month(y, m)
 
         if exact:
-            return dt.strftime('%Y%m%d')
+            return "%04d%02d%02d" % (y, m, d)
         else:
-            return dt.strftime('%Y%m')
+            return "%04d%02d" % (y, m)
 
     elif gran == 'Y' or gran == 'E' or gran == 'C':
-        # years/decades/centuries - again, need to do a bit more work
+        # years/decades/centuries
         if gran == 'C':
             offset *= 100
         if gran == 'E':
@@ -134,8 +107,6 @@ def offset_from_date(v, offset, gran='D', exact=False):
 
         y += offset
 
-        # Python doesn't allow datetime objects to be created representing years
-        # before 1970, so do this the old fashioned way
         if not exact:
             if gran == 'C':
                 return ("{0:04d}".format(y))[:2]
@@ -144,7 +115,7 @@ def offset_from_date(v, offset, gran='D', exact=False):
             else:
                 return "%04d" % y
         else:
-            if d == 29 and m == 2 and not calendar.isleap(y):
+            if d == 29 and m == 2 and not calendar_arithmetic.is_leap(y):
                 # eugh, mucking about with a date that's not going to be in the
                 # target year - fall back
                 d = 28
@@ -160,40 +131,35 @@ def offset_from_date(v, offset, gran='D', exact=False):
         return 'PAST_REF'
 
     else:
-        return v
+        return str(v)
 
 
+@lru_cache(1024)
 def compute_offset_base(ref_date, expression, current_direction):
     """
     Given a reference date, some simple expression (yesterday/tomorrow or a
     day of week) and the direction of the relative expression, the base date
-    with which to compute the offset from as a date string
+    with which to compute the offset from as a date string. The reference date
+    can be a string or TemporalValue, but a string is always returned, as a
+    TemporalValue compares equal to its string, so either may be returned from
+    the cache for the other.
     """
 
     # No expression or empty match object, do no computation
     if expression is None:
-        return ref_date
+        return str(ref_date)
 
     # If it's a partial date expression
-    match = re.search(r'^XXXX(\d\d)(\d\d)', expression, re.I)
+    match = _PARTIAL_DATE.search(expression)
     if match is not None:
-        m = int(match.group(1))
-        d = int(match.group(2))
-        ref_m = int(ref_date[4:6])
-        ref_d = int(ref_date[6:8])
-
-        if (m < ref_m or (m == ref_m and d < ref_d)) and current_direction > 0:
-            ref_date = offset_from_date(ref_date, 1, 'Y', True)
-        elif (m > ref_m or (m == ref_m and d > ref_d)) and current_direction < 0:
-            ref_date = offset_from_date(ref_date, -1, 'Y', True)
-
-        return ref_date[:4] + expression[4:]
+        y = _year_of((int(match.group(1)), int(match.group(2))), _date(ref_date), current_direction)
+        return '%04d' % y + expression[4:]
 
     # If it's a day...
-    elif re.search(expressions.DAYS, expression, re.I) is not None:
-        match = re.search(expressions.DAYS, expression, re.I)
+    match = _DAY.search(expression)
+    if match is not None:
         day = string_conversions.day_to_num(match.group())
-        t = day - date_functions.date_to_dow(int(ref_date[:4]), int(ref_date[4:6]), int(ref_date[6:8]))
+        t = day - date_functions.date_to_dow(*_date(ref_date))
         if t >= 0 and current_direction < 0:
             t -= 7
         if t <= 0 and current_direction > 0:
@@ -201,9 +167,12 @@ def compute_offset_base(ref_date, expression, current_direction):
         return offset_from_date(ref_date, t)
 
     # if it's a month
-    elif re.search('(' + expressions.MONTH_ABBRS + '|' + expressions.MONTHS + ')', expression, re.I) is not None:
-        match = re.search('(' + expressions.MONTH_ABBRS + '|' + expressions.MONTHS + ')', expression, re.I)
-        m = date_functions.month_to_num(match.group()) - int(ref_date[4:6])
+    match = _MONTH.search(expression)
+    if match is not None:
+        ref_m = TemporalValue.of(ref_date).month
+        if ref_m is None:
+            raise ValueError(repr(str(ref_date)) + ' has no month')
+        m = date_functions.month_to_num(match.group()) - ref_m
         if m >= 0 and current_direction < 0:
             m -= 12
         if m <= 0 and current_direction > 0:
@@ -211,112 +180,88 @@ def compute_offset_base(ref_date, expression, current_direction):
         return offset_from_date(ref_date, m, 'M')
 
     # if it's a fixed holiday
-    elif re.search(expressions.FIXED_HOLIDAYS, expression, re.I) is not None:
-        match = re.search(expressions.FIXED_HOLIDAYS, expression, re.I)
-        ref_m = int(ref_date[4:6])
-        ref_d = int(ref_date[6:8])
+    match = _FIXED_HOLIDAY.search(expression)
+    if match is not None:
         holdate = string_conversions.fixed_holiday_date(match.group())
-        hol_m = int(holdate[:2])
-        hol_d = int(holdate[2:4])
-
-        if (hol_m < ref_m or (hol_m == ref_m and hol_d < ref_d)) and current_direction > 0:
-            ref_date = offset_from_date(ref_date, 1, 'Y', True)
-        elif (hol_m > ref_m or (hol_m == ref_m and hol_d > ref_d)) and current_direction < 0:
-            ref_date = offset_from_date(ref_date, -1, 'Y', True)
-
-        return ref_date[:4] + holdate
+        y = _year_of((int(holdate[:2]), int(holdate[2:4])), _date(ref_date), current_direction)
+        return '%04d' % y + holdate
 
     # if it's an nth dow holiday
-    elif re.search(expressions.NTH_DOW_HOLIDAYS, expression, re.I) is not None:
-        match = re.search(expressions.NTH_DOW_HOLIDAYS, expression, re.I)
-
-        # Get the date of the event this year and figure out if it's passed or
-        # not
-        ref_m = int(ref_date[4:6])
-        ref_d = int(ref_date[6:8])
-        hol_m = string_conversions.nth_dow_holiday_date(match.group(1))[0]
-        hol_d = date_functions.nth_dow_to_day(string_conversions.nth_dow_holiday_date(match.group(1)),
-            int(ref_date[:4]))
-
-        if (hol_m < ref_m or (hol_m == ref_m and hol_d < ref_d)) and current_direction > 0:
-            ref_date = offset_from_date(ref_date, 1, 'Y', True)
-        elif (hol_m > ref_m or (hol_m == ref_m and hol_d > ref_d)) and current_direction < 0:
-            ref_date = offset_from_date(ref_date, -1, 'Y', True)
-
-        # Now figure out the date for that year
-        return "%s%02d%02d" % (ref_date[:4], string_conversions.nth_dow_holiday_date(match.group(1))[0],
-                               date_functions.nth_dow_to_day(string_conversions.nth_dow_holiday_date(match.group(1)),
-                                   int(ref_date[:4])))
+    match = _NTH_DOW_HOLIDAY.search(expression)
+    if match is not None:
+        hol = match.group(1).lower()
+        return _next_holiday(hol, _date(ref_date), current_direction)
 
     # if it's a lunar holiday
-    elif re.search(expressions.LUNAR_HOLIDAYS, expression, re.I) is not None:
-        match = re.search(expressions.LUNAR_HOLIDAYS, expression, re.I)
-
+    match = _LUNAR_HOLIDAY.search(expression)
+    if match is not None:
         hol = match.group()
-        hol = re.sub(r'<([^~]*)[^>]*>', r'\1', hol)
-        hol = re.sub(r'\s', '', hol)
+        hol = _TOKEN.sub(r'\1', hol)
+        hol = _WHITESPACE.sub('', hol)
         hol = hol.lower()
-
-        easter_offsets = {
-            'goodfriday': -3,
-            'shrovetuesday': -47,
-            'ashwednesday': -46,
-            'palmsunday': -7,
-            'easter': 0
-        }
-
-        # Get the date of the event this year and figure out if it's passed or
-        # not
-        ref_m = int(ref_date[4:6])
-        ref_d = int(ref_date[6:8])
-        hol_date = offset_from_date(date_functions.easter_date(int(ref_date[:4])), easter_offsets[hol])
-        hol_m = int(hol_date[4:6])
-        hol_d = int(hol_date[6:8])
-
-        if (hol_m < ref_m or (hol_m == ref_m and hol_d < ref_d)) and current_direction > 0:
-            ref_date = offset_from_date(ref_date, 1, 'Y', True)
-        elif (hol_m > ref_m or (hol_m == ref_m and hol_d > ref_d)) and current_direction < 0:
-            ref_date = offset_from_date(ref_date, -1, 'Y', True)
-
-        hol_y = int(ref_date[:4])
-        return offset_from_date(date_functions.easter_date(hol_y), easter_offsets[hol])
+        return _next_holiday(hol, _date(ref_date), current_direction)
 
     # Other expressions
-    elif expression.lower().find('yesterday') > -1:
+    if expression.lower().find('yesterday') > -1:
         return offset_from_date(ref_date, -1)
     elif expression.lower().find('tomorrow') > -1:
         return offset_from_date(ref_date, 1)
 
     # Couldn't figure out an offset
     else:
-        return ref_date
+        return str(ref_date)
 
 
-def _extract_verbs(s):
+def _date(value):
     """
-    Given a sentence, extract the verbs and their POS tags from it.
+    The (y, m, d) of a value (a string or TemporalValue), which must be a day
     """
-    verb = None
-    verb2 = None
-    vpos = None
-    vpos2 = None
-    pos_found = False
-    for (tok, pos, ts) in s:
-        if (pos.upper() == 'VBP' or pos.upper() == 'VBZ' or pos.upper() == 'VBD' or pos.upper() == 'MD') and \
-           not pos_found:
-            verb = tok.lower()
-            vpos = pos.upper()
-        elif pos_found and tok[:2].upper() == 'VB':
-            verb2 = tok.lower()
-            vpos2 = pos.upper()
-            break
+    value = TemporalValue.of(value)
+    if value.day is None:
+        raise ValueError(repr(str(value)) + ' is not a day')
+    return (value.year, value.month, value.day)
+
+
+def _year_of((m, d), (ref_y, ref_m, ref_d), current_direction):
+    """
+    The year of the next m/d after the reference date if current_direction is
+    positive, the last one before it if negative, or the one in the same year
+    otherwise
+    """
+    if (m, d) < (ref_m, ref_d) and current_direction > 0:
+        return ref_y + 1
+    elif (m, d) > (ref_m, ref_d) and current_direction < 0:
+        return ref_y - 1
+    else:
+        return ref_y
 
-    if vpos == 'VBP' or vpos == 'VBZ' or vpos == 'MD' and \
-       re.search(r'going\s+to', ' '.join([tok for (tok, pos, ts) in s]), re.I) is not None:
-        vpos = 'MD'
-        verb = 'going_to'
 
-    return (verb, vpos, verb2, vpos2)
+def _next_holiday(hol, (ref_y, ref_m, ref_d), current_direction):
+    """
+    The date of the holiday in the year _year_of picks, given its date in the
+    year of the reference date, as a date string
+    """
+    y = _year_of(_holiday_date(hol, ref_y), (ref_y, ref_m, ref_d), current_direction)
+    return '%04d%02d%02d' % ((y,) + _holiday_date(hol, y))
+
+
+@lru_cache(1024)
+def _holiday_date(hol, y):
+    """
+    The (m, d) of a holiday which is either on the nth day-of-week of some
+    month (as in nth_dow_holiday_date) or relative to Easter, in year y. hol is
+    the lower case name of the holiday, without tokens or spaces.
+
+    Holidays are mentioned again and again for the same few years, so their
+    dates are remembered.
+    """
+    if hol in _EASTER_OFFSETS:
+        easter = date_functions.easter_date(y)
+        ordinal = calendar_arithmetic.to_ordinal(int(easter[:4]), int(easter[4:6]), int(easter[6:8]))
+        return calendar_arithmetic.from_ordinal(ordinal + _EASTER_OFFSETS[hol])[1:]
+    else:
+        (m, dow, n) = string_conversions.nth_dow_holiday_date(hol)
+        return (m, date_functions.nth_dow_to_day((m, dow, n), y))
 
 
 def relative_direction_heuristic(before, after):
@@ -327,18 +272,19 @@ def relative_direction_heuristic(before, after):
     """
 
     # Get the bit after the last TIMEX and before this one
-    lead = before
+    lead = 0
     for i in range(-1, -1 * len(before), -1):
         if len(before[i][2]) > 0:
-            lead = before[i:]
+            lead = len(before) + i
             break
 
-    # Okay, now extract the verbs
-    (verb, pos, verb2, pos2) = _extract_verbs(lead)
+    # Okay, now find the verbs
+    before_verbs = VerbTable.of(before)
+    (verb, pos) = before_verbs.tense(lead)
     if verb is None:
-        (verb, pos, verb2, pos2) = _extract_verbs(after)
+        (verb, pos) = VerbTable.of(after).tense()
     if verb is None:
-        (verb, pos, verb2, pos2) = _extract_verbs(before)
+        (verb, pos) = before_verbs.tense()
     if verb is None:
         return 0
 
@@ -346,13 +292,8 @@ def relative_direction_heuristic(before, after):
     if pos == 'VBD':
         return -1
 
-    elif pos == 'MD':
-        if re.search(r'(will|\'ll|going_to)', verb, re.I) is not None:
-            return 1
-        elif verb2 == 'have':
-            return -1
-        elif re.search(r'((w|c|sh)ould|\'d)', verb, re.I) is not None and pos2 == 'VB':
-            return 1
+    elif pos == 'MD' and _WILL.search(verb) is not None:
+        return 1
 
     # Use other linguistic cues to determine tense
     if before[-1][0].lower() == 'since':
@@ -361,3 +302,35 @@ def relative_direction_heuristic(before, after):
         return 1
 
     return 0
+
+
+# How many days holidays relative to Easter are from it
+_EASTER_OFFSETS = {
+    'goodfriday': -3,
+    'shrovetuesday': -47,
+    'ashwednesday': -46,
+    'palmsunday': -7,
+    'easter': 0
+}
+
+# The number of seconds in each granularity offset_from_date can work in
+# seconds for
+_GRAN_SECONDS = {
+    'TM': 60,
+    'TH': 60 * 60,
+    'D': 24 * 60 * 60,
+    'W': 7 * 24 * 60 * 60,
+    'F': 14 * 24 * 60 * 60
+}
+
+# The regular expressions used above, compiled once rather than each time they
+# are used
+_PARTIAL_DATE = re.compile(r'^XXXX(\d\d)(\d\d)', re.I)
+_DAY = re.compile(expressions.DAYS, re.I)
+_MONTH = re.compile('(' + expressions.MONTH_ABBRS + '|' + expressions.MONTHS + ')', re.I)
+_FIXED_HOLIDAY = re.compile(expressions.FIXED_HOLIDAYS, re.I)
+_NTH_DOW_HOLIDAY = re.compile(expressions.NTH_DOW_HOLIDAYS, re.I)
+_LUNAR_HOLIDAY = re.compile(expressions.LUNAR_HOLIDAYS, re.I)
+_TOKEN = re.compile(r'<([^~]*)[^>]*>')
+_WHITESPACE = re.compile(r'\s')
+_WILL = re.compile(r'(will|\'ll|going_to)', re.I)
@@ -185,7 +185,7 @@ def fixed_holiday_date(hol):
     """
     Get the date string MMDD of a holiday
     """
-    hol = re.sub(r'<([^~]*)~[^>]*>', r'\1', hol).lower()
+    hol = _TOKEN.sub(r'\1', hol).lower()
     if hol in _fixed_holiday_dates:
         return _fixed_holiday_dates[hol]
     else:
@@ -248,3 +248,8 @@ def build_duration_value(num, unit):
 
     else:
         return str(num) + 'X'
+
+
+# The regular expression used above, compiled once rather than each time it
+# is used
+_TOKEN = re.compile(r'<([^~]*)~[^>]*>')
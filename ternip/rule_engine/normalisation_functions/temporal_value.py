@@ -0,0 +1,100 @@
+import re
+
+from ternip.rule_engine.normalisation_functions import calendar_arithmetic
+from ternip.rule_engine.normalisation_functions.lru_cache import lru_cache
+
+
+class TemporalValue(object):
+    """
+    A date or time in the TIDES format (e.g., 2010, 201008, 20100804, 2010W31,
+    20100804T16, 20100804T1636-0500), taken apart into its fields, which are
+    None where the value doesn't give them. week is only given for week values
+    (which have no month or day), and zone is the text of the time zone (e.g.,
+    -0500 or Z) if there is one.
+
+    granularity is the smallest unit the value gives, using the same letters as
+    offset_from_date ('Y', 'M', 'W' or 'D'), or 'TH', 'TM' or 'TS' for hours,
+    minutes and seconds.
+
+    Values never change once made, so the same value is shared by everything
+    which parses the same string: use TemporalValue.of rather than making them
+    directly. They compare equal to (and hash the same as) the string they were
+    parsed from.
+    """
+
+    __slots__ = ('string', 'year', 'month', 'week', 'day', 'hour', 'minute', 'second', 'zone', 'granularity')
+
+    def __init__(self, string):
+        """
+        Parse a value. Raises ValueError if it's not a date or time.
+        """
+        match = _VALUE.match(string)
+        if match is None:
+            raise ValueError(repr(string) + ' is not a TIDES date or time')
+        (year, week, month, day, hour, minute, second, zone) = \
+            [None if field is None else int(field) for field in match.groups()[:-1]] + [match.group('zone')]
+
+        if day is not None:
+            calendar_arithmetic.check_date(year, month, day)
+        elif month is not None:
+            calendar_arithmetic.check_date(year, month, 1)
+        if hour is not None:
+            calendar_arithmetic.check_time(hour, minute or 0, second or 0)
+
+        for (field, granularity) in [(second, 'TS'), (minute, 'TM'), (hour, 'TH'), (day, 'D'), (week, 'W'),
+                                     (month, 'M'), (year, 'Y')]:
+            if field is not None:
+                break
+
+        for (name, field) in [('string', string), ('year', year), ('month', month), ('week', week), ('day', day),
+                              ('hour', hour), ('minute', minute), ('second', second), ('zone', zone),
+                              ('granularity', granularity)]:
+            object.__setattr__(self, name, field)
+
+    @staticmethod
+    def of(value):
+        """
+        The parsed form of a value, which can be a string, or a TemporalValue
+        (which is returned as it is). Raises ValueError if the value isn't a
+        date or time.
+        """
+        if isinstance(value, TemporalValue):
+            return value
+        else:
+            return _parse(value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('TemporalValues can not be changed')
+
+    def __delattr__(self, name):
+        raise AttributeError('TemporalValues can not be changed')
+
+    def __str__(self):
+        return self.string
+
+    def __repr__(self):
+        return 'TemporalValue(' + repr(self.string) + ')'
+
+    def __len__(self):
+        return len(self.string)
+
+    def __eq__(self, other):
+        return str(self) == str(other) if isinstance(other, (TemporalValue, basestring)) else NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash(self.string)
+
+    def __reduce__(self):
+        return (TemporalValue.of, (self.string,))
+
+
+# Values are parsed again and again (most relative expressions are relative to
+# the same few dates in a document), so the most recent are remembered
+_parse = lru_cache(4096)(TemporalValue)
+
+_VALUE = re.compile(r'(\d{4})(?:W(\d\d)|(\d\d)(?:(\d\d)(?:T(\d\d)(?:(\d\d)(\d\d)?)?)?)?)?'
+                    r'(?P<zone>Z|[+-]\d\d(?:\d\d)?)?$')
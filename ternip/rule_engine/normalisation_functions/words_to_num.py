@@ -1,9 +1,9 @@
 #!/usr/bin/env python
 
-from operator import itemgetter
-
 import re
 
+from ternip.rule_engine.normalisation_functions.lru_cache import lru_cache
+
 
 _word_to_num = {
     "zero": 0,
@@ -42,6 +42,7 @@ _word_to_num = {
 }
 
 
+@lru_cache(1024)
 def words_to_num(words):
     """
     Converted from GUTime. Given a string of number words, attempts to derive
@@ -53,80 +54,78 @@ def words_to_num(words):
         return 0
 
     # If this comes from deliminated numbers
-    words = re.sub(r'NUM_START', r'', words).strip()
-    words = re.sub(r'NUM_END', r'', words).strip()
+    words = words.replace('NUM_START', '').strip()
+    words = words.replace('NUM_END', '').strip()
 
     # Clean up our input
     words = words.lower()
 
     # Get rid of tokens
-    words = re.sub(r'<([^~]*)[^>]*>', r'\1 ', words).strip()
-
-    # Superfluous white space
-    words = words.strip()
+    if '<' in words:
+        words = _TOKEN.sub(r'\1 ', words).strip()
 
     # Hyphenated number words
-    words = re.sub(r'-', '', words)
+    words = words.replace('-', '')
 
     # Number word separators
-    words = re.sub(r',', '', words)
-    words = re.sub(r'\sand', '', words)
+    words = words.replace(',', '')
+    if 'and' in words:
+        words = _AND.sub('', words)
 
     # "a" and "the" mean one, really
-    words = re.sub(r'^a', 'one', words)
-    words = re.sub(r'^the', 'one', words)
+    if words.startswith('a'):
+        words = 'one' + words[1:]
+    elif words.startswith('the'):
+        words = 'one' + words[3:]
 
-    # convert to list
-    words = words.split()
+    return _parse(words.split())
 
-    # now attempt to convert each word to it's numerical equivalent
-    for i in range(len(words)):
-        if words[i] in _word_to_num:
-            words[i] = _word_to_num[words[i]]
-        elif words[i] in _ordinal_to_num and len(words) - 1 == i:
+
+def _parse(words):
+    """
+    Works out the value of a list of number words in one pass over them.
+
+    The value of the words is that of the words before the biggest number (or
+    1, if there are none) times the biggest number, plus the value of the words
+    after it (or 0), where the words either side are broken down the same way.
+    Going left to right, the numbers which are still waiting to find out what
+    comes after them are kept on a stack, each with the value of the words
+    before it, and are taken off when a bigger number turns up, as they then
+    make up what comes before that number.
+    """
+    if len(words) == 0:
+        raise ValueError('no number words to convert')
+
+    # The (number, value of the words before it) still waiting for the words
+    # after them
+    pending = []
+    last = len(words) - 1
+    for (i, word) in enumerate(words):
+        if word in _word_to_num:
+            num = _word_to_num[word]
+        elif word in _ordinal_to_num and i == last:
             # only allow ordinal words in the last position
-            words[i] = ordinal_to_num(words[i])
+            num = _ordinal_to_num[word]
         else:
             # Hope it's a number. If not, we error out
             try:
-                words[i] = int(words[i])
+                num = int(word)
             except ValueError:
                 return 0
 
-    # Now recursively break down these
-    return _words_to_num(words)
-
-
-def _words_to_num(nums):
-    """
-    Recursively break down a number string into individual number components,
-    compute the value of those components (basically, the bit before the largest
-    number, and the bit after) and then put it all back together.
-    """
-
-    # base case
-    if len(nums) == 1:
-        return nums[0]
-
-    # find highest number in string
-    (highest_num, highest_num_i) = max(zip(nums, range(len(nums))), key=itemgetter(0))
-    before = nums[:highest_num_i]
-    after = nums[highest_num_i + 1:]
-
-    # If there are no numbers before the biggest term, then assume it means 1 of
-    # those units
-    if len(before) > 0:
-        before = _words_to_num(before)
-    else:
         before = 1
-
-    # if there are no numbers after, then append 0 to it
-    if len(after) > 0:
-        after = _words_to_num(after)
-    else:
-        after = 0
-
-    return (before * highest_num) + after
+        if len(pending) > 0 and pending[-1][0] < num:
+            before = 0
+            while len(pending) > 0 and pending[-1][0] < num:
+                (smaller, smaller_before) = pending.pop()
+                before += smaller_before * smaller
+        pending.append((num, before))
+
+    value = 0
+    while len(pending) > 0:
+        (num, before) = pending.pop()
+        value += before * num
+    return value
 
 # Mapping of ordinals to numbers
 _ordinal_to_num = {
@@ -170,10 +169,17 @@ def ordinal_to_num(o):
     numbers and words accepted), return the number value of that ordinal.
     Unrecognised data gets 1. Returns an integer
     """
-    match = re.search(r'\d+', o)
+    match = _DIGITS.search(o)
     if match is not None:
         return int(match.group())
     elif o.lower() in _ordinal_to_num:
         return _ordinal_to_num[o.lower()]
     else:
         return 1
+
+
+# The regular expressions used above, compiled once rather than each time they
+# are used
+_TOKEN = re.compile(r'<([^~]*)[^>]*>')
+_AND = re.compile(r'\sand')
+_DIGITS = re.compile(r'\d+')
@@ -1,16 +1,15 @@
 #!/usr/bin/env python
 
-import calendar
 import logging
+import marshal
 
 import re
 
 from ternip.rule_engine import rule
-from ternip.rule_engine.expressions import *
-from ternip.rule_engine.normalisation_functions.date_functions import *
-from ternip.rule_engine.normalisation_functions.relative_date_functions import *
-from ternip.rule_engine.normalisation_functions.string_conversions import *
-from ternip.rule_engine.normalisation_functions.words_to_num import *
+from ternip.rule_engine.condition_order import ConditionOrder
+from ternip.rule_engine.rule_compiler import compile_expressions, load_expressions
+from ternip.rule_engine.timex_context import TimexContext
+from ternip.rule_engine.triggers import min_count
 
 
 LOGGER = logging.getLogger(__name__)
@@ -25,7 +24,7 @@ class NormalisationRule(rule.Rule):
 
     def __init__(self, match, type=None, id='', value=None, change_type=None, freq=None, quant=None, mod=None,
                  guards=None, after_guards=None, before_guards=None, sent_guards=None, after=None, tokenise=True,
-                 deliminate_numbers=False):
+                 deliminate_numbers=False, triggers=None):
         """
         Create a normalisation rule, with a number of optional arguments. If
         tokenise is set to true, then regex's are in the form to be used with
@@ -55,6 +54,9 @@ class NormalisationRule(rule.Rule):
         tokenise is whether or not the regular expressions to be matched against
             care about token boundaries/POS tags. If it is not true, it is
             considered to be the separator for tokens.
+        triggers is a list of strings, at least one of which must appear in
+            the text the match regex is run against for this rule to be tried.
+            If not given, these are worked out from the match regex.
         """
         if not after: after = []
         if not sent_guards: sent_guards = []
@@ -64,15 +66,17 @@ class NormalisationRule(rule.Rule):
 
         self.id = id
         self._type = type
-        self._match = re.compile(self._prep_re(match, tokenise), re.IGNORECASE)
+        self._match = self._compile(match, re.IGNORECASE, tokenise)
         self.after = after
         self._tokenise = tokenise
         self._deliminate_numbers = deliminate_numbers
-        self._value_exp = self._compile_exp(value, 'value')
-        self._type_exp = self._compile_exp(change_type, 'change-type')
-        self._freq_exp = self._compile_exp(freq, 'freq')
-        self._quant_exp = self._compile_exp(quant, 'quant')
-        self._mod_exp = self._compile_exp(mod, 'mod')
+        self._load_triggers((tokenise, deliminate_numbers), triggers, self._match)
+
+        # The fewest tokens the match regex can match
+        self.min_tokens = min_count(self._match.pattern, '<') if tokenise is True else 0
+        self._exps_code = self._compile_exps([('value', value), ('change_type', change_type), ('freq', freq),
+                                              ('quant', quant), ('mod', mod)])
+        self._load_exps()
 
         # Load guards
         self._guards = self._load_guards(guards, tokenise)
@@ -80,16 +84,70 @@ class NormalisationRule(rule.Rule):
         self._after_guards = self._load_guards(after_guards, tokenise)
         self._sent_guards = self._load_guards(sent_guards, tokenise)
 
-    def _compile_exp(self, exp, type):
+        # Guards on the body are checked against the same amount of text as
+        # the match, but the rest of the sentence is usually longer
+        self._conditions = ConditionOrder([self._match_condition(1)] +
+                                          self._guard_condition('guard', self._guards, 1) +
+                                          self._guard_condition('before-guard', self._before_guards, 2) +
+                                          self._guard_condition('after-guard', self._after_guards, 2) +
+                                          self._guard_condition('sent-guard', self._sent_guards, 4))
+
+    def _compile_exps(self, exps):
+        """
+        Compile the given (name, expression) tuples, where the expression is
+        None if the rule doesn't have that expression, into the code of a
+        module defining a function for each of them. Our group short form in
+        the expressions, e.g., {#6}, is replaced so the matched groups of the
+        regular expression get subbed in.
+        """
+        return compile_expressions(self.id, [(name, exp) for (name, exp) in exps if exp is not None],
+            self._match.groups)
+
+    # The functions for each expression, which are called with the match,
+    # timex, cur_context, dct, body, before, after and rule
+    _EXPS = [('_value_exp', '_value'), ('_type_exp', '_change_type'), ('_freq_exp', '_freq'),
+             ('_quant_exp', '_quant'), ('_mod_exp', '_mod')]
+
+    def _load_exps(self):
+        """
+        Define the functions for the expressions of this rule from their
+        compiled code
+        """
+        namespace = load_expressions(self._exps_code)
+        for (attr, name) in self._EXPS:
+            setattr(self, attr, namespace.get(name))
+
+    def __getstate__(self):
+        """
+        Pickle the code for the expressions as bytecode, rather than the
+        functions made from it, so loaded rules can be cached
+        """
+        state = dict(self.__dict__)
+        for (attr, name) in self._EXPS:
+            del state[attr]
+        state['_exps_code'] = marshal.dumps(self._exps_code)
+        return state
+
+    def __setstate__(self, state):
+        state['_exps_code'] = marshal.loads(state['_exps_code'])
+        self.__dict__.update(state)
+        self._load_exps()
+
+    @staticmethod
+    def _trigger_text((tokenise, deliminate_numbers), body):
+        """
+        Triggers are looked for in the lower-cased text of the body of the
+        timex, in the same form as the match regex is run against
+        """
+        return TimexContext([], body, []).trigger_text((tokenise, deliminate_numbers))
+
+    def long_enough(self, context):
         """
-        Replace our group short form in value expressions, e.g., {#6} with
-        actual Python code so that matched regular expressions get subbed in
+        Whether the body of a timex (in a TimexContext) has enough tokens for
+        the match regex of this rule to match it
         """
-        # it would be nice to support named groups, but this'll do for now
-        if exp is not None:
-            return compile(re.sub(r'\{#(\d+)\}', r'match.group(\1)', exp), self.id + ':' + type, 'eval')
-        else:
-            return None
+        return self.min_tokens <= 1 or \
+               context.token_count(self._tokenise, self._deliminate_numbers) >= self.min_tokens
 
     def apply(self, timex, cur_context, dct, body, before, after):
         """
@@ -106,55 +164,52 @@ class NormalisationRule(rule.Rule):
         if self._type is not None and timex.type.lower() != self._type.lower():
             return False, cur_context
 
-        # Check before, after and whole sentence guards
-        if not self._check_guards(self._toks_to_str(before), self._before_guards):
-            return False, cur_context
-
-        if not self._check_guards(self._toks_to_str(after), self._after_guards):
-            return False, cur_context
-
-        if not self._check_guards(self._toks_to_str(body), self._guards):
-            return False, cur_context
-
-        if not self._check_guards(self._toks_to_str(before + body + after), self._sent_guards):
-            return False, cur_context
-
-        # Now, check if we match:
-        if self._tokenise is True:
-            senttext = self._toks_to_str(body)
-            if self._deliminate_numbers:
-                senttext = self._do_deliminate_numbers(senttext)
-        else:
-            senttext = self._tokenise.join([tok for (tok, pos, ts) in body])
-
-        match = self._match.search(senttext)
-
-        # If we do, then calculate attributes for the timex
-        if match:
-            if self._DEBUG:
-                timex.comment = self.id
-
-            try:
-                if self._value_exp is not None:
-                    timex.value = eval(self._value_exp)
-
-                if self._type_exp is not None:
-                    timex.type = eval(self._type_exp)
-
-                if self._freq_exp is not None:
-                    timex.freq = eval(self._freq_exp)
-
-                if self._quant_exp is not None:
-                    timex.quant = eval(self._quant_exp)
-
-                if self._mod_exp is not None:
-                    timex.mod = eval(self._mod_exp)
-
-            except Exception:
-                LOGGER.exception('Malformed rule expression')
-
-            # Need to update current time context, if necessary
-            return True, cur_context
-        else:
-            # Rule did not match
-            return False, cur_context
+        # The renderings of the text around this timex are shared between all
+        # the rules tried on it
+        context = TimexContext.of(body, before, after)
+
+        # Check the guards and whether we match, in the order most likely to
+        # rule this timex out quickly
+        match = None
+        for condition in self._conditions.order:
+            if condition == 'match':
+                match = self._match.search(context.match_text(self._tokenise, self._deliminate_numbers))
+                passed = match is not None
+            elif condition == 'guard':
+                passed = self._check_guards(context.body_text, self._guards, context.searches)
+            elif condition == 'before-guard':
+                passed = self._check_guards(context.before_text, self._before_guards, context.searches)
+            elif condition == 'after-guard':
+                passed = self._check_guards(context.after_text, self._after_guards, context.searches)
+            else:
+                passed = self._check_guards(context.sent_text, self._sent_guards, context.searches)
+            self._conditions.record(condition, passed)
+            if not passed:
+                return False, cur_context
+
+        # We match, so calculate attributes for the timex
+        if self._DEBUG:
+            timex.comment = self.id
+
+        args = (match, timex, cur_context, dct, body, before, after, self)
+        try:
+            if self._value_exp is not None:
+                timex.value = self._value_exp(*args)
+
+            if self._type_exp is not None:
+                timex.type = self._type_exp(*args)
+
+            if self._freq_exp is not None:
+                timex.freq = self._freq_exp(*args)
+
+            if self._quant_exp is not None:
+                timex.quant = self._quant_exp(*args)
+
+            if self._mod_exp is not None:
+                timex.mod = self._mod_exp(*args)
+
+        except Exception:
+            LOGGER.exception('Malformed rule expression')
+
+        # Need to update current time context, if necessary
+        return True, cur_context
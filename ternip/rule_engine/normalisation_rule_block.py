@@ -1,10 +1,53 @@
 from ternip.rule_engine.rule_block import RuleBlock
+from ternip.rule_engine.timex_context import TimexContext
+from ternip.rule_engine.triggers import TriggerIndex
 
 class NormalisationRuleBlock(RuleBlock):
     """
     A block of normalisation rules
     """
 
+    def __init__(self, id, after, type, rules):
+        """
+        Create a block of normalisation rules, as for RuleBlock. The rules are
+        indexed by the type of timex they apply to, and then by their triggers,
+        so only the rules which could match a timex are tried on it.
+        """
+        super(NormalisationRuleBlock, self).__init__(id, after, type, rules)
+
+        # For each type of timex a rule applies to, the rules which apply to
+        # that type, and for all other types, the rules which apply to any
+        # type. The rules in each keep the order they are in the block, and
+        # each is kept along with the positions of its rules in the block.
+        self._index = self._subset(rules, lambda rule: True)
+        self._untyped = self._subset(rules, lambda rule: rule._type is None)
+        self._by_type = {}
+        for type in set(rule._type.lower() for rule in rules if rule._type is not None):
+            self._by_type[type] = self._subset(rules,
+                lambda rule: rule._type is None or rule._type.lower() == type)
+
+    @staticmethod
+    def _subset(rules, keep):
+        """
+        Index the rules which keep returns true for, returning the index and
+        the positions of those rules in the block
+        """
+        positions = [i for (i, rule) in enumerate(rules) if keep(rule)]
+        return TriggerIndex([rules[i] for i in positions]), positions
+
+    def _select(self, type, context):
+        """
+        Returns a list of (position, rule) tuples, in block order, for the
+        rules which could match a timex of the given type in this context
+        """
+        if type is None:
+            # Leave it to the rules to deal with timexes without a type
+            (index, positions) = self._index
+        else:
+            (index, positions) = self._by_type.get(type.lower(), self._untyped)
+        return [(positions[i], rule) for (i, rule) in index.select(context.trigger_text)
+                if rule.long_enough(context)]
+
     def apply(self, timex, cur_context, dct, body, before, after):
         """
         Apply rules in this block, in order, to this sentence, either until one
@@ -12,12 +55,25 @@ class NormalisationRuleBlock(RuleBlock):
         """
 
         block_success = False
+        context = TimexContext.of(body, before, after)
 
-        for rule in self._rules:
+        # Don't bother with rules which can't match this timex
+        type = timex.type
+        rules = self._select(type, context)
+        i = 0
+        while i < len(rules):
+            (position, rule) = rules[i]
+            i += 1
             (success, cur_context) = rule.apply(timex, cur_context, dct, body, before, after)
             if success:
                 block_success = True
             if self._type == 'until-success' and success:
                 break
+            if timex.type != type:
+                # The rule changed the type of the timex, so the rest of the
+                # block is tried with the rules for its new type
+                type = timex.type
+                rules = [(later, rule) for (later, rule) in self._select(type, context) if later > position]
+                i = 0
 
         return block_success, cur_context
@@ -3,7 +3,12 @@
 import re
 from ternip.rule_engine.normalisation_rule import NormalisationRule
 from ternip.rule_engine.normalisation_rule_block import NormalisationRuleBlock
+from ternip.rule_engine.normalisation_functions.temporal_value import TemporalValue
 from ternip.rule_engine.rule_engine import RuleEngine, RuleLoadError
+from ternip.rule_engine.sentence_text import SentenceText
+from ternip.rule_engine.timex_context import TimexContext
+from ternip.rule_engine.verb_table import VerbTable
+from ternip.sentence import Sentence
 
 class NormalisationRuleEngine(RuleEngine):
     """
@@ -43,6 +48,7 @@ class NormalisationRuleEngine(RuleEngine):
         freq = None
         quant = None
         mod = None
+        triggers = []
 
         for key in d:
             # Only one 'Type' field allowed
@@ -112,6 +118,8 @@ class NormalisationRuleEngine(RuleEngine):
                 after_guards = d[key]
             elif key == 'sent-guard':
                 sent_guards = d[key]
+            elif key == 'trigger':
+                triggers = d[key]
 
             elif key == 'tokenise':
                 if len(d[key]) == 1:
@@ -152,17 +160,21 @@ class NormalisationRuleEngine(RuleEngine):
         # Guard against any RE errors
         try:
             return NormalisationRule(match, type, id, value, change_type, freq, quant, mod, guards, after_guards,
-                before_guards, sent_guards, after, tokenise, deliminate_numbers)
+                before_guards, sent_guards, after, tokenise, deliminate_numbers, triggers)
         except re.error as e:
             raise RuleLoadError(filename, "Malformed regular expression: " + str(e))
 
     def annotate(self, sents, dct):
         """
         This annotates all the timexes in the sents. dct means the document
-        creation time (in the TIDES-modified ISO8601 format), which some rules
-        may use to determine a context.
+        creation time (in the TIDES-modified ISO8601 format, as a string or
+        TemporalValue), which some rules may use to determine a context.
         """
 
+        # Rules work with the string form of the time
+        if isinstance(dct, TemporalValue):
+            dct = str(dct)
+
         # Current context
         context_dt = dct
 
@@ -170,47 +182,30 @@ class NormalisationRuleEngine(RuleEngine):
         # text context for later sentences, so consider each sentence in turn,
         # updating the context if need be.
         for sent in sents:
-            # Now collect all timexes in this sentence
-            timexes = set()
-            for (w, pos, ts) in sent:
-                for t in ts:
-                    timexes.add(t)
+            # Render the sentence once up front, so the slices of it given to
+            # each rule can share that rendering
+            sent = Sentence(sent)
+            SentenceText.of(sent)
+            VerbTable.of(sent)
+
+            # Now collect all timexes in this sentence, and where they are
+            timexes = sent.timexes()
+            spans = sent.spans()
 
             # Now annotate each timex
             for timex in timexes:
                 # First find the token extent of this timex
-                tfound = False
-                i = 0
-                for (w, pos, ts) in sent:
-                    if timex in ts:
-                        if not tfound:
-                            tfound = True
-                            ei = i
-                        ej = i + 1
-                    i += 1
-
-                # Slice up into different extents
+                (ei, ej) = spans[timex]
+
+                # Slice up into different extents, and make the context every
+                # rule tried on this timex shares
                 before = sent[:ei]
                 body = sent[ei:ej]
                 after = sent[ej:]
+                context = TimexContext.of(body, before, after)
 
-                # Now run the rules
-                rules_run = set()
-                rules_to_run = set(self._rules)
-
-                # Apply rules until all rules have been applied
-                while rules_to_run:
-                    for rule in rules_to_run.copy():
-                        # Check that if 'after' is defined, the rules we must run
-                        # after have run
-                        after_ok = True
-                        for aid in rule.after:
-                            if aid not in rules_run:
-                                after_ok = False
-
-                        # Apply this rule, and update our states of rules waiting to
-                        # run and rules that have been run
-                        if after_ok:
-                            (success, context_dt) = rule.apply(timex, context_dt, dct, body, before, after)
-                            rules_run.add(rule.id)
-                            rules_to_run.remove(rule)
+                # Now run the rules whose triggers are in the timex, in the
+                # order given by the execution plan compiled when the rules were
+                # loaded
+                for (i, rule) in self._index.select(context.trigger_text):
+                    (success, context_dt) = rule.apply(timex, context_dt, dct, body, before, after)
@@ -1,7 +1,10 @@
 #!/usr/bin/env python
 
+import itertools
 import re
+from ternip.rule_engine.condition_order import ConditionOrder
 from ternip.rule_engine.rule import Rule
+from ternip.rule_engine.sentence_text import SentenceText
 from ternip.timex import Timex
 
 
@@ -13,7 +16,7 @@ class RecognitionRule(Rule):
     _DEBUG = False
 
     def __init__(self, match, type, id, guards=None, after_guards=None, before_guards=None, after=None, squelch=False,
-                 case_sensitive=False, deliminate_numbers=False):
+                 case_sensitive=False, deliminate_numbers=False, triggers=None):
         """
         Create a recognition rule, with a number of optional arguments. All
         regex's are in the form to be used with nltk.TokenSearcher.findall
@@ -46,6 +49,9 @@ class RecognitionRule(Rule):
             be matched case sensitively or not.
         deliminate_numbers is a Boolean indicating whether or not this rule
             requires the sentence to have deliminated numbers
+        triggers is a list of strings, at least one of which must appear in
+            the text the match regex is run against for this rule to be tried.
+            If not given, these are worked out from the match regex.
         """
         if not after: after = []
         if not before_guards: before_guards = []
@@ -55,18 +61,39 @@ class RecognitionRule(Rule):
         self.id = id
         self._type = type
         if case_sensitive:
-            self._match = re.compile(self._prep_re(match))
+            self._match = self._compile(match)
         else:
-            self._match = re.compile(self._prep_re(match), re.IGNORECASE)
+            self._match = self._compile(match, re.IGNORECASE)
         self._squelch = squelch
         self.after = after
         self._deliminate_numbers = deliminate_numbers
+        self._load_triggers((deliminate_numbers, case_sensitive), triggers, self._match)
 
         # Load guards
         self._guards = self._load_guards(guards)
         self._before_guards = self._load_guards(before_guards)
         self._after_guards = self._load_guards(after_guards)
 
+        # The guards and finding the first match both look at the whole
+        # sentence. Before and after guards depend on the match, so can only be
+        # checked after it.
+        self._conditions = ConditionOrder([self._match_condition(1)] +
+                                          self._guard_condition('guard', self._guards, 1))
+
+    @staticmethod
+    def _trigger_text((deliminate_numbers, case_sensitive), sent):
+        """
+        Triggers are looked for in the (possibly deliminated) text of the
+        sentence, lower-cased unless the rule is case-sensitive
+        """
+        text = SentenceText.of(sent)
+        if deliminate_numbers:
+            text = text.deliminated
+        if case_sensitive:
+            return text.text
+        else:
+            return text.lower
+
     def apply(self, sent):
         """
         Applies this rule to the tokenised sentence. The 'after' ordering
@@ -80,19 +107,29 @@ class RecognitionRule(Rule):
         anything
         """
 
-        senttext = self._toks_to_str(sent)
-
+        text = SentenceText.of(sent)
         if self._deliminate_numbers:
-            senttext = self._do_deliminate_numbers(senttext)
+            text = text.deliminated
+        senttext = text.text
 
         success = False
 
-        # Ensure the sentence-level guards are satisfied
-        if not self._check_guards(senttext, self._guards):
-            return sent, success
+        # Ensure the sentence-level guards are satisfied, and that this rule
+        # actually matches anything, in the order most likely to rule the
+        # sentence out quickly
+        matches = self._match.finditer(senttext)
+        first = None
+        for condition in self._conditions.order:
+            if condition == 'match':
+                first = next(matches, None)
+                passed = first is not None
+            else:
+                passed = self._check_guards(senttext, self._guards, text.searches)
+            self._conditions.record(condition, passed)
+            if not passed:
+                return sent, success
 
-        # Now see if this rule actually matches anything
-        for match in self._match.finditer(senttext):
+        for match in itertools.chain([first], matches):
             # Now check before guards
             if not self._check_guards(senttext[:match.start()], self._before_guards):
                 continue
@@ -102,9 +139,8 @@ class RecognitionRule(Rule):
                 continue
 
             # okay, first we need to find which tokens we matched, can do this
-            # by using our token markers
-            ti = senttext.count('<', 0, match.start())
-            tj = senttext.count('<', 0, match.end())
+            # by using the offsets of the tokens in the text
+            (ti, tj) = text.token_span(match.start(), match.end())
 
             if not self._squelch:
                 t = Timex(self._type) # only create a new timex if not squelching
@@ -14,6 +14,9 @@ class RecognitionRuleBlock(RuleBlock):
         block_success = False
 
         for rule in self._rules:
+            # Don't bother with rules which can't match this sentence
+            if not rule._triggered(sent):
+                continue
             (sent, success) = rule.apply(sent)
             if success:
                 block_success = True
@@ -1,8 +1,13 @@
+import copy
+import logging
 import re
 from ternip.rule_engine.recognition_rule import RecognitionRule
 from ternip.rule_engine.recognition_rule_block import RecognitionRuleBlock
 from ternip.rule_engine.rule_engine import RuleEngine, RuleLoadError
+from ternip.rule_engine.sentence_text import SentenceText
+from ternip.sentence import Sentence
 
+LOGGER = logging.getLogger(__name__)
 
 class RecognitionRuleEngine(RuleEngine):
     """
@@ -13,11 +18,23 @@ class RecognitionRuleEngine(RuleEngine):
     list) which consists of IDs that must have run before this rule.
     Additionally, a function called 'apply' which takes a list of
     (token, pos, timexes) tuples and returns them in the same form with
-    potentially modified timexes.
+    potentially modified timexes. Complex rules which only ever change
+    timexes that are already in the sentence (rather than recognising new
+    ones) should have a member called 'needs_timexes' set to True.
     """
 
     _block_type = RecognitionRuleBlock
 
+    def __init__(self):
+        super(RecognitionRuleEngine, self).__init__()
+
+        # If this is set, then every sentence is also run through the full set
+        # of rules, to check skipping sentences (and rules) which can't match
+        # makes no difference. Sentences where it does are put in
+        # gate_disagreements.
+        self.verify_gate = False
+        self.gate_disagreements = []
+
     def _load_rule(self, filename, rulelines):
         """
         Load a 'simple' recognition rule
@@ -37,6 +54,7 @@ class RecognitionRuleEngine(RuleEngine):
         after = []
         case_sensitive = False
         deliminate_numbers = False
+        triggers = []
 
         for key in d:
             # Only one 'Type field allowed
@@ -111,6 +129,8 @@ class RecognitionRuleEngine(RuleEngine):
                 before_guards = d[key]
             elif key == 'after-guard':
                 after_guards = d[key]
+            elif key == 'trigger':
+                triggers = d[key]
 
             # error on unknown fields
             else:
@@ -125,7 +145,7 @@ class RecognitionRuleEngine(RuleEngine):
         # Guard against any RE errors
         try:
             return RecognitionRule(match, type, id, guards, after_guards, before_guards, after, squelch, case_sensitive,
-                deliminate_numbers)
+                deliminate_numbers, triggers)
         except re.error as e:
             raise RuleLoadError(filename, "Malformed regular expression: " + str(e))
         except (SyntaxError, ValueError) as e:
@@ -136,36 +156,91 @@ class RecognitionRuleEngine(RuleEngine):
         This function actually does word recognition. It expects content to be
         split into tokenised, POS tagged, sentences. i.e., a list of lists of
         tuples ([[(token, pos-tag, timexes), ...], ...]). Rules are applied one
-        at a time.
+        at a time, respecting the 'after' ordering between them.
         
         What is returned is in the same form, except the token tuples contain a
         third element consisting of the set of timexes associated with that
         token.
         """
 
-        # Apply rules on one sentence at a time
+        # Apply rules on one sentence at a time, in the order given by the
+        # execution plan compiled when the rules were loaded. Sentences are
+        # kept as Sentence objects, so the rendered form of the sentence can
+        # be shared between rules.
         r = []
         for sent in sents:
-            rules_run = set()
-            rules_to_run = set(self._rules)
-
-            # Apply rules until all rules have been applied
-            while rules_to_run:
-                for rule in rules_to_run.copy():
-                    # Check that if 'after' is defined, the rules we must run
-                    # after have run
-                    after_ok = True
-                    for aid in rule.after:
-                        if aid not in rules_run:
-                            after_ok = False
-
-                    # Apply this rule, and update our states of rules waiting to
-                    # run and rules that have been run
-                    if after_ok:
-                        (sent, success) = rule.apply(sent)
-                        rules_run.add(rule.id)
-                        rules_to_run.remove(rule)
+            sent = Sentence(sent)
+
+            if self.verify_gate:
+                full = self._apply_rules(copy.deepcopy(sent), self._select_all)
+
+            # Most sentences have nothing in them any rule could match, so
+            # don't run any rules on those at all
+            if self._could_match(sent):
+                sent = self._apply_rules(sent, self._select)
+
+            if self.verify_gate and self._timex_extents(full) != self._timex_extents(sent):
+                text = SentenceText.of(sent).text
+                LOGGER.warning('Skipping rules which could not match changed the result for: ' + text)
+                self.gate_disagreements.append(text)
 
             r.append(sent)
 
         return r
+
+    def _could_match(self, sent):
+        """
+        Whether any rule could change this sentence
+        """
+        if len(sent.timexes()) > 0:
+            # Rules may act on timexes which are already here
+            return True
+        return self._index.could_match(lambda key: RecognitionRule._trigger_text(key, sent))
+
+    def _select(self, sent):
+        """
+        The rules whose triggers are in this sentence, in plan order, along
+        with their positions in the plan
+        """
+        return self._index.select(lambda key: RecognitionRule._trigger_text(key, sent))
+
+    def _select_all(self, sent):
+        """
+        All of the rules, for when checking the gate
+        """
+        return list(enumerate(self._plan))
+
+    def _apply_rules(self, sent, select):
+        """
+        Apply the rules picked by select to the sentence, in order
+        """
+        text = SentenceText.of(sent).text
+        rules = select(sent)
+
+        n = 0
+        while n < len(rules):
+            (i, rule) = rules[n]
+            n += 1
+            (sent, success) = rule.apply(sent)
+            if not isinstance(sent, Sentence):
+                sent = Sentence(sent)
+
+            # If the rule changed the tokens, the triggers in the sentence may
+            # have changed too
+            if SentenceText.of(sent).text != text:
+                text = SentenceText.of(sent).text
+                rules = [(j, rule) for (j, rule) in select(sent) if j > i]
+                n = 0
+
+        return sent
+
+    def _timex_extents(self, sent):
+        """
+        The type and tokens covered by each timex in the sentence, in a form
+        which can be compared between copies of the sentence
+        """
+        extents = {}
+        for (i, (tok, pos, ts)) in enumerate(sent):
+            for t in ts:
+                extents.setdefault(t, []).append(i)
+        return sorted((t.type, tuple(toks)) for (t, toks) in extents.items())
@@ -1,11 +1,43 @@
 import re
 from ternip.rule_engine import expressions
+from ternip.rule_engine.sentence_text import SentenceText, deliminate_numbers
+from ternip.rule_engine.triggers import find_triggers, triggered
+
+# Compiled regular expressions, by the expression as written in the rule, the
+# tokenise mode it is prepared with and the flags it is compiled with, so
+# rules which use the same one share it
+_compiled = {}
+
+# The constants which can be used in Match and Guard expressions, in the order
+# _prep_re substitutes them
+_CONSTANTS = [(re.compile(r'\$' + name), getattr(expressions, name)) for name in
+    ['ORDINAL_WORDS', 'ORDINAL_NUMS', 'DAYS', 'MONTHS', 'MONTH_ABBRS', 'RELATIVE_DAYS', 'DAY_HOLIDAYS',
+     'NTH_DOW_HOLIDAYS', 'FIXED_HOLIDAYS', 'LUNAR_HOLIDAYS', 'UNITS']]
+
+_WHITESPACE = re.compile(r'\s')
+_UNESCAPED_DOT = re.compile(r'(?<!\\)\.')
 
 class Rule(object):
     """
     Base class for recognition and normalisation rules
     """
 
+    # What must be in the text the rule is matched against for the rule to
+    # match: a list of (key, required) tuples, where key is the kind of text
+    # (as understood by _trigger_text), and required is a list of sets of
+    # strings, at least one string from each of which must be in that text.
+    # None means the rule must always be tried.
+    triggers = None
+
+    # The order the rule checks its guards and match regex in, as a
+    # ConditionOrder, or None if the rule doesn't keep one
+    _conditions = None
+
+    # Estimates of how often match regexes and guards rule text out, for
+    # before a rule has been used
+    _MATCH_FAILURE_RATE = 0.9
+    _GUARD_FAILURE_RATE = 0.5
+
     def _prep_re(self, exp, tokenise=True):
         """
         Prepare a regular expression which uses <> for token boundaries.
@@ -24,17 +56,8 @@ class Rule(object):
         $FIXED_HOLIDAYS - holidays which have a fixed date
         $LUNAR_HOLIDAYS - holidays which are relative to Easter
         """
-        exp = re.sub(r'\$ORDINAL_WORDS', expressions.ORDINAL_WORDS, exp)
-        exp = re.sub(r'\$ORDINAL_NUMS', expressions.ORDINAL_NUMS, exp)
-        exp = re.sub(r'\$DAYS', expressions.DAYS, exp)
-        exp = re.sub(r'\$MONTHS', expressions.MONTHS, exp)
-        exp = re.sub(r'\$MONTH_ABBRS', expressions.MONTH_ABBRS, exp)
-        exp = re.sub(r'\$RELATIVE_DAYS', expressions.RELATIVE_DAYS, exp)
-        exp = re.sub(r'\$DAY_HOLIDAYS', expressions.DAY_HOLIDAYS, exp)
-        exp = re.sub(r'\$NTH_DOW_HOLIDAYS', expressions.NTH_DOW_HOLIDAYS, exp)
-        exp = re.sub(r'\$FIXED_HOLIDAYS', expressions.FIXED_HOLIDAYS, exp)
-        exp = re.sub(r'\$LUNAR_HOLIDAYS', expressions.LUNAR_HOLIDAYS, exp)
-        exp = re.sub(r'\$UNITS', expressions.UNITS, exp)
+        for (constant, value) in _CONSTANTS:
+            exp = constant.sub(value, exp)
 
         if tokenise is True:
             # This code is modified from NLTK's text.py for dealing with pattern
@@ -45,36 +68,68 @@ class Rule(object):
             # Bird, Steven, Edward Loper and Ewan Klein (2009).
             # Natural Language Processing with Python.  O'Reilly Media Inc.
 
-            exp = re.sub(r'\s', '', exp)
-            exp = re.sub(r'<', '(?:<(?:', exp)
-            exp = re.sub(r'>', ')>)', exp)
-            exp = re.sub(r'(?<!\\)\.', '[^>]', exp)
+            exp = _WHITESPACE.sub('', exp)
+            exp = exp.replace('<', '(?:<(?:')
+            exp = exp.replace('>', ')>)')
+            exp = _UNESCAPED_DOT.sub('[^>]', exp)
 
             # End NLTK contribution
 
             # Fix for NUM_START/NUM_ORD_START which really wants to match on ., but
             # in a non-greedy way
-            exp = re.sub(r'_START\[\^>\]', '_START(?:.(?!NUM_START))', exp)
+            exp = exp.replace('_START[^>]', '_START(?:.(?!NUM_START))')
 
         return exp
 
+    def _compile(self, exp, flags=0, tokenise=True):
+        """
+        Prepare (as _prep_re does) and compile a regular expression, or return
+        the same expression already compiled for another rule
+        """
+        key = (exp, tokenise, flags)
+        try:
+            return _compiled[key]
+        except KeyError:
+            compiled = _compiled[key] = re.compile(self._prep_re(exp, tokenise), flags)
+            return compiled
+
     def _toks_to_str(self, toks):
         """
         Takes a list of (token, pos_tag, timexes) and converts it into the
         <token~pos> format for matching
         """
+        return SentenceText.of(toks).text
 
-        # This code is modified from NLTK's text.py for dealing with pattern
-        # matching with tokenised strings, under the Apache License 2.0
-
-        # Natural Language Toolkit (NLTK) http://www.nltk.org/
-        # Copyright (C) 2001-2010 NLTK Project
-        # Bird, Steven, Edward Loper and Ewan Klein (2009).
-        # Natural Language Processing with Python.  O'Reilly Media Inc.
+    def _load_triggers(self, key, triggers, match):
+        """
+        Set the triggers for this rule, which are looked for in the text of
+        the kind given by key. If no triggers are given, then they are worked
+        out from the compiled match regex.
+        """
+        if triggers:
+            if match.flags & re.IGNORECASE:
+                triggers = [trigger.lower() for trigger in triggers]
+            self.triggers = [(key, [frozenset(triggers)])]
+        else:
+            required = find_triggers(match.pattern, match.flags)
+            if required is not None:
+                self.triggers = [(key, required)]
+            else:
+                self.triggers = None
 
-        return ''.join('<' + w + '~' + pos + '>' for (w, pos, ts) in toks)
+    def _trigger_text(self, key, toks):
+        """
+        Returns the text of the kind given by key (as used in triggers) for a
+        list of (token, pos_tag, timexes)
+        """
+        raise NotImplementedError()
 
-        # End NLTK contribution
+    def _triggered(self, toks):
+        """
+        Whether or not the triggers for this rule are in the list of
+        (token, pos_tag, timexes), i.e., whether this rule could match it
+        """
+        return triggered(self.triggers, lambda key: self._trigger_text(key, toks))
 
     def _load_guards(self, guards, tokenise=True):
         """
@@ -86,114 +141,83 @@ class Rule(object):
 
         for guard in guards:
             if guard[0] == '!':
-                neg.append(re.compile(self._prep_re(guard[1:], tokenise), re.IGNORECASE))
+                neg.append(self._compile(guard[1:], re.IGNORECASE, tokenise))
             else:
-                pos.append(re.compile(self._prep_re(guard, tokenise), re.IGNORECASE))
+                pos.append(self._compile(guard, re.IGNORECASE, tokenise))
 
         return (pos, neg)
 
-    def _check_guards(self, to_check, (pos, neg)):
+    def _match_condition(self, size):
+        """
+        The condition of the match regex finding something, for a ConditionOrder,
+        where size is how long the text it searches is, relative to other
+        conditions
+        """
+        return 'match', size, self._MATCH_FAILURE_RATE
+
+    def _guard_condition(self, name, (pos, neg), size):
+        """
+        A list of the condition of the guards loaded by _load_guards holding,
+        for a ConditionOrder, or an empty list if there are no guards. size is
+        how long the text the guards search is, relative to other conditions.
+        """
+        if len(pos) + len(neg) == 0:
+            return []
+        return [(name, (len(pos) + len(neg)) * size, self._GUARD_FAILURE_RATE)]
+
+    @property
+    def condition_order(self):
+        """
+        The guards and match regex of this rule, in the order they are
+        currently checked in, along with how much each is estimated to cost
+        to check and how often it fails, in (name, cost, failure_rate) tuples
+        """
+        if self._conditions is None:
+            return []
+        return self._conditions.describe()
+
+    def _check_guards(self, to_check, (pos, neg), searches=None):
         """
         Given some text to check, and a tuple of positive and negative rules,
-        check whether that text satisfies those guards
+        check whether that text satisfies those guards.
+
+        If searches is given, it is a dictionary the results of searching
+        text with each guard are remembered in, so rules with the same guards
+        checking the same text only search it once
         """
 
         # first check positive rules
         for guard in pos:
-            if not guard.search(to_check):
+            if not self._search(guard, to_check, searches):
                 return False
 
         # then negative rules
         for guard in neg:
-            if guard.search(to_check):
+            if self._search(guard, to_check, searches):
                 return False
 
         return True
 
+    @staticmethod
+    def _search(guard, to_check, searches):
+        """
+        Whether the guard is found in the text, remembered in searches
+        """
+        if searches is None:
+            return guard.search(to_check) is not None
+        key = (guard, to_check)
+        try:
+            return searches[key]
+        except KeyError:
+            found = searches[key] = guard.search(to_check) is not None
+            return found
+
     def _do_deliminate_numbers(self, sent):
         """
         Translation of GUTime function 'deliminateNumbers' - marks up number
         sequences
         """
-
-        rest = sent
-        sent = ''
-        previous_word = ''
-        current_word = ''
-
-        in_number = False
-
-        while re.search(r'<[a-zA-Z-]+~.+?>', rest):
-            m = re.search(r'<(?P<word>[a-zA-Z-]+)~(?P<pos>.+?)>', rest)
-            sent += m.string[:m.start()]
-            rest = m.string[m.end():]
-
-            current_word = m.group('word')
-
-            # Get next word
-            n = re.search(r'<(?P<word>[a-zA-Z-]+)~(?P<pos>.+?)>', rest)
-            if n is not None:
-                next_word = n.group('word')
-            else:
-                next_word = ''
-
-            # the following deals reasonably well with hypenated numbers like "twenty-one"
-            if re.match(expressions.NUMBER_TERM + '(-' + expressions.NUMBER_TERM + ')*', current_word, re.I) is not None:
-                # This current word is identified as a number
-                if not in_number:
-                    # first in (possible) series of numbers
-                    to_add = 'NUM_START<' + m.group('word') + '~' + m.group('pos') + '>'
-                    in_number = True
-                else:
-                    # either not first in series, or between ordinal and regular nums (i.e. "first two")
-                    if (re.search(expressions.ORD_UNIT_NUMS + r'$', previous_word) is not None) or (re.search(expressions.ORD_OTHER_NUMS + r'$', previous_word) is not None):
-                        # between ordinal and regular
-                        sent = re.sub(r'(NUM_START((.(?!NUM_START))*))$', r'NUM_ORD_START\2', sent)  # replace with NUM_ORD_START
-                        sent += 'NUM_ORD_END'
-                        to_add = 'NUM_START<' + m.group('word') + '~' + m.group('pos') + '>'
-                    else:
-                        # number is continuing
-                        to_add = '<' + m.group('word') + '~' + m.group('pos') + '>'
-
-            else:
-                # current word is not a number
-                if in_number:
-                    # previous word was a number
-                    # following works fairly well...it avoids marking things like "six and two" as a single
-                    # number while still marking things like "two hundred and one" as a single number
-                    if (current_word.lower() == 'and') and\
-                       (re.search(expressions.HIGHER_NUMS, previous_word, re.I) is not None) and\
-                       ((re.search(expressions.UNIT_NUMS, next_word, re.I) is not None) or
-                        (re.search(expressions.UNIQUE_NUMS, next_word, re.I) is not None) or
-                        (re.search(
-                            expressions.TENS_NUMS + '(-' + expressions.UNIT_NUMS + '|' + expressions.ORD_UNIT_NUMS + ')?',
-                            next_word, re.I) is not None) or
-                        (re.search(expressions.ORD_UNIT_NUMS, next_word, re.I) is not None) or
-                        (re.search(expressions.ORD_OTHER_NUMS, next_word, re.I) is not None)):
-                        to_add = '<' + m.group('word') + '~' + m.group('pos') + '>'
-                    else:
-                        # number doesn't continue
-                        in_number = False
-                        if (re.search(expressions.ORD_UNIT_NUMS + r'$', previous_word) is not None) or (
-                            re.search(expressions.ORD_OTHER_NUMS + r'$', previous_word) is not None):
-                            sent = re.sub(r'(NUM_START((.(?!NUM_START))*))$', r'NUM_ORD_START\2',
-                                sent) # replace with NUM_ORD_START
-                            sent += 'NUM_ORD_END'
-                        else:
-                            sent += 'NUM_END'
-                        to_add = '<' + m.group('word') + '~' + m.group('pos') + '>'
-                else:
-                    to_add = '<' + m.group('word') + '~' + m.group('pos') + '>'
-
-            sent += to_add
-            previous_word = current_word
-
-        if re.match(expressions.NUMBER_TERM + '(-' + expressions.NUMBER_TERM + ')*', current_word, re.I) is not None:
-            # final word is a number
-            sent += 'NUM_END'
-
-        sent += rest
-        return sent
+        return deliminate_numbers(sent)
 
     def _set_timex_extents(self, t, sent, ti, tj, squelch):
         """
@@ -201,14 +225,12 @@ class Rule(object):
         (i.e., between the extents ti, tj). If squelch is set, remove timexes
         between those extents.
         """
-        for i in range(len(sent)):
-            # now get all tokens in the range and add the new timex if needed
-            if i >= ti and i < tj:
-                if squelch:
-                    # in the case of this being a squelch rule, remove the
-                    # timexes
-                    sent[i] = (sent[i][0], sent[i][1], set())
-                else:
-                    # otherwise add the new timex to the list of timexes
-                    # associated with this token
-                    sent[i][2].add(t)
+        for i in range(ti, tj):
+            if squelch:
+                # in the case of this being a squelch rule, remove the
+                # timexes
+                sent[i] = (sent[i][0], sent[i][1], set())
+            else:
+                # otherwise add the new timex to the list of timexes
+                # associated with this token
+                sent[i][2].add(t)
@@ -1,4 +1,5 @@
 from ternip.rule_engine.rule_engine import RuleLoadError
+from ternip.rule_engine.triggers import merge_triggers
 
 class RuleBlock(object):
     def __init__(self, id, after, type, rules):
@@ -15,6 +16,7 @@ class RuleBlock(object):
         self.id = id
         self.after = after
         self._rules = rules
+        self.triggers = merge_triggers(rules)
         if type == 'until-success' or type == 'all':
             self._type = type
         else:
@@ -0,0 +1,200 @@
+import cPickle
+import hashlib
+import imp
+import logging
+import marshal
+import os
+import os.path
+import stat
+import sys
+import tempfile
+from glob import glob
+
+import ternip
+
+LOGGER = logging.getLogger(__name__)
+
+# Rules loaded so far in this process, keyed on the engine type, rule path and
+# cache key, so asking for the same rules again doesn't load them again
+_registry = {}
+
+# The cache key of the rules loaded by shared_engine, along with the size and
+# modification time of each rule file it was worked out from, keyed on the
+# engine type and rule path, so the files are only hashed again once they
+# change
+_keys = {}
+
+# The hash of the source of TERNIP, once worked out
+_source_hash = None
+
+
+def rule_files(path):
+    """
+    The rule files in a directory, in the order RuleEngine.load_rules loads
+    them in: simple rules, then rule blocks, then complex rules
+    """
+    files = []
+    for extension in ['*.rule', '*.ruleblock', '*.pyrule']:
+        files.extend(sorted(glob(os.path.join(path, extension))))
+    return files
+
+
+def source_hash():
+    """
+    A hash of the source of every module in the installed TERNIP package. The
+    cached rules depend on more than the rule engine (e.g., which names rule
+    expressions are compiled to call as helpers, and the classes pickled along
+    with the rules), so all of it is hashed. This is only worked out once in
+    each process.
+    """
+    global _source_hash
+    if _source_hash is None:
+        package = os.path.dirname(os.path.abspath(ternip.__file__))
+        filenames = []
+        for (dirpath, dirnames, files) in os.walk(package):
+            filenames.extend(os.path.join(dirpath, filename) for filename in files if filename.endswith('.py'))
+        h = hashlib.sha1()
+        for filename in sorted(filenames):
+            with open(filename, 'rb') as fd:
+                h.update(os.path.relpath(filename, package) + '\0' + hashlib.sha1(fd.read()).hexdigest() + '\0')
+        _source_hash = h.hexdigest()
+    return _source_hash
+
+
+def cache_key(engine_type, path):
+    """
+    Works out the key the rules at path are cached under when loaded by an
+    engine of the given type. This is a hash of the contents of each rule file,
+    the TERNIP version, and the source of TERNIP itself, so any change to those
+    means the rules are loaded afresh.
+    """
+    h = hashlib.sha1()
+    h.update(ternip.VERSION + '\0' + sys.version + '\0')
+    h.update(engine_type.__module__ + '.' + engine_type.__name__ + '\0')
+    h.update(source_hash() + '\0')
+
+    for filename in rule_files(path):
+        with open(filename, 'rb') as fd:
+            h.update(os.path.basename(filename) + '\0' + hashlib.sha1(fd.read()).hexdigest() + '\0')
+
+    return h.hexdigest()
+
+
+def _stamp(path):
+    """
+    The name, size and modification time of each rule file at path, which
+    change whenever the rules are edited
+    """
+    stamp = []
+    for filename in rule_files(path):
+        st = os.stat(filename)
+        stamp.append((filename, st.st_size, st.st_mtime))
+    return stamp
+
+
+def compile_pyrule(filename):
+    """
+    Compile the code for a complex (.pyrule) rule file
+    """
+    with open(filename, 'rU') as fd:
+        return compile(fd.read(), filename, 'exec')
+
+
+def load_pyrule(filename, code):
+    """
+    Run the compiled code for a complex rule file as a module (as
+    imp.load_source would), and return an instance of its rule class
+    """
+    modname = os.path.basename(filename)[:-7]
+    module = imp.new_module(modname)
+    module.__file__ = filename
+    sys.modules[modname] = module
+    exec code in module.__dict__
+    return module.rule()
+
+
+def load(cache_dir, key):
+    """
+    Load cached rules. Returns a tuple of the list of rules, the number of
+    rules they count as (i.e., counting the rules in blocks), and a list of
+    (filename, code) tuples for the complex rules in the same order as
+    load_rules loads them, or None if nothing is cached under that key.
+
+    Loading the cache runs the code in it, so a cache file is only loaded if
+    it belongs to the current user, and nobody else can write to it.
+    """
+    filename = os.path.join(cache_dir, key + '.rules')
+    if not os.path.exists(filename):
+        return None
+    if not _private(filename):
+        LOGGER.warning('Not loading rule cache ' + filename + ', as it may have been written by another user')
+        return None
+    try:
+        with open(filename, 'rb') as fd:
+            (rules, num_rules, pyrules) = cPickle.load(fd)
+        return rules, num_rules, [(pyrule, marshal.loads(code)) for (pyrule, code) in pyrules]
+    except Exception:
+        # A broken cache just means the rules get loaded from scratch
+        LOGGER.debug('Could not read rule cache ' + filename, exc_info=True)
+        return None
+
+
+def save(cache_dir, key, rules, num_rules, pyrules):
+    """
+    Save loaded rules (in the same form load returns) into the cache. Failing
+    to write the cache is not an error, as the rules can always be loaded from
+    scratch.
+    """
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0700)
+
+        # Write to a temporary file and move it into place, so other processes
+        # never see a half-written cache
+        (fd, tmp) = tempfile.mkstemp(dir=cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                cPickle.dump((rules, num_rules, [(pyrule, marshal.dumps(code)) for (pyrule, code) in pyrules]), f,
+                    cPickle.HIGHEST_PROTOCOL)
+            os.rename(tmp, os.path.join(cache_dir, key + '.rules'))
+        except:
+            os.remove(tmp)
+            raise
+    except Exception:
+        LOGGER.debug('Could not write rule cache in ' + cache_dir, exc_info=True)
+
+
+def _private(filename):
+    """
+    Whether a file belongs to the current user, and can't be written to by
+    anybody else
+    """
+    st = os.stat(filename)
+    if hasattr(os, 'getuid') and st.st_uid != os.getuid():
+        return False
+    return not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def shared_engine(engine_type, path, cache_dir=None):
+    """
+    Returns a new engine of the given type with the rules at path loaded. The
+    rules are only loaded once in each process, after which they are shared
+    between all the engines which use them (rules don't change once loaded).
+    If cache_dir is given, the rules are also cached on disk there between
+    processes. Rule files edited while the process is running are loaded
+    afresh the next time they are asked for.
+    """
+    engine = engine_type()
+    path = os.path.abspath(path)
+    stamp = _stamp(path)
+    memo = _keys.get((engine_type, path))
+    if memo is None or memo[0] != stamp:
+        memo = _keys[(engine_type, path)] = (stamp, cache_key(engine_type, path))
+    key = (engine_type, path, memo[1])
+    if key in _registry:
+        (rules, num_rules) = _registry[key]
+        engine._add_rules(rules, num_rules)
+    else:
+        engine.load_rules(path, cache_dir)
+        _registry[key] = (list(engine._rules), engine.num_rules)
+    return engine
@@ -0,0 +1,110 @@
+import keyword
+import re
+import StringIO
+import tokenize
+import types
+
+from ternip.rule_engine import expressions
+from ternip.rule_engine.normalisation_functions import calendar_arithmetic
+from ternip.rule_engine.normalisation_functions import date_functions
+from ternip.rule_engine.normalisation_functions import relative_date_functions
+from ternip.rule_engine.normalisation_functions import string_conversions
+from ternip.rule_engine.normalisation_functions import words_to_num
+
+# The arguments each compiled expression is called with, which are the names
+# rule expressions can refer to, along with the helpers (see _helpers)
+ARGUMENTS = ['match', 'timex', 'cur_context', 'dct', 'body', 'before', 'after', 'self']
+
+
+def compile_expressions(id, expressions, groups):
+    """
+    Turns the Python expressions of a normalisation rule (e.g., its Value and
+    Freq) into the code of a module which defines a function for each of them.
+
+    id is the ID of the rule, used as the file name of the code in tracebacks,
+    expressions is a list of (name, expression) tuples, where name is the name
+    the function for the expression is given, and groups is the number of
+    groups in the match regex of the rule.
+
+    The expressions can contain our group short form, e.g., {#6}, for the
+    groups of the match. Groups which exist are taken out of the match when the
+    function is called, others are left to fail when they are reached, as they
+    would have done if the expression was evaluated directly. Helpers the
+    expressions use are bound to the function when it is defined, rather than
+    being looked up each time it is called.
+
+    The code returned can be marshalled, and is turned into functions with
+    load_expressions. The function for each expression is called '_' followed
+    by its name. Raises SyntaxError for malformed expressions.
+    """
+    source = []
+    for (name, exp) in expressions:
+        source.append(_function_source(id, name, exp, groups))
+    return compile('\n'.join(source), id, 'exec')
+
+
+def load_expressions(code):
+    """
+    Runs code returned by compile_expressions, returning the namespace holding
+    the functions it defines
+    """
+    namespace = dict(_HELPERS)
+    exec code in namespace
+    return namespace
+
+
+def _function_source(id, name, exp, groups):
+    """
+    The source code of a function which evaluates the expression
+    """
+    # it would be nice to support named groups, but this'll do for now
+    exp = re.sub(r'\{#(\d+)\}', r'match.group(\1)', exp)
+
+    # Give the same error for malformed expressions as compiling them
+    # directly would
+    compile(exp, id + ':' + name, 'eval')
+
+    # Find the groups and helpers the expression uses
+    replacements = []
+    used_groups = set()
+    used_helpers = set()
+    toks = list(tokenize.generate_tokens(StringIO.StringIO(exp).readline))
+    for (i, (type, string, start, end, line)) in enumerate(toks):
+        if type != tokenize.NAME or (i > 0 and toks[i - 1][1] == '.'):
+            continue
+        call = [tok[1] for tok in toks[i:i + 6]]
+        if call[:4] == ['match', '.', 'group', '('] and len(call) == 6 and call[5] == ')' and call[4].isdigit() \
+           and int(call[4]) <= groups:
+            n = int(call[4])
+            used_groups.add(n)
+            replacements.append((start[1], toks[i + 5][3][1], '_group' + str(n)))
+        elif string in _HELPERS and string not in ARGUMENTS and not keyword.iskeyword(string):
+            used_helpers.add(string)
+
+    for (start, end, replacement) in reversed(replacements):
+        exp = exp[:start] + replacement + exp[end:]
+
+    args = ARGUMENTS + [helper + '=' + helper for helper in sorted(used_helpers)]
+    lines = ['def _' + name + '(' + ', '.join(args) + '):']
+    for n in sorted(used_groups):
+        lines.append('    _group' + str(n) + ' = match.group(' + str(n) + ')')
+    lines.append('    return (' + exp + ')')
+    return '\n'.join(lines) + '\n'
+
+
+def _helpers():
+    """
+    Everything expressions can use, other than their arguments: the functions
+    and constants defined in each of the helper modules (but not what those
+    modules import), and the re module, which rules use for matching
+    """
+    helpers = {'re': re}
+    for module in [expressions, calendar_arithmetic, date_functions, relative_date_functions, string_conversions,
+                   words_to_num]:
+        for (name, value) in vars(module).items():
+            if not name.startswith('_') and not isinstance(value, types.ModuleType) and \
+               getattr(value, '__module__', module.__name__) == module.__name__:
+                helpers[name] = value
+    return helpers
+
+_HELPERS = _helpers()
@@ -2,8 +2,10 @@
 
 from collections import defaultdict
 from glob import glob
-import imp
+import heapq
 import os.path
+from ternip.rule_engine import rule_cache
+from ternip.rule_engine.triggers import TriggerIndex
 
 class RuleEngine(object):
     """
@@ -14,23 +16,40 @@ class RuleEngine(object):
 
     def __init__(self):
         self._rules = []
+        self._plan = []
+        self._index = TriggerIndex([])
         self.num_rules = 0
 
-    def load_rules(self, path):
+    def load_rules(self, path, cache_dir=None):
         """
         Do rule loading. Loads all files ending in .pyrule as 'complex' rules
         (direct Python code), .rule using the documented rule format, and
         .ruleblock as blocks which contain sequences of rules.
         For direct Python code, the rule must be a class called 'rule'.
+
+        If cache_dir is set, the loaded rules are cached in that directory, and
+        loaded straight from there next time, as long as none of the rule files
+        (or TERNIP itself) have changed.
         
         Throws rule_load_errors containing errors for all rules that failed to
         load.
         """
 
+        if cache_dir is not None:
+            key = rule_cache.cache_key(type(self), path)
+            cached = rule_cache.load(cache_dir, key)
+            if cached is not None:
+                (rules, num_rules, pyrules) = cached
+                self._add_rules(rules + [rule_cache.load_pyrule(file, code) for (file, code) in pyrules], num_rules)
+                return
+
         errors = []
+        first = len(self._rules)
+        num_rules = self.num_rules
+        pyrules = []
 
         # First load simple rules
-        for filename in glob(os.path.join(path, '*.rule')):
+        for filename in sorted(glob(os.path.join(path, '*.rule'))):
             # don't bail out after one load failure, load them all and report
             # all at once
             with open(filename) as fd:
@@ -41,41 +60,53 @@ class RuleEngine(object):
                     errors.append(e)
 
         # Then rule blocks
-        for file in glob(os.path.join(path, '*.ruleblock')):
+        for file in sorted(glob(os.path.join(path, '*.ruleblock'))):
             try:
                 self._rules.append(self._load_block(file))
                 self.num_rules += len(self._rules[-1]._rules)
             except RuleLoadError as e:
                 errors.append(e)
             except RuleLoadErrors as e:
-                for error in e.errors:
-                    errors.append(e)
+                errors.extend(e.errors)
 
         # Then complex rules
-        for file in glob(os.path.join(path, '*.pyrule')):
-            (dir, modname) = os.path.split(file)
-            modname = modname[:-7]
-            self._rules.append(imp.load_source(modname, file).rule())
+        simple_rules = self._rules[first:]
+        for file in sorted(glob(os.path.join(path, '*.pyrule'))):
+            code = rule_cache.compile_pyrule(file)
+            pyrules.append((file, code))
+            self._rules.append(rule_cache.load_pyrule(file, code))
             self.num_rules += 1
 
         # Now, check the rule's we've just loaded for consistency
         try:
             self._check_rule_consistency()
         except RuleLoadErrors as e:
-            for error in e.errors:
-                errors.append(e)
+            errors.extend(e.errors)
 
         # Bulk raise any errors that occurred
         if len(errors) > 0:
             raise RuleLoadErrors(errors)
 
+        if cache_dir is not None:
+            rule_cache.save(cache_dir, key, simple_rules, self.num_rules - num_rules, pyrules)
+
+    def _add_rules(self, rules, num_rules):
+        """
+        Add rules which have already been loaded (which count as num_rules
+        rules), then check for consistency
+        """
+        self._rules.extend(rules)
+        self.num_rules += num_rules
+        self._check_rule_consistency()
+
     def load_rule(self, filename):
         """
         Load a rule, then check for consistency
         
         Throws rule_load_error if a rule fails to load
         """
-        self._rules.append(self._load_rule(filename))
+        with open(filename) as fd:
+            self._rules.append(self._load_rule(filename, fd.readlines()))
         self._check_rule_consistency()
 
     def load_block(self, filename):
@@ -169,36 +200,141 @@ class RuleEngine(object):
             return self._block_type(id, header['after'], type, rules)
 
     def _check_rule_consistency(self):
-        """ Check that the rules are internally consistent """
+        """
+        Check that the rules are internally consistent, and compile the
+        execution plan for the rules which can be run
+        """
 
         errors = []
 
         # First, get all rule IDs and then all IDs mentioned as after IDs
-        rule_ids = dict()
+        rule_ids = defaultdict(list)
         for rule in self._rules:
             if rule.id in rule_ids:
                 errors.append(RuleLoadError(rule.id, 'Duplicate ID!'))
-            else:
-                rule_ids[rule.id] = rule
+            rule_ids[rule.id].append(rule)
 
-        # Now check each referred to after ID exists
+        # Now check each referred to after ID exists, and build up the graph of
+        # which rules must run before which
+        depends_on = []
         for rule in self._rules:
-            circular_check = True
+            deps = set()
             for after in rule.after:
                 if after not in rule_ids:
                     errors.append(RuleLoadError(rule.id, 'Reference made to non-existant rule'))
-                    # If this happens, don't check for circular references, as
-                    # there are dangling references and it causes errors
-                    circular_check = False
+                    # A rule with a dangling reference can never be run
+                    deps.add(None)
+                else:
+                    deps.update(rule_ids[after])
+            depends_on.append(deps)
+
+        # and check each rule for any circular references
+        for rule in self._find_circular(depends_on):
+            errors.append(RuleLoadError(rule.id, 'Circular dependency - rule must run after itself'))
 
-            # and check each rule for any circular references
-            if circular_check and self._circular_check(rule.id, rule, rule_ids):
-                errors.append(RuleLoadError(rule.id, 'Circular dependency - rule must run after itself'))
+        # Rules which can not be run are left out of the plan, rather than
+        # holding up the rules which can be
+        self._plan = self._compile_plan(depends_on)
+        self._index = TriggerIndex(self._plan)
 
         # Bulk raise any errors that occurred
         if len(errors) > 0:
             raise RuleLoadErrors(errors)
 
+    def _compile_plan(self, depends_on):
+        """
+        Given the set of rules each rule depends on (indexed in the same order
+        as self._rules), return the rules in the order they should be run in.
+        Rules which are not constrained by 'after' are run in the order they
+        were loaded. Rules which depend on missing rules, or which are part of
+        (or depend on) a circular dependency are left out.
+        """
+
+        index = dict((id(rule), i) for (i, rule) in enumerate(self._rules))
+        waiting_for = [0] * len(self._rules)
+        dependants = [[] for rule in self._rules]
+        ready = []
+
+        for (i, deps) in enumerate(depends_on):
+            if None in deps:
+                # Dangling reference, so this rule is never ready
+                waiting_for[i] = -1
+                continue
+            waiting_for[i] = len(deps)
+            for dep in deps:
+                dependants[index[id(dep)]].append(i)
+            if waiting_for[i] == 0:
+                ready.append(i)
+
+        heapq.heapify(ready)
+        plan = []
+        while ready:
+            i = heapq.heappop(ready)
+            plan.append(self._rules[i])
+            for j in dependants[i]:
+                waiting_for[j] -= 1
+                if waiting_for[j] == 0:
+                    heapq.heappush(ready, j)
+
+        return plan
+
+    def _find_circular(self, depends_on):
+        """
+        Returns the rules which are part of a circular dependency, i.e., the
+        rules which must run after themselves. This is Tarjan's strongly
+        connected components algorithm, done iteratively so long chains of
+        rules don't hit the recursion limit.
+        """
+
+        index = dict((id(rule), i) for (i, rule) in enumerate(self._rules))
+        edges = [[index[id(dep)] for dep in deps if dep is not None] for deps in depends_on]
+
+        circular = []
+        order = [None] * len(self._rules)
+        lowlink = [0] * len(self._rules)
+        on_stack = [False] * len(self._rules)
+        stack = []
+        counter = 0
+
+        for root in range(len(self._rules)):
+            if order[root] is not None:
+                continue
+            work = [(root, 0)]
+            while work:
+                (v, e) = work.pop()
+                if e == 0:
+                    order[v] = lowlink[v] = counter
+                    counter += 1
+                    stack.append(v)
+                    on_stack[v] = True
+                recurse = False
+                while e < len(edges[v]):
+                    w = edges[v][e]
+                    e += 1
+                    if order[w] is None:
+                        work.append((v, e))
+                        work.append((w, 0))
+                        recurse = True
+                        break
+                    elif on_stack[w]:
+                        lowlink[v] = min(lowlink[v], order[w])
+                if recurse:
+                    continue
+                if work:
+                    lowlink[work[-1][0]] = min(lowlink[work[-1][0]], lowlink[v])
+                if lowlink[v] == order[v]:
+                    component = []
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        component.append(w)
+                        if w == v:
+                            break
+                    if len(component) > 1 or v in edges[v]:
+                        circular.extend(component)
+
+        return [self._rules[i] for i in sorted(circular)]
+
     def _parse_rule(self, filename, rulelines):
         """
         Private function that takes the lines of a 'simple' rule file, parses
@@ -221,17 +357,6 @@ class RuleEngine(object):
 
         return d
 
-    def _circular_check(self, search_for, rule, rule_ids):
-        """ Check for any circular references """
-        if search_for in rule.after:
-            return True
-        else:
-            for after in rule.after:
-                res = self._circular_check(search_for, rule_ids[after], rule_ids)
-                if res:
-                    return True
-            return False
-
 
 class RuleLoadError(Exception):
     """
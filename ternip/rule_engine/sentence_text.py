@@ -0,0 +1,267 @@
+from bisect import bisect_left
+import re
+
+from ternip.rule_engine import expressions
+from ternip.sentence import Sentence
+
+
+class SentenceText(object):
+    """
+    The <token~POS> form of a sentence which rules match against, along with
+    the variants of it that rules need (case-folded, and with number sequences
+    deliminated). The variants are only worked out when first asked for.
+
+    Use SentenceText.of to get the text of a sentence, which means the text of a
+    ternip.sentence.Sentence is only made once, and then shared between every
+    rule which looks at it until its tokens change.
+
+    The offset at which each token starts in the text is also kept, so matches
+    against the text can be turned back into token indices (and vice versa)
+    without scanning the text. The results of searching the text with guards
+    are kept in searches, so rules with the same guards share them.
+    """
+
+    __slots__ = ('text', 'searches', '_starts', '_lower', '_deliminated')
+
+    def __init__(self, text, starts):
+        """
+        text is the rendered sentence, and starts the character offset into the
+        text at which each token starts, followed by the length of the text
+        """
+        self.text = text
+        self.searches = {}
+        self._starts = starts
+        self._lower = None
+        self._deliminated = None
+
+    @staticmethod
+    def render(toks):
+        """
+        Takes a list of (token, pos_tag, timexes) and renders it into the
+        <token~pos> format for matching
+        """
+
+        # This code is modified from NLTK's text.py for dealing with pattern
+        # matching with tokenised strings, under the Apache License 2.0
+
+        # Natural Language Toolkit (NLTK) http://www.nltk.org/
+        # Copyright (C) 2001-2010 NLTK Project
+        # Bird, Steven, Edward Loper and Ewan Klein (2009).
+        # Natural Language Processing with Python.  O'Reilly Media Inc.
+
+        if isinstance(toks, Sentence):
+            words = toks.words()
+        else:
+            words = [(w, pos) for (w, pos, ts) in toks]
+
+        parts = ['<' + w + '~' + pos + '>' for (w, pos) in words]
+
+        # End NLTK contribution
+
+        starts = [0]
+        offset = 0
+        for part in parts:
+            offset += len(part)
+            starts.append(offset)
+
+        return SentenceText(''.join(parts), starts)
+
+    @staticmethod
+    def of(toks):
+        """
+        Get the text for a list of (token, pos_tag, timexes). If that list is a
+        Sentence, the text is cached on the sentence.
+        """
+        if isinstance(toks, Sentence):
+            return toks.cached(SentenceText, SentenceText._for_sentence)
+        else:
+            return SentenceText.render(toks)
+
+    @staticmethod
+    def _for_sentence(sent):
+        origin = sent.origin(SentenceText)
+        if origin is not None:
+            # Cut this out of the text of the sentence this was sliced from
+            (text, start, stop) = origin
+            return text.slice(start, stop)
+        else:
+            return SentenceText.render(sent)
+
+    def slice(self, start, stop):
+        """
+        Returns the text of the tokens between start and stop
+        """
+        offset = self._starts[start]
+        return SentenceText(self.text[offset:self._starts[stop]],
+            [s - offset for s in self._starts[start:stop + 1]])
+
+    def token_index(self, offset):
+        """
+        Returns the index of the token which starts at the given character
+        offset into the text, or, if offset falls inside a token, the token
+        after it. This is the number of tokens which start before offset.
+        """
+        return bisect_left(self._starts, offset)
+
+    def token_span(self, start, end):
+        """
+        Turns a span of characters in the text (e.g., match.span()) into the
+        (start, end) indices of the tokens it covers, suitable for slicing the
+        sentence with
+        """
+        return bisect_left(self._starts, start), bisect_left(self._starts, end)
+
+    def token_offset(self, i):
+        """
+        Returns the character offset into the text at which token i starts. If
+        i is the number of tokens, then this is the length of the text.
+        """
+        return self._starts[i]
+
+    def __len__(self):
+        return len(self._starts) - 1
+
+    @property
+    def lower(self):
+        """
+        The case-folded text
+        """
+        if self._lower is None:
+            self._lower = self.text.lower()
+        return self._lower
+
+    @property
+    def deliminated(self):
+        """
+        The SentenceText with number sequences marked up by
+        deliminate_numbers
+        """
+        if self._deliminated is None:
+            markers = _number_markers(self.text)
+            if len(markers) == 0:
+                # Nothing to deliminate, so this is the same text
+                self._deliminated = self
+                return self
+
+            # Each token moves along by the length of the markers put in
+            # before it
+            starts = []
+            shift = 0
+            m = 0
+            for start in self._starts:
+                while m < len(markers) and markers[m][0] <= start:
+                    shift += len(markers[m][1])
+                    m += 1
+                starts.append(start + shift)
+
+            self._deliminated = SentenceText(_insert_markers(self.text, markers), starts)
+        return self._deliminated
+
+
+# Patterns used when deliminating numbers, from the expressions used by GUTime
+_WORD_TOKEN = re.compile(r'<(?P<word>[a-zA-Z-]+)~(?P<pos>.+?)>')
+_ANY_NUMBER = re.compile('<' + expressions.NUMBER_TERM, re.I)
+_NUMBER = re.compile(expressions.NUMBER_TERM + '(-' + expressions.NUMBER_TERM + ')*', re.I)
+_ORDINAL_END = [re.compile(expressions.ORD_UNIT_NUMS + r'$'), re.compile(expressions.ORD_OTHER_NUMS + r'$')]
+_HIGHER_NUMS = re.compile(expressions.HIGHER_NUMS, re.I)
+_NUMBER_CONTINUES = [re.compile(exp, re.I) for exp in [expressions.UNIT_NUMS,
+                                                       expressions.UNIQUE_NUMS,
+                                                       expressions.TENS_NUMS + '(-' + expressions.UNIT_NUMS + '|' + expressions.ORD_UNIT_NUMS + ')?',
+                                                       expressions.ORD_UNIT_NUMS,
+                                                       expressions.ORD_OTHER_NUMS]]
+
+
+def deliminate_numbers(sent):
+    """
+    Translation of GUTime function 'deliminateNumbers' - marks up number
+    sequences
+    """
+    return _insert_markers(sent, _number_markers(sent))
+
+
+def _insert_markers(sent, markers):
+    """
+    Puts the markers found by _number_markers into the text
+    """
+    parts = []
+    last = 0
+    for (offset, marker) in markers:
+        parts.append(sent[last:offset])
+        parts.append(marker)
+        last = offset
+    parts.append(sent[last:])
+    return ''.join(parts)
+
+
+def _number_markers(sent):
+    """
+    Finds where the markers go which deliminate numbers in the text, in a single
+    pass over the words in it. Only tokens consisting of letters and hyphens
+    count as words, everything else is left alone.
+
+    Returns a list of [offset, marker] pairs, in the order the markers appear
+    in the deliminated text. Markers at the same offset go in list order.
+    """
+
+    # Most sentences have no numbers in at all, which can be spotted quickly
+    if _ANY_NUMBER.search(sent) is None:
+        return []
+
+    words = [(m.start(), m.end(), m.group('word')) for m in _WORD_TOKEN.finditer(sent)]
+    markers = []
+
+    # The NUM_START marker for the number we are currently in, if any, which
+    # becomes NUM_ORD_START if the number turns out to end in an ordinal
+    number_start = None
+    previous_word = ''
+
+    for i, (offset, end, current_word) in enumerate(words):
+
+        if i + 1 < len(words):
+            next_word = words[i + 1][2]
+        else:
+            next_word = ''
+
+        # the following deals reasonably well with hypenated numbers like "twenty-one"
+        if _NUMBER.match(current_word) is not None:
+            # This current word is identified as a number
+            if number_start is None:
+                # first in (possible) series of numbers
+                number_start = [offset, 'NUM_START']
+                markers.append(number_start)
+            elif _is_ordinal(previous_word):
+                # between ordinal and regular nums (i.e. "first two")
+                number_start[1] = 'NUM_ORD_START'
+                markers.append([offset, 'NUM_ORD_END'])
+                number_start = [offset, 'NUM_START']
+                markers.append(number_start)
+
+        elif number_start is not None:
+            # previous word was a number
+            # following works fairly well...it avoids marking things like "six and two" as a single
+            # number while still marking things like "two hundred and one" as a single number
+            if current_word.lower() != 'and'\
+               or _HIGHER_NUMS.search(previous_word) is None\
+               or not any(exp.search(next_word) is not None for exp in _NUMBER_CONTINUES):
+                # number doesn't continue
+                if _is_ordinal(previous_word):
+                    number_start[1] = 'NUM_ORD_START'
+                    markers.append([offset, 'NUM_ORD_END'])
+                else:
+                    markers.append([offset, 'NUM_END'])
+                number_start = None
+
+        previous_word = current_word
+
+    if len(words) > 0 and _NUMBER.match(words[-1][2]) is not None:
+        # final word is a number
+        markers.append([words[-1][1], 'NUM_END'])
+
+    return markers
+
+
+def _is_ordinal(word):
+    for exp in _ORDINAL_END:
+        if exp.search(word) is not None:
+            return True
+    return False
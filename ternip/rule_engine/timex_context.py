@@ -0,0 +1,118 @@
+from ternip.rule_engine.sentence_text import SentenceText
+from ternip.sentence import Sentence
+
+
+class TimexContext(object):
+    """
+    The text around a timex that normalisation rules look at: the tokens
+    before, covered by and after the timex, rendered in each of the forms rules
+    match their guards and match regexes against.
+
+    Every normalisation rule tried on a timex looks at the same text, so
+    NormalisationRuleEngine makes one context for each timex, and each rule
+    gets its renderings from there, rather than rendering them all over again.
+    The tokens of a context never change, and each rendering is only made the
+    first time a rule asks for it. The results of searching the renderings
+    with guards are also kept (in searches), as many rules share guards.
+    """
+
+    __slots__ = ('before', 'body', 'after', 'searches', '_texts', '_trigger_texts')
+
+    def __init__(self, before, body, after):
+        """
+        before, body and after are the lists of (token, pos_tag, timexes) before,
+        covered by, and after the timex in the sentence
+        """
+        self.before = before
+        self.body = body
+        self.after = after
+        self.searches = {}
+        self._texts = {}
+        self._trigger_texts = {}
+
+    @staticmethod
+    def of(body, before, after):
+        """
+        Get the context for a timex. If body is a Sentence, the context is
+        cached on it, so all rules applied to the same slices of a sentence
+        share one context.
+        """
+        if isinstance(body, Sentence):
+            context = body.cached(TimexContext, lambda body: TimexContext(before, body, after))
+            if context.before is before and context.after is after:
+                return context
+        return TimexContext(before, body, after)
+
+    def _text(self, key, factory):
+        try:
+            return self._texts[key]
+        except KeyError:
+            text = self._texts[key] = factory()
+            return text
+
+    @property
+    def before_text(self):
+        """
+        The <token~POS> form of the tokens before the timex
+        """
+        return self._text('before', lambda: SentenceText.of(self.before).text)
+
+    @property
+    def body_text(self):
+        """
+        The <token~POS> form of the tokens covered by the timex
+        """
+        return self._text('body', lambda: SentenceText.of(self.body).text)
+
+    @property
+    def after_text(self):
+        """
+        The <token~POS> form of the tokens after the timex
+        """
+        return self._text('after', lambda: SentenceText.of(self.after).text)
+
+    @property
+    def sent_text(self):
+        """
+        The <token~POS> form of the whole sentence
+        """
+        return self._text('sent', lambda: SentenceText.of(self.before + self.body + self.after).text)
+
+    def match_text(self, tokenise, deliminate_numbers):
+        """
+        The text of the body which a rule with the given Tokenise and
+        Deliminate-Numbers settings runs its match regex against
+        """
+        return self._text(('match', tokenise, deliminate_numbers),
+            lambda: self._match_text(tokenise, deliminate_numbers))
+
+    def _match_text(self, tokenise, deliminate_numbers):
+        if tokenise is True:
+            if deliminate_numbers:
+                return SentenceText.of(self.body).deliminated.text
+            else:
+                return self.body_text
+        else:
+            return tokenise.join([tok for (tok, pos, ts) in self.body])
+
+    def token_count(self, tokenise, deliminate_numbers):
+        """
+        The number of tokens in the text match_text gives, counted by the '<'
+        which starts each of them
+        """
+        return self._text(('tokens', tokenise, deliminate_numbers),
+            lambda: self.match_text(tokenise, deliminate_numbers).count('<'))
+
+    def trigger_text(self, key):
+        """
+        The text triggers are looked for in, for normalisation rules with
+        triggers of the given key, which is a (tokenise, deliminate_numbers)
+        tuple. This is asked for by every rule in turn, so is kept apart from
+        the other renderings, so it can be looked up quickly.
+        """
+        try:
+            return self._trigger_texts[key]
+        except KeyError:
+            (tokenise, deliminate_numbers) = key
+            text = self._trigger_texts[key] = self.match_text(tokenise, deliminate_numbers).lower()
+            return text
@@ -0,0 +1,339 @@
+import re
+import sre_constants
+import sre_parse
+
+# Sets of single characters bigger than this aren't worth using as triggers
+_MAX_CHARSET = 10
+
+# Characters which appear in the rendering of every token, so tell us nothing
+_TOKEN_MARKUP = '<~>'
+
+
+def find_triggers(exp, flags=0):
+    """
+    Given a regular expression, works out what must appear in any text the
+    expression matches. This is done by looking for runs of literal
+    characters, or alternations or classes of them, which any match must go
+    through.
+
+    Returns a list of frozensets of strings, where any text the expression
+    matches contains at least one string from each set. The most useful set
+    for ruling text out comes first. None is returned if the expression does
+    not require anything useful. If flags contains re.IGNORECASE, the strings
+    are in lower case and should be looked for in lower-cased text.
+    """
+    try:
+        parsed = sre_parse.parse(exp, flags)
+    except (re.error, sre_constants.error):
+        return None
+    required = [frozenset(triggers) for triggers in _required(parsed, flags & re.IGNORECASE)
+                if _score(triggers) >= 1]
+    if len(required) == 0:
+        return None
+    else:
+        return sorted(set(required), key=_rank)
+
+
+def min_count(exp, char, flags=0):
+    """
+    Given a regular expression, works out the fewest times a character must
+    appear in any text the expression matches. For expressions run against
+    tokens in the <token~POS> form, the count of '<' is the fewest tokens any
+    match can cover. 0 is returned if the expression can't be parsed.
+    """
+    try:
+        parsed = sre_parse.parse(exp, flags)
+    except (re.error, sre_constants.error):
+        return 0
+    return _min_count(parsed, ord(char))
+
+
+def triggered(triggers, text_for):
+    """
+    Checks whether a rule with the given triggers could match. triggers is
+    None (the rule always could) or a list of alternative (key, required)
+    tuples, where key is the kind of text (which text_for takes and returns
+    the text of that kind for), and required is a list of sets of strings, one
+    string from each of which must be in that text.
+    """
+    if triggers is None:
+        return True
+    for (key, required) in triggers:
+        text = text_for(key)
+        for strings in required:
+            for string in strings:
+                if string in text:
+                    break
+            else:
+                break
+        else:
+            return True
+    return False
+
+
+def merge_triggers(rules):
+    """
+    Returns the triggers for a group of rules (i.e., a rule block), which
+    could match when any of those rules could, or None if any of them can run
+    without a trigger
+    """
+    merged = []
+    for rule in rules:
+        triggers = getattr(rule, 'triggers', None)
+        if triggers is None:
+            return None
+        merged.extend(triggers)
+    return merged
+
+
+class TriggerIndex(object):
+    """
+    An index from triggers to the rules which require them, so the rules which
+    could match some text can be found without trying each of them in turn
+    """
+
+    def __init__(self, rules):
+        """
+        rules is the list of rules (in the order they are to be run in). Rules
+        without a 'triggers' member, or where that is None, are always run.
+
+        Rules which are always run, but have a true 'needs_timexes' member,
+        only ever change timexes which are already there, so do not stop
+        could_match from ruling text out.
+        """
+        self._rules = rules
+        self._always = []
+        self._index = {}
+        self._ungated = False
+        for (i, rule) in enumerate(rules):
+            triggers = getattr(rule, 'triggers', None)
+            if triggers is None:
+                self._always.append(i)
+                if not getattr(rule, 'needs_timexes', False):
+                    self._ungated = True
+            else:
+                # Index on the most useful set of strings for each alternative
+                for (key, required) in triggers:
+                    for string in required[0]:
+                        self._index.setdefault(key, {}).setdefault(string, set()).add(i)
+
+        # The signature is all the indexed strings, less any which contain
+        # another one (as they can never be there without that one)
+        self._signature = {}
+        for key in self._index:
+            signature = []
+            for string in sorted(self._index[key], key=len):
+                for shorter in signature:
+                    if shorter in string:
+                        break
+                else:
+                    signature.append(string)
+            self._signature[key] = signature
+
+    def select(self, text_for):
+        """
+        Returns a list of (position, rule) tuples for the rules which could
+        match, in the order they are to be run in. text_for takes the key of a
+        kind of text (as used in rule triggers) and returns that text.
+        """
+        text_for = _memoise(text_for)
+        return [(i, self._rules[i]) for i in sorted(self._could_match(text_for) | set(self._always))]
+
+    def could_match(self, text_for):
+        """
+        Returns whether any rule which doesn't need existing timexes could
+        match the text. text_for is as for select.
+        """
+        if self._ungated:
+            return True
+        text_for = _memoise(text_for)
+
+        # Quickly rule out text with nothing of interest in at all
+        for key in self._signature:
+            text = text_for(key)
+            for string in self._signature[key]:
+                if string in text:
+                    break
+            else:
+                continue
+            break
+        else:
+            return False
+
+        return len(self._could_match(text_for)) > 0
+
+    def _could_match(self, text_for):
+        """
+        The positions of the indexed rules which could match
+        """
+        candidates = set()
+        for key in self._index:
+            text = text_for(key)
+            for (string, rules) in self._index[key].iteritems():
+                if string in text:
+                    candidates |= rules
+        return set(i for i in candidates if triggered(self._rules[i].triggers, text_for))
+
+
+def _memoise(text_for):
+    """
+    Wraps text_for so the text of each kind is only made once
+    """
+    texts = {}
+
+    def memoised(key):
+        if key not in texts:
+            texts[key] = text_for(key)
+        return texts[key]
+
+    return memoised
+
+
+def _length(trigger):
+    """
+    The length of a trigger, not counting token markup characters
+    """
+    return len(trigger) - sum(trigger.count(c) for c in _TOKEN_MARKUP)
+
+
+def _score(triggers):
+    """
+    How useful a set of triggers is for ruling text out - the length of the
+    shortest trigger
+    """
+    return min(_length(trigger) for trigger in triggers)
+
+
+def _rank(triggers):
+    """
+    Sort key putting the most useful sets of triggers first: longer triggers
+    are less likely to turn up by chance
+    """
+    mean = float(sum(_length(trigger) for trigger in triggers)) / len(triggers)
+    return -_score(triggers), -mean, len(triggers), sorted(triggers)
+
+
+def _best(required):
+    """
+    Picks the most useful of several sets of triggers which are all required
+    """
+    if len(required) == 0:
+        return None
+    else:
+        return min(required, key=_rank)
+
+
+def _char(code, ignorecase):
+    """
+    Returns the character for a literal code, or None if that can't safely be
+    used as a trigger
+    """
+    if code >= 128:
+        # Avoid mixing up byte and unicode strings
+        return None
+    c = chr(code)
+    if ignorecase:
+        c = c.lower()
+    return c
+
+
+def _required(pattern, ignorecase):
+    """
+    Returns a list of sets of strings, where any match of the parsed pattern
+    contains one string from each set
+    """
+    required = []
+    run = ''
+    for (op, av) in pattern:
+        if op == sre_constants.LITERAL:
+            c = _char(av, ignorecase)
+            if c is not None:
+                run += c
+                continue
+        else:
+            required.extend(_required_node(op, av, ignorecase))
+
+        # This node breaks any run of literal characters
+        if run:
+            required.append(set([run]))
+            run = ''
+
+    if run:
+        required.append(set([run]))
+
+    return required
+
+
+def _required_node(op, av, ignorecase):
+    """
+    Returns a list of sets of strings, where any match of a single node of a
+    parsed pattern contains one string from each set
+    """
+    if op == sre_constants.SUBPATTERN:
+        return _required(av[-1], ignorecase)
+
+    elif op == sre_constants.BRANCH:
+        # Any of the alternatives could match, so take the best of what each
+        # alternative requires
+        union = set()
+        for alternative in av[1]:
+            best = _best(_required(alternative, ignorecase))
+            if best is None:
+                return []
+            union |= best
+        return [union]
+
+    elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+        (min, max, item) = av
+        if min >= 1:
+            return _required(item, ignorecase)
+
+    elif op == sre_constants.IN:
+        chars = set()
+        for (in_op, in_av) in av:
+            if in_op == sre_constants.LITERAL:
+                c = _char(in_av, ignorecase)
+                if c is None:
+                    return []
+                chars.add(c)
+            elif in_op == sre_constants.RANGE:
+                (lo, hi) = in_av
+                if hi - lo >= _MAX_CHARSET:
+                    return []
+                for code in range(lo, hi + 1):
+                    c = _char(code, ignorecase)
+                    if c is None:
+                        return []
+                    chars.add(c)
+            elif in_op == sre_constants.CATEGORY and in_av == sre_constants.CATEGORY_DIGIT:
+                chars.update('0123456789')
+            else:
+                # negated sets and other categories could be almost anything
+                return []
+        if len(chars) <= _MAX_CHARSET:
+            return [chars]
+
+    return []
+
+
+def _min_count(pattern, code):
+    """
+    The fewest times the character with the given code appears in any match
+    of the parsed pattern
+    """
+    count = 0
+    for (op, av) in pattern:
+        if op == sre_constants.LITERAL:
+            if av == code:
+                count += 1
+        elif op == sre_constants.IN:
+            if av == [(sre_constants.LITERAL, code)]:
+                count += 1
+        elif op == sre_constants.SUBPATTERN:
+            count += _min_count(av[-1], code)
+        elif op == sre_constants.BRANCH:
+            count += min(_min_count(alternative, code) for alternative in av[1])
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            (least, most, item) = av
+            count += least * _min_count(item, code)
+    return count
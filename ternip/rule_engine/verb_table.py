@@ -0,0 +1,131 @@
+from bisect import bisect_right
+import re
+
+from ternip.sentence import Sentence
+
+
+class VerbTable(object):
+    """
+    Where the tensed verbs (those tagged VBP, VBZ, VBD or MD) are in a
+    sentence, and where it says 'going to', so the tense of any stretch of the
+    sentence can be looked up without going through its tokens again.
+
+    Like SentenceText, use VerbTable.of to get the table for a list of
+    (token, pos_tag, timexes), which means the table of a
+    ternip.sentence.Sentence is only made once, and slices of a sentence share
+    the table of the sentence they were sliced from.
+    """
+
+    __slots__ = ('_verbs', '_last_verb', '_going_to', '_start', '_stop')
+
+    def __init__(self, verbs, last_verb, going_to, start, stop):
+        """
+        verbs is the (lower case token, upper case POS tag) of each token which
+        is a tensed verb (and None for other tokens), last_verb the index of
+        the last tensed verb before each index into the tokens (or -1 if there
+        is none), and going_to the (first, last) indices of the tokens each
+        mention of 'going to' covers. The table is for the tokens between start
+        and stop of those.
+        """
+        self._verbs = verbs
+        self._last_verb = last_verb
+        self._going_to = going_to
+        self._start = start
+        self._stop = stop
+
+    @staticmethod
+    def build(toks):
+        """
+        Makes the table for a list of (token, pos_tag, timexes)
+        """
+        if isinstance(toks, Sentence):
+            words = toks.words()
+        else:
+            words = [(tok, pos) for (tok, pos, ts) in toks]
+
+        verbs = []
+        last_verb = [-1]
+        for (i, (tok, pos)) in enumerate(words):
+            if pos.upper() in _TENSED:
+                verbs.append((tok.lower(), pos.upper()))
+                last_verb.append(i)
+            else:
+                verbs.append(None)
+                last_verb.append(last_verb[-1])
+
+        # Work out which tokens each mention of 'going to' covers in the text
+        # of the tokens joined by spaces, which is what the heuristic looks for
+        # it in
+        starts = []
+        offset = 0
+        for (tok, pos) in words:
+            starts.append(offset)
+            offset += len(tok) + 1
+        going_to = [(bisect_right(starts, match.start()) - 1, bisect_right(starts, match.end() - 1) - 1)
+                    for match in _GOING_TO.finditer(' '.join([tok for (tok, pos) in words]))]
+
+        return VerbTable(verbs, last_verb, going_to, 0, len(words))
+
+    @staticmethod
+    def of(toks):
+        """
+        Get the table for a list of (token, pos_tag, timexes). If that list is
+        a Sentence, the table is cached on the sentence.
+        """
+        if isinstance(toks, Sentence):
+            return toks.cached(VerbTable, VerbTable._for_sentence)
+        else:
+            return VerbTable.build(toks)
+
+    @staticmethod
+    def _for_sentence(sent):
+        origin = sent.origin(VerbTable)
+        if origin is not None:
+            # Share the table of the sentence this was sliced from
+            (table, start, stop) = origin
+            return table.slice(start, stop)
+        else:
+            return VerbTable.build(sent)
+
+    def slice(self, start, stop):
+        """
+        Returns the table of the tokens between start and stop
+        """
+        return VerbTable(self._verbs, self._last_verb, self._going_to, self._start + start, self._start + stop)
+
+    def tense(self, start=0, stop=None):
+        """
+        Returns the (verb, pos) of the last tensed verb between tokens start
+        and stop, with the verb lower cased and the tag upper cased, or
+        (None, None) if there isn't one. Present tense verbs, and modals in
+        stretches which say 'going to', are taken as the modal 'going_to'.
+        Converted from GUTime.
+        """
+        start += self._start
+        if stop is None:
+            stop = self._stop
+        else:
+            stop += self._start
+
+        i = self._last_verb[stop]
+        if i < start:
+            return (None, None)
+
+        (verb, pos) = self._verbs[i]
+        if pos == 'VBP' or pos == 'VBZ' or pos == 'MD' and self._says_going_to(start, stop):
+            return ('going_to', 'MD')
+        else:
+            return (verb, pos)
+
+    def _says_going_to(self, start, stop):
+        """
+        Whether 'going to' is said within tokens start to stop
+        """
+        for (first, last) in self._going_to:
+            if first >= start and last < stop:
+                return True
+        return False
+
+
+_TENSED = frozenset(['VBP', 'VBZ', 'VBD', 'MD'])
+_GOING_TO = re.compile(r'going\s+to', re.I)
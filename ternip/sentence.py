@@ -0,0 +1,527 @@
+from array import array
+import collections
+import copy
+
+
+class Sentence(object):
+    """
+    A tokenised sentence, which looks like a list in the
+    [(token, pos, timexes), ...] form.
+
+    Rather than keeping a tuple for every token, the tokens and POS tags are
+    kept in columns, and the sets of timexes are kept by the index of their
+    token. Tokens are interned, and POS tags are kept as numbers standing for
+    the tag. Indexing or iterating over a sentence gives (token, pos, timexes)
+    tuples as usual. The sets given with tokens are kept as they are, so (as
+    with a list of tuples) timexes added to the sentence are added to the sets
+    the caller gave. A token made without a set (see from_words) is only given
+    one when a timex is added to it; until then, the set in its tuple is a new
+    one, which only becomes part of the sentence when a timex is added to it.
+
+    As with lists of tuples, a slice of a sentence shares the sets of timexes
+    of its tokens with the sentence it was sliced from, until the tokens of
+    either of them change.
+
+    Rule engines cache renderings of a sentence (e.g., the <token~POS> form
+    rules match against) on the sentence itself, so that every rule applied to
+    the sentence can share them. These are thrown away as soon as a token or
+    POS tag in the sentence changes, but not when only the timexes attached to
+    tokens change, as renderings never include those.
+
+    Slices of a sentence are also sentences, and remember where they were
+    sliced from, so renderings of the slice can be cut out of the renderings of
+    the whole sentence rather than being made from scratch.
+
+    Deep copies of a sentence share its columns of tokens and POS tags, until
+    the tokens of either of them change, and only the timexes are copied.
+    """
+
+    _cache = None
+    _origin = None
+    _parent = None
+    _shared = False
+
+    def __init__(self, toks=()):
+        """
+        toks is a list of (token, pos, timexes), or another Sentence
+        """
+        if isinstance(toks, Sentence):
+            self._tokens = list(toks._tokens)
+            self._tags = array(_TAG_TYPECODE, toks._tags)
+            self._timexes = dict(toks._timexes)
+        else:
+            self._tokens = []
+            self._tags = array(_TAG_TYPECODE)
+            self._timexes = {}
+            self._extend(toks)
+
+    @staticmethod
+    def from_words(words):
+        """
+        Makes a sentence out of a list of (token, pos), with no timexes
+        """
+        s = Sentence()
+        for (tok, pos) in words:
+            s._tokens.append(_intern_token(tok))
+            s._tags.append(_tag_code(pos))
+        return s
+
+    def cached(self, key, factory):
+        """
+        Returns the rendering of this sentence stored under key, calling
+        factory with this sentence to create it if it does not exist yet
+        """
+        if self._cache is None:
+            self._cache = {}
+        try:
+            return self._cache[key]
+        except KeyError:
+            rendering = self._cache[key] = factory(self)
+            return rendering
+
+    def origin(self, key):
+        """
+        If this sentence was sliced from another sentence, and that sentence
+        had a rendering stored under key when it was sliced, returns a tuple of
+        (that rendering, start index, end index). Otherwise returns None.
+        """
+        if self._origin is None:
+            return None
+        (cache, start, stop) = self._origin
+        if key in cache:
+            return cache[key], start, stop
+        else:
+            return None
+
+    def words(self):
+        """
+        Returns a list of the (token, pos) of each token, leaving out the
+        timexes
+        """
+        return zip(self._tokens, [_TAGS[code] for code in self._tags])
+
+    def timexes(self):
+        """
+        Returns the set of timexes attached to any token in this sentence
+        """
+        timexes = set()
+        for (i, ts) in self._timex_items():
+            timexes.update(ts)
+        return timexes
+
+    def spans(self):
+        """
+        Returns a dict of the (start, end) token span of each timex in this
+        sentence, where start is the index of the first token of the timex and
+        end the index after its last token, suitable for slicing the sentence
+        with. This is worked out from the tokens which have timexes, rather
+        than by looking through every token for each timex.
+
+        Rules only ever add a timex to a run of tokens, so a timex is expected
+        to cover every token of its span. The span of a timex which has been
+        removed from some tokens in the middle of it still goes from its first
+        to its last token, so code which needs the tokens themselves should
+        check them for the timex.
+
+        The spans are worked out afresh each time, as the sets of timexes of
+        the tokens can be changed without the sentence knowing, so code
+        looking at the spans of a sentence several times should keep them
+        until it changes the timexes itself.
+        """
+        spans = {}
+        for (i, ts) in self._timex_items():
+            for t in ts:
+                if t in spans:
+                    spans[t] = (spans[t][0], i + 1)
+                else:
+                    spans[t] = (i, i + 1)
+        return spans
+
+    def _timex_items(self):
+        """
+        Returns a list of (index, timexes) for each token with any timexes, in
+        order, including those shared with the sentence this was sliced from
+        """
+        timexes = self._timexes
+        (parent, start) = self._sliced_from(0)
+        if parent is not None:
+            timexes = dict(timexes)
+            stop = start + len(self._tokens)
+            for (i, ts) in parent._timex_items():
+                if start <= i < stop and i - start not in timexes:
+                    timexes[i - start] = ts
+        return [(i, timexes[i]) for i in sorted(timexes) if len(timexes[i]) > 0]
+
+    def _invalidate(self):
+        """
+        The tokens of this sentence are about to change, so forget any
+        renderings, and stop sharing columns with copies of this sentence
+        """
+        self._cache = None
+        self._origin = None
+        self._parent = None
+        if self._shared:
+            self._tokens = list(self._tokens)
+            self._tags = array(_TAG_TYPECODE, self._tags)
+            self._shared = False
+
+    def _extend(self, toks):
+        tokens = self._tokens
+        tags = self._tags
+        timexes = self._timexes
+        i = len(tokens)
+        for (tok, pos, ts) in toks:
+            tokens.append(_intern_token(tok))
+            tags.append(_tag_code(pos))
+            timexes[i] = ts
+            i += 1
+
+    def _timexes_of(self, i):
+        ts = self._timexes.get(i)
+        if ts is None and self._parent is not None:
+            ts = self._shared_timexes(i)
+        if ts is None:
+            return _NewTimexes(self, i)
+        else:
+            return ts
+
+    def _sliced_from(self, i):
+        """
+        If this sentence is a slice of another, and the tokens of neither have
+        changed since, returns that sentence and the index of token i in it.
+        Otherwise returns (None, None).
+        """
+        if self._parent is not None:
+            (parent, start, cache) = self._parent
+            if parent._cache is cache:
+                return parent, i + start
+        return None, None
+
+    def _shared_timexes(self, i):
+        """
+        Returns the set of timexes of token i, if it or the same token in a
+        sentence this was sliced from has one, otherwise None
+        """
+        path = []
+        s = self
+        while s is not None:
+            ts = s._timexes.get(i)
+            if ts is not None:
+                for (t, j) in path:
+                    t._timexes[j] = ts
+                return ts
+            path.append((s, i))
+            (s, i) = s._sliced_from(i)
+        return None
+
+    def _attach_timexes(self, i, ts):
+        """
+        Makes ts the set of timexes of token i (and of the same token in the
+        sentences this was sliced from), unless it already has one. Returns
+        the set the token ends up with.
+        """
+        existing = self._shared_timexes(i)
+        if existing is not None:
+            return existing
+        s = self
+        while s is not None:
+            s._timexes[i] = ts
+            (s, i) = s._sliced_from(i)
+        return ts
+
+    def _index(self, i):
+        if i < 0:
+            i += len(self._tokens)
+        if i < 0 or i >= len(self._tokens):
+            raise IndexError('sentence index out of range')
+        return i
+
+    def _slice(self, start, stop):
+        (start, stop, step) = slice(start, stop).indices(len(self._tokens))
+        stop = max(start, stop)
+        s = Sentence()
+        s._tokens = self._tokens[start:stop]
+        s._tags = self._tags[start:stop]
+        s._timexes = dict((i - start, ts) for (i, ts) in self._timexes.iteritems() if start <= i < stop)
+        if self._cache is None:
+            self._cache = {}
+        # Renderings added to the cache later on still describe the tokens we
+        # have been sliced from, as the cache is replaced, rather than
+        # emptied, when those tokens change
+        s._origin = (self._cache, start, stop)
+
+        # Slices of slices share timexes straight with the sentence the first
+        # slice was cut from
+        (parent, offset) = self._sliced_from(start)
+        if parent is None:
+            s._parent = (self, start, self._cache)
+        else:
+            s._parent = (parent, offset, parent._cache)
+        return s
+
+    def _replace(self, toks):
+        """
+        Replace all the tokens of this sentence with toks
+        """
+        self._invalidate()
+        self._tokens = []
+        self._tags = array(_TAG_TYPECODE)
+        self._timexes = {}
+        self._extend(toks)
+
+    def _shift_timexes(self, start, by):
+        """
+        Move the timexes of the tokens from start onwards by the given number
+        of places, after tokens are inserted or deleted
+        """
+        self._timexes = dict((i + by if i >= start else i, ts) for (i, ts) in self._timexes.iteritems())
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def __iter__(self):
+        tags = self._tags
+        timexes = self._timexes
+        for (i, tok) in enumerate(self._tokens):
+            ts = timexes.get(i)
+            if ts is None:
+                ts = self._timexes_of(i)
+            yield (tok, _TAGS[tags[i]], ts)
+
+    def __reversed__(self):
+        for i in reversed(xrange(len(self._tokens))):
+            yield self[i]
+
+    def __contains__(self, value):
+        for tok in self:
+            if tok == value:
+                return True
+        return False
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            if i.step is None:
+                return self._slice(i.start, i.stop)
+            else:
+                return [self[j] for j in xrange(*i.indices(len(self._tokens)))]
+        i = self._index(i)
+        return (self._tokens[i], _TAGS[self._tags[i]], self._timexes_of(i))
+
+    def __setitem__(self, i, value):
+        if isinstance(i, slice):
+            toks = list(self)
+            toks[i] = value
+            self._replace(toks)
+            return
+
+        i = self._index(i)
+        (tok, pos, ts) = value
+        if tok != self._tokens[i] or pos != _TAGS[self._tags[i]]:
+            self._invalidate()
+            self._tokens[i] = _intern_token(tok)
+            self._tags[i] = _tag_code(pos)
+        self._timexes[i] = ts
+
+    def __delitem__(self, i):
+        if isinstance(i, slice):
+            toks = list(self)
+            del toks[i]
+            self._replace(toks)
+            return
+
+        i = self._index(i)
+        self._invalidate()
+        del self._tokens[i]
+        del self._tags[i]
+        self._timexes.pop(i, None)
+        self._shift_timexes(i, -1)
+
+    def __add__(self, other):
+        s = Sentence(self)
+        s._extend(other)
+        if isinstance(other, Sentence) and self._origin is not None and other._origin is not None:
+            (cache, start, stop) = self._origin
+            (other_cache, other_start, other_stop) = other._origin
+            if cache is other_cache and stop == other_start:
+                # Joining two neighbouring slices of the same sentence back
+                # together, so we know where the join comes from too
+                s._origin = (cache, start, other_stop)
+                s._parent = self._parent
+        return s
+
+    def __radd__(self, other):
+        return Sentence(other) + self
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __eq__(self, other):
+        if isinstance(other, (Sentence, list)):
+            return len(self) == len(other) and list(self) == list(other)
+        else:
+            return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def append(self, value):
+        self._invalidate()
+        self._extend([value])
+
+    def extend(self, values):
+        self._invalidate()
+        self._extend(values)
+
+    def insert(self, i, value):
+        (start, stop, step) = slice(i, None).indices(len(self._tokens))
+        self._invalidate()
+        (tok, pos, ts) = value
+        self._shift_timexes(start, 1)
+        self._tokens.insert(start, _intern_token(tok))
+        self._tags.insert(start, _tag_code(pos))
+        self._timexes[start] = ts
+
+    def pop(self, i=-1):
+        value = self[i]
+        del self[i]
+        return value
+
+    def remove(self, value):
+        del self[self.index(value)]
+
+    def index(self, value):
+        for (i, tok) in enumerate(self):
+            if tok == value:
+                return i
+        raise ValueError('token not in sentence')
+
+    def count(self, value):
+        return sum(1 for tok in self if tok == value)
+
+    def reverse(self):
+        self._replace(reversed(list(self)))
+
+    def sort(self, *args, **kwargs):
+        toks = list(self)
+        toks.sort(*args, **kwargs)
+        self._replace(toks)
+
+    def __deepcopy__(self, memo):
+        s = Sentence()
+        s._tokens = self._tokens
+        s._tags = self._tags
+        s._shared = self._shared = True
+        s._timexes = copy.deepcopy(dict(self._timex_items()), memo)
+        return s
+
+    def __getstate__(self):
+        # Renderings aren't copied or pickled along with the tokens, and
+        # POS tags are stored as the tags, rather than the numbers standing
+        # for them in this process
+        return self._tokens, [_TAGS[code] for code in self._tags], self._timexes
+
+    def __setstate__(self, state):
+        (tokens, tags, timexes) = state
+        self._tokens = [_intern_token(tok) for tok in tokens]
+        self._tags = array(_TAG_TYPECODE, [_tag_code(pos) for pos in tags])
+        self._timexes = timexes
+
+
+collections.MutableSequence.register(Sentence)
+
+
+def copy_sents(sents):
+    """
+    Copies a list of sentences in the [[(word, pos, timexes), ...], ...] form,
+    giving the same result as copy.deepcopy, except that the copies are always
+    Sentences. The copies share the tokens and POS tags of the sentences they
+    were copied from, so this only takes as long as copying the timexes (and
+    the timexes they refer to).
+    """
+    memo = {}
+    return [copy.deepcopy(sent if isinstance(sent, Sentence) else Sentence(sent), memo) for sent in sents]
+
+
+class _NewTimexes(set):
+    """
+    The set of timexes of a token which doesn't have any yet, which is only
+    stored in the sentence once a timex is added to it. If the token has been
+    given another set by then, timexes added to this one are added to that.
+    """
+
+    __slots__ = ('_sentence', '_i', '_target')
+
+    def __init__(self, sentence, i):
+        self._sentence = sentence
+        self._i = i
+        self._target = None
+
+    def _attach(self):
+        if self._target is None:
+            self._target = self._sentence._attach_timexes(self._i, self)
+            self._sentence = None
+        if self._target is not self:
+            self._target.update(self)
+
+    def add(self, timex):
+        set.add(self, timex)
+        self._attach()
+
+    def update(self, *others):
+        set.update(self, *others)
+        self._attach()
+
+    def symmetric_difference_update(self, other):
+        set.symmetric_difference_update(self, other)
+        self._attach()
+
+    def __ior__(self, other):
+        set.__ior__(self, other)
+        self._attach()
+        return self
+
+    def __ixor__(self, other):
+        set.__ixor__(self, other)
+        self._attach()
+        return self
+
+    def __repr__(self):
+        return 'set(' + repr(list(self)) + ')'
+
+    def __reduce__(self):
+        # Copies are just sets
+        return set, (list(self),)
+
+
+def _intern_token(tok):
+    if type(tok) is str:
+        return intern(tok)
+    else:
+        return tok
+
+
+def _tag_code(pos):
+    key = (type(pos), pos)
+    try:
+        return _TAG_CODES[key]
+    except KeyError:
+        code = _TAG_CODES[key] = len(_TAGS)
+        _TAGS.append(pos)
+        return code
+
+
+# Every POS tag seen so far, and the number standing for each of them. The
+# type of the tag is kept along with it, so a tag comes back out of a sentence
+# the same as it went in.
+_TAGS = []
+_TAG_CODES = {}
+_TAG_TYPECODE = 'I'
@@ -13,10 +13,19 @@
 # begin_timex   None        beginPoint (ID of begin_timex)
 # end_timex     None        endPoint (ID of end_timex)
 # context       None        anchorTimeID (ID of context)
+# granuality    None        None
+# non_specific  None        None
 
 
 class Timex(object):
-    """ A temporal expression """
+    """
+    A temporal expression. Where a timex is in a sentence is kept by the
+    sentence (see ternip.sentence.Sentence.spans), as the same timex is found
+    in slices of the sentence at different places.
+    """
+
+    __slots__ = ('type', 'value', 'id', 'mod', 'freq', 'quant', 'comment', 'temporal_function', 'document_role',
+                 'begin_timex', 'end_timex', 'context', 'non_consuming', 'granuality', 'non_specific')
 
     def __init__(self, type=None, value=None, id=None):
         """ Initialise a timex object with some optional values """
@@ -33,6 +42,15 @@ class Timex(object):
         self.end_timex = None
         self.context = None
         self.non_consuming = False
+        self.granuality = None
+        self.non_specific = None
+
+    def __getstate__(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for (name, value) in state.items():
+            setattr(self, name, value)
 
 
 def add_timex_ids(ts):
@@ -20,6 +20,18 @@ sentence	POS	I
 Outside	POS	O""")
         self.assertEquals(t.get_sents(), [[('This', 'POS', set()), ('is', 'POS', set()), ('a', 'POS', set()), ('sentence', 'POS', set()), ('.', '.', set())], [('And', 'POS', set()), ('a', 'POS', set()), ('second', 'POS', set()), ('sentence', 'POS', set()), ('.', 'POS', set()), ], [('Outside', 'POS', set())]])
     
+    def test_get_sents_copied(self):
+        d = GateDocument("""Today	NN	B	20101010
+.	.	I""")
+        t = Timex(type='date')
+        d.reconcile([[('Today', 'NN', set([t])), ('.', '.', set())]])
+        t.value = '20101010'
+        sents = d.get_sents()
+        sents[0][0][2].pop().value = 'PRESENT_REF'
+        sents[0][1] = ('!', '.', set([t]))
+        self.assertEquals(str(d), "Today\tid=t1,type=DATE\t\n.\t\t\n")
+        self.assertEquals(d.get_sents()[0][1], ('.', '.', set()))
+
     def test_get_dct_sents(self):
         t = GateDocument("""This	POS	B	20101010
 is	POS	I
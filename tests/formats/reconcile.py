@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+import json
+import os.path
+import unittest
+from ternip.formats.timeml import TimeMlDocument
+from ternip.timex import Timex
+
+# Documents from TimeBank with quotes and entity tags in their sentences, the
+# tokens and timexes of each sentence (as found by the NLTK tokeniser and the
+# default rules), and the TIMEX tags the code which added TIMEX tags one at a
+# time put in each document, as (start, end, attributes)
+_SAMPLES = os.path.join(os.path.dirname(__file__), 'reconcile.json')
+_TIMEBANK = os.path.join(os.path.dirname(__file__), '..', '..', 'sample_data', 'timebank')
+
+def timex_spans(doc, tagname='TIMEX3'):
+    """
+    The (start, end, attributes) of each TIMEX tag in a document, where start
+    and end are offsets in the text of the document, and attributes leaves out
+    the ID
+    """
+    spans = []
+    starts = {}
+    offset = 0
+    stack = [(doc._xml_doc.documentElement, False)]
+    while len(stack) > 0:
+        (node, done) = stack.pop()
+        if done:
+            spans.append([starts[node], offset, sorted([name, value] for (name, value) in node.attributes.items()
+                                                     if name != 'tid')])
+        elif node.nodeType == node.TEXT_NODE:
+            offset += len(node.data)
+        else:
+            if node.nodeType == node.ELEMENT_NODE and node.tagName == tagname:
+                starts[node] = offset
+                stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node.childNodes))
+    return sorted(spans)
+
+def stripped(doc, tagname='TIMEX3'):
+    """
+    The document without its TIMEX tags
+    """
+    doc = TimeMlDocument(str(doc))
+    doc.strip_tag(tagname)
+    return str(doc)
+
+def sents(sample):
+    """
+    The sentences of a sample, with new timexes
+    """
+    sents = [[(tok, pos, set()) for (tok, pos) in sent] for sent in sample['sents']]
+    for (i, start, end, attrs) in sample['timexes']:
+        timex = Timex()
+        for (name, value) in attrs.items():
+            setattr(timex, name, value)
+        for j in range(start, end):
+            sents[i][j][2].add(timex)
+    return sents
+
+class ReconcileTest(unittest.TestCase):
+
+    def _reconcile(self, sample):
+        with open(os.path.join(_TIMEBANK, sample['doc'])) as fd:
+            doc = TimeMlDocument(fd.read(), has_S='s')
+        doc.strip_timexes()
+        before = stripped(doc)
+        doc.reconcile(sents(sample))
+        return (before, doc)
+
+    def test_same_as_one_at_a_time(self):
+        with open(_SAMPLES) as fd:
+            samples = json.load(fd)
+        for sample in samples:
+            (before, doc) = self._reconcile(sample)
+
+            # Only TIMEX tags are added
+            self.assertEquals(stripped(doc), before, sample['doc'])
+
+            # Every TIMEX tag which was added one at a time is added in the
+            # same place, along with those which couldn't be before, as the
+            # tokens before them couldn't be aligned (e.g., quotes)
+            spans = timex_spans(doc)
+            for span in sample['baseline']:
+                self.assertTrue(span in spans, sample['doc'] + ': ' + repr(span))
+            self.assertEquals(sorted(sample['baseline'] + sample['added']), spans, sample['doc'])
@@ -259,6 +259,40 @@ class XmlDocumentTest(unittest.TestCase):
                       ('a', 'POS', {t2}), ('second', 'POS', {t2}), ('annotation', 'POS', {t2}), ('.', 'POS', set())]])
         self.assertEquals(str(s), xml.dom.minidom.parseString('<root>This is <TIMEX>some annotated text</TIMEX> <TIMEX>and a second annotation</TIMEX>.</root>').toxml())
     
+    def test_reconcile_TIMEX_nested(self):
+        s = _XmlDocument('<root>This is some annotated text.</root>')
+        t1 = Timex()
+        t2 = Timex()
+        s.reconcile([[('This', 'POS', set()), ('is', 'POS', set()), ('some', 'POS', {t1}), ('annotated', 'POS', {t1, t2}),
+                      ('text', 'POS', {t1, t2}), ('.', 'POS', set())]])
+        self.assertEquals(str(s), xml.dom.minidom.parseString('<root>This is <TIMEX>some <TIMEX>annotated text</TIMEX></TIMEX>.</root>').toxml())
+    
+    def test_reconcile_TIMEX_LEX_start(self):
+        s = _XmlDocument('<root>This is some annotated text.</root>')
+        t = Timex()
+        s.reconcile([[('This', 'POS', {t}), ('is', 'POS', {t}), ('some', 'POS', set()), ('annotated', 'POS', set()),
+                      ('text.', 'POS', set())]], add_LEX='lex')
+        self.assertEquals(str(s), xml.dom.minidom.parseString('<root><TIMEX><lex>This</lex> <lex>is</lex></TIMEX> <lex>some</lex> <lex>annotated</lex> <lex>text.</lex></root>').toxml())
+    
+    def test_reconcile_TIMEX_not_aligned(self):
+        s = _XmlDocument('<root>This is some annotated text.</root>')
+        t1 = Timex()
+        t2 = Timex()
+        t3 = Timex()
+        s.reconcile([[('This', 'POS', {t1}), ('is', 'POS', set()), ('zzz', 'POS', {t2}), ('annotated', 'POS', {t2}),
+                      ('qqq', 'POS', {t3}), ('text.', 'POS', set())]])
+        self.assertEquals(str(s), xml.dom.minidom.parseString('<root><TIMEX>This</TIMEX> is some <TIMEX>annotated</TIMEX> text.</root>').toxml())
+    
+    def test_reconcile_TIMEX_quotes(self):
+        s = _XmlDocument('<root>He said "this week" and isn\'t "sure" about next week.</root>')
+        t1 = Timex()
+        t2 = Timex()
+        s.reconcile([[('He', 'POS', set()), ('said', 'POS', set()), ('``', 'POS', {t1}), ('this', 'POS', {t1}),
+                      ('week', 'POS', {t1}), ("''", 'POS', {t1}), ('and', 'POS', set()), ('is', 'POS', set()),
+                      ("n't", 'POS', set()), ('``', 'POS', set()), ('sure', 'POS', set()), ("''", 'POS', set()),
+                      ('about', 'POS', set()), ('next', 'POS', {t2}), ('week', 'POS', {t2}), ('.', 'POS', set())]])
+        self.assertEquals(str(s), xml.dom.minidom.parseString('<root>He said <TIMEX>"this week"</TIMEX> and isn\'t "sure" about <TIMEX>next week</TIMEX>.</root>').toxml())
+    
     def test_create_from_sents(self):
         s = _XmlDocument.create([[('This', 'POS', set()), ('is', 'POS', set()), ('some', 'POS', set()), ('annotated', 'POS', set()), ('text.', 'POS', set())],
                              [('This', 'POS', set()), ('is', 'POS', set()), ('a', 'POS', set()), ('second', 'POS', set()), ('sentence.', 'POS', set())]])
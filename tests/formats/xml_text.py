@@ -0,0 +1,42 @@
+import unittest
+import xml.dom.minidom
+from ternip.formats.xml_text import XmlText
+
+class XmlTextTest(unittest.TestCase):
+
+    def _doc(self):
+        return xml.dom.minidom.parseString('<root>Some <s>text <t>in</t> a</s> <s><t>doc</t><!-- x -->.</s></root>')
+
+    def test_text(self):
+        body = self._doc().documentElement
+        text = XmlText(body)
+        (first, second) = body.getElementsByTagName('s')
+        self.assertEquals(text.text, 'Some text in a doc.')
+        self.assertEquals(text.text_of(first), 'text in a')
+        self.assertEquals(text.text_of(body, second), 'Some text in a ')
+        self.assertEquals(text.text_of(first, second), 'text in a')
+        self.assertEquals(text.text_of(first, first.getElementsByTagName('t')[0]), 'text ')
+
+    def test_elements(self):
+        body = self._doc().documentElement
+        text = XmlText(body)
+        self.assertEquals(text.elements('t'), body.getElementsByTagName('t'))
+        (first, second) = text.elements('s')
+        self.assertEquals(text.elements('t', second), second.getElementsByTagName('t'))
+        self.assertEquals(text.elements('s', first), [])
+        self.assertEquals(text.elements('root'), [])
+
+    def test_changed(self):
+        doc = self._doc()
+        body = doc.documentElement
+        text = XmlText(body)
+        first = body.getElementsByTagName('s')[0]
+        new = doc.createElement('t')
+        first.insertBefore(new, first.firstChild)
+        new.appendChild(first.childNodes[1])
+        self.assertEquals(text.text_of(first), 'text in a')
+        self.assertEquals(text.text_of(new), 'text ')
+        self.assertEquals(text.text_of(first, new), '')
+        text.stale = True
+        self.assertEquals(text.elements('t', first), first.getElementsByTagName('t'))
+        self.assertEquals(len(text.elements('t')), 3)
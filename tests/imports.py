@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+import os.path
+import subprocess
+import sys
+import unittest
+import ternip
+from ternip.formats.nltk_support import NLTKDisabledError
+from ternip.formats.timex3 import Timex3XmlDocument
+
+# Everything needed to annotate pre-tagged documents
+_MODULES = ['ternip', 'ternip.formats.gate', 'ternip.formats.timex2', 'ternip.formats.timex3',
+            'ternip.formats.timeml', 'ternip.formats.tern', 'ternip.formats.tempeval2',
+            'ternip.rule_engine.recognition_rule_engine', 'ternip.rule_engine.normalisation_rule_engine']
+
+class ImportTest(unittest.TestCase):
+
+    def _imported(self, modules, code=''):
+        """
+        Import modules (and then run some code) in a fresh interpreter,
+        returning which modules were imported
+        """
+        script = 'import sys\n' \
+                 'for m in sys.argv[1:]: __import__(m)\n' + \
+                 code + \
+                 'print " ".join(sys.modules)\n'
+        out = subprocess.check_output([sys.executable, '-c', script] + modules,
+            cwd=os.path.join(os.path.dirname(__file__), '..'))
+        return out.split()
+
+    def testPackageImports(self):
+        imported = self._imported(['ternip', 'ternip.formats'])
+        self.assertFalse('nltk' in imported)
+        self.assertFalse('xml.dom.minidom' in imported)
+        self.assertFalse('dateutil' in imported)
+
+    def testNoHeavyImports(self):
+        imported = self._imported(_MODULES)
+        self.assertFalse('nltk' in imported)
+        self.assertFalse('dateutil' in imported)
+
+    def testNoNLTKPreTagged(self):
+        ternip.no_NLTK = True
+        try:
+            t = Timex3XmlDocument('<root><s><lex pos="DT">This</lex> <lex pos="NN">week</lex></s></root>',
+                has_S='s', has_LEX='lex', pos_attr='pos')
+            self.assertEquals(t.get_sents(), [[('This', 'DT', set()), ('week', 'NN', set())]])
+        finally:
+            ternip.no_NLTK = False
+
+    def testNoNLTKNeedsTagging(self):
+        ternip.no_NLTK = True
+        try:
+            t = Timex3XmlDocument('<root><s><lex>This</lex> <lex>week</lex></s></root>', has_S='s', has_LEX='lex')
+            self.assertRaises(NLTKDisabledError, t.get_sents)
+        finally:
+            ternip.no_NLTK = False
+
+    def testNoNLTKGate(self):
+        imported = self._imported([],
+            'import ternip.formats.gate\n'
+            'ternip.no_NLTK = True\n'
+            'doc = ternip.formats.gate.GateDocument("Last\\tJJ\\tB\\t20101010\\nweek\\tNN\\tI\\t20101010")\n'
+            'sents = ternip.recogniser().tag(doc.get_sents())\n'
+            'ternip.normaliser().annotate(sents, "20101010")\n'
+            'assert [t.value for t in sents[0][0][2]] == ["2010W39"]\n'
+            'doc.reconcile(sents)\n')
+        self.assertFalse('nltk' in imported)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+import os.path
+import re
+import sre_compile
+import unittest
+import ternip
+from ternip.timex import Timex
+
+class CompiledPatternsTest(unittest.TestCase):
+
+    def _sents(self):
+        return [[('It', 'PRP', set()), ('happened', 'VBD', set()), ('on', 'IN', set()), ('6th', 'JJ', set()),
+                 ('January', 'NNP', set()), ('1996', 'CD', set()), ('at', 'IN', set()), ('12:30', 'CD', set()),
+                 ('EST', 'NNP', set()), ('.', '.', set())],
+                [('We', 'PRP', set()), ('will', 'MD', set()), ('go', 'VB', set()), ('next', 'JJ', set()),
+                 ('Friday', 'NNP', set()), (',', ',', set()), ('and', 'CC', set()), ('again', 'RB', set()),
+                 ('at', 'IN', set()), ('Easter', 'NNP', set()), ('.', '.', set())],
+                [('Twenty-two', 'CD', set()), ('weeks', 'NNS', set()), ('ago', 'RB', set()), ('he', 'PRP', set()),
+                 ('left', 'VBD', set()), ('in', 'IN', set()), ('the', 'DT', set()), ('morning', 'NN', set()),
+                 ('of', 'IN', set()), ('Christmas', 'NNP', set()), ('Day', 'NNP', set()), ('.', '.', set())]]
+
+    def _annotate(self, recogniser, normaliser):
+        sents = recogniser.tag(self._sents())
+        normaliser.annotate(sents, '20100710')
+        return sents
+
+    def _rule_patterns(self):
+        """
+        The patterns rule expressions pass to re themselves, which are left
+        to re's own cache
+        """
+        path = os.path.join(os.path.dirname(ternip.__file__), 'rules', 'normalisation')
+        patterns = set()
+        for filename in os.listdir(path):
+            with open(os.path.join(path, filename)) as fd:
+                patterns.update(re.findall(r"re\.\w+\(r'([^']*)'", fd.read()))
+        return patterns
+
+    def testNoCompilationOnceWarm(self):
+        recogniser = ternip.recogniser()
+        normaliser = ternip.normaliser()
+        sents = self._annotate(recogniser, normaliser)
+        self.assertTrue(len(set(t for sent in sents for (tok, pos, ts) in sent for t in ts)) > 3)
+
+        # Empty re's cache, so nothing is found there which would have been
+        # pushed out of it when annotating a larger document
+        re.purge()
+        compiled = []
+        compile = sre_compile.compile
+        def counting_compile(p, flags=0):
+            compiled.append(p)
+            return compile(p, flags)
+        sre_compile.compile = counting_compile
+        try:
+            self._annotate(recogniser, normaliser)
+        finally:
+            sre_compile.compile = compile
+        self.assertEquals(set(compiled) - self._rule_patterns(), set())
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+import unittest
+from ternip.rule_engine.condition_order import ConditionOrder
+from ternip.rule_engine.normalisation_rule import NormalisationRule
+from ternip.rule_engine.recognition_rule import RecognitionRule
+from ternip.timex import Timex
+
+class ConditionOrderTest(unittest.TestCase):
+
+    def testEstimatedOrder(self):
+        order = ConditionOrder([('match', 1, 0.9), ('sent-guard', 4, 0.5), ('guard', 1, 0.5)])
+        self.assertEquals(order.order, ['match', 'guard', 'sent-guard'])
+
+    def testTiesKeepGivenOrder(self):
+        order = ConditionOrder([('b', 1, 0.5), ('a', 1, 0.5)])
+        self.assertEquals(order.order, ['b', 'a'])
+
+    def testObservedFailures(self):
+        order = ConditionOrder([('match', 1, 0.9), ('guard', 1, 0.5)])
+        for i in range(50):
+            order.record('match', True)
+            order.record('guard', False)
+        self.assertEquals(order.order, ['guard', 'match'])
+        self.assertTrue(order.failure_rate('guard') > 0.9)
+        self.assertTrue(order.failure_rate('match') < 0.2)
+        self.assertEquals([name for (name, cost, failure_rate) in order.describe()], ['guard', 'match'])
+
+    def testNormalisationRuleOrder(self):
+        rule = NormalisationRule(r'<(\d+)~.+><th~.+><January~.+><(\d{4})~.+>', 'date', 'testNormalisationRuleOrder',
+                                 r'{#2} + "01" + {#1}', sent_guards=[r'<plane~.+>'], guards=[r'<th~.+>'])
+        self.assertEquals([name for (name, cost, failure_rate) in rule.condition_order], ['match', 'guard', 'sent-guard'])
+
+        # The sentence guard keeps ruling timexes out, so ends up first
+        for i in range(100):
+            t = Timex(type='date')
+            self.assertFalse(rule.apply(t, '', '', [('06', 'POS', set([t])), ('th', 'POS', set([t])), ('January', 'POS', set([t])), ('1996', 'POS', set([t]))], [], [])[0])
+        self.assertEquals(rule.condition_order[0][0], 'sent-guard')
+
+        # which doesn't change the result of applying the rule
+        t = Timex(type='date')
+        self.assertTrue(rule.apply(t, '', '', [('06', 'POS', set([t])), ('th', 'POS', set([t])), ('January', 'POS', set([t])), ('1996', 'POS', set([t]))], [('plane', 'POS', set())], [])[0])
+        self.assertEquals(t.value, '19960106')
+
+    def testRecognitionRuleOrder(self):
+        rule = RecognitionRule(r'<Friday~.+>', 'date', 'testRecognitionRuleOrder', guards=[r'<on~.+>'])
+        self.assertEquals([name for (name, cost, failure_rate) in rule.condition_order], ['match', 'guard'])
+        for i in range(100):
+            (sent, success) = rule.apply([('Friday', 'POS', set())])
+            self.assertFalse(success)
+        self.assertEquals([name for (name, cost, failure_rate) in rule.condition_order], ['guard', 'match'])
+        (sent, success) = rule.apply([('on', 'POS', set()), ('Friday', 'POS', set()), ('or', 'POS', set()), ('Friday', 'POS', set())])
+        self.assertTrue(success)
+        self.assertEquals([len(ts) for (tok, pos, ts) in sent], [0, 1, 0, 1])
@@ -0,0 +1,137 @@
+import random
+import re
+import unittest
+from ternip.rule_engine import expressions
+from ternip.rule_engine.sentence_text import SentenceText, deliminate_numbers
+from ternip.sentence import Sentence
+
+def legacy_deliminate_numbers(sent):
+    """
+    The original implementation of deliminate_numbers, which the single-pass
+    one must give the same results as
+    """
+
+    rest = sent
+    sent = ''
+    previous_word = ''
+    current_word = ''
+
+    in_number = False
+
+    while re.search(r'<[a-zA-Z-]+~.+?>', rest):
+        m = re.search(r'<(?P<word>[a-zA-Z-]+)~(?P<pos>.+?)>', rest)
+        sent += m.string[:m.start()]
+        rest = m.string[m.end():]
+
+        current_word = m.group('word')
+
+        # Get next word
+        n = re.search(r'<(?P<word>[a-zA-Z-]+)~(?P<pos>.+?)>', rest)
+        if n is not None:
+            next_word = n.group('word')
+        else:
+            next_word = ''
+
+        # the following deals reasonably well with hypenated numbers like "twenty-one"
+        if re.match(expressions.NUMBER_TERM + '(-' + expressions.NUMBER_TERM + ')*', current_word, re.I) is not None:
+            # This current word is identified as a number
+            if not in_number:
+                # first in (possible) series of numbers
+                to_add = 'NUM_START<' + m.group('word') + '~' + m.group('pos') + '>'
+                in_number = True
+            else:
+                # either not first in series, or between ordinal and regular nums (i.e. "first two")
+                if (re.search(expressions.ORD_UNIT_NUMS + r'$', previous_word) is not None) or (re.search(expressions.ORD_OTHER_NUMS + r'$', previous_word) is not None):
+                    # between ordinal and regular
+                    sent = re.sub(r'(NUM_START((.(?!NUM_START))*))$', r'NUM_ORD_START\2', sent)  # replace with NUM_ORD_START
+                    sent += 'NUM_ORD_END'
+                    to_add = 'NUM_START<' + m.group('word') + '~' + m.group('pos') + '>'
+                else:
+                    # number is continuing
+                    to_add = '<' + m.group('word') + '~' + m.group('pos') + '>'
+
+        else:
+            # current word is not a number
+            if in_number:
+                # previous word was a number
+                if (current_word.lower() == 'and') and\
+                   (re.search(expressions.HIGHER_NUMS, previous_word, re.I) is not None) and\
+                   ((re.search(expressions.UNIT_NUMS, next_word, re.I) is not None) or
+                    (re.search(expressions.UNIQUE_NUMS, next_word, re.I) is not None) or
+                    (re.search(
+                        expressions.TENS_NUMS + '(-' + expressions.UNIT_NUMS + '|' + expressions.ORD_UNIT_NUMS + ')?',
+                        next_word, re.I) is not None) or
+                    (re.search(expressions.ORD_UNIT_NUMS, next_word, re.I) is not None) or
+                    (re.search(expressions.ORD_OTHER_NUMS, next_word, re.I) is not None)):
+                    to_add = '<' + m.group('word') + '~' + m.group('pos') + '>'
+                else:
+                    # number doesn't continue
+                    in_number = False
+                    if (re.search(expressions.ORD_UNIT_NUMS + r'$', previous_word) is not None) or (
+                        re.search(expressions.ORD_OTHER_NUMS + r'$', previous_word) is not None):
+                        sent = re.sub(r'(NUM_START((.(?!NUM_START))*))$', r'NUM_ORD_START\2',
+                            sent) # replace with NUM_ORD_START
+                        sent += 'NUM_ORD_END'
+                    else:
+                        sent += 'NUM_END'
+                    to_add = '<' + m.group('word') + '~' + m.group('pos') + '>'
+            else:
+                to_add = '<' + m.group('word') + '~' + m.group('pos') + '>'
+
+        sent += to_add
+        previous_word = current_word
+
+    if re.match(expressions.NUMBER_TERM + '(-' + expressions.NUMBER_TERM + ')*', current_word, re.I) is not None:
+        # final word is a number
+        sent += 'NUM_END'
+
+    sent += rest
+    return sent
+
+class DeliminateNumbersTest(unittest.TestCase):
+
+    # Words likely to cause numbers to start, continue and end
+    WORDS = ['one', 'Two', 'twenty', 'twenty-one', 'Thirty-First', 'hundred', 'thousand', 'million', 'and', 'AND',
+             'first', 'second', 'Third', 'twelfth', 'twentieth', 'tenth', 'ninety-ninth', 'eleven', 'nineteen',
+             'days', 'the', 'tens', 'someone', 'noon', 'fifth-grade', 'a', '-', 'and-a-half']
+    OTHER = ['12', '1st', ',', '.', "'s", 'don\'t', '3-4', '']
+
+    def _check(self, toks):
+        sent = Sentence(toks)
+        text = SentenceText.of(sent)
+        expected = legacy_deliminate_numbers(text.text)
+        self.assertEquals(deliminate_numbers(text.text), expected)
+        self.assertEquals(text.deliminated.text, expected)
+
+        # Check the tokens have been found in the right places
+        deliminated = text.deliminated
+        for i in range(len(sent)):
+            tok = '<' + sent[i][0] + '~' + sent[i][1] + '>'
+            found = deliminated.text[deliminated.token_offset(i):deliminated.token_offset(i + 1)]
+            self.assertTrue(found.startswith(tok))
+            self.assertTrue(re.match(r'(NUM_(ORD_)?(START|END))*$', found[len(tok):]))
+        self.assertEquals(deliminated.token_offset(len(sent)), len(expected))
+
+    def testExamples(self):
+        for words in [['there', 'are', 'twenty-one', 'balloons'],
+                      ['this', 'is', 'the', 'twenty', 'first', 'balloon'],
+                      ['these', 'are', 'the', 'first', 'two', 'balloons'],
+                      ['two', 'hundred', 'and', 'sixty', 'eight'],
+                      ['six', 'and', 'two'],
+                      ['two', 'hundred', 'and'],
+                      ['the', 'second', ',', 'third', 'and', 'fourth'],
+                      ['one', 'thousand', ',', 'two', '12', 'days', 'first'],
+                      []]:
+            self._check([(w, 'POS', set()) for w in words])
+
+    def testRandomSentences(self):
+        r = random.Random(42)
+        for i in range(500):
+            toks = []
+            for j in range(r.randint(1, 15)):
+                if r.random() < 0.8:
+                    w = r.choice(self.WORDS)
+                else:
+                    w = r.choice(self.OTHER)
+                toks.append((w, r.choice(['CD', 'JJ', 'NN', 'CC']), set()))
+            self._check(toks)
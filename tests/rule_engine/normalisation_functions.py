@@ -1,8 +1,16 @@
+import datetime
+from operator import itemgetter
+import random
+import re
 import unittest
+from ternip.rule_engine.normalisation_functions import calendar_arithmetic
 from ternip.rule_engine.normalisation_functions.string_conversions import *
 from ternip.rule_engine.normalisation_functions.words_to_num import *
+from ternip.rule_engine.normalisation_functions.words_to_num import _word_to_num, _ordinal_to_num
 from ternip.rule_engine.normalisation_functions.date_functions import *
 from ternip.rule_engine.normalisation_functions.relative_date_functions import *
+from ternip.rule_engine.normalisation_functions.lru_cache import lru_cache
+from ternip.rule_engine.normalisation_functions.temporal_value import TemporalValue
 
 class DateFunctionsTest(unittest.TestCase):
     
@@ -36,6 +44,10 @@ class DateFunctionsTest(unittest.TestCase):
     def test_date_to_week(self):
         self.assertEquals('2010W31', date_to_week(2010, 8, 3))
     
+    def test_date_to_week_historical(self):
+        self.assertEquals('1815W24', date_to_week(1815, 6, 18))
+        self.assertRaises(ValueError, date_to_week, 1815, 2, 30)
+    
     def test_date_to_dow_normal(self):
         self.assertEquals(2, date_to_dow(2010, 8, 3))
     
@@ -90,6 +102,17 @@ class DateFunctionsTest(unittest.TestCase):
         self.assertEquals('XXXXXXXXT162808.02', date_to_iso('16:28:08.02'))
         self.assertEquals('XXXXXXXXT162808', date_to_iso('16:28:08'))
     
+    def test_date_to_iso_no_date(self):
+        self.assertEquals('XXXXXXXX', date_to_iso('<yesterday~NN>'))
+        self.assertEquals('XXXXXXXX', date_to_iso('October 2010'))
+        self.assertEquals('XXXXXXXX', date_to_iso('<October~NNP><6th~JJ>'))
+    
+    def test_date_to_iso_cached(self):
+        date_to_iso.cache_clear()
+        self.assertEquals('20101006', date_to_iso('<6~CD><October~NNP><2010~CD>'))
+        self.assertEquals('20101006', date_to_iso('<6~CD><October~NNP><2010~CD>'))
+        self.assertEquals('20101007', date_to_iso('<7~CD><October~NNP><2010~CD>'))
+    
     def test_extract_timezone(self):
         self.assertEquals('RDT', extract_timezone('18:26 RDT'))
         self.assertEquals('PST', extract_timezone('<PST~.+>'))
@@ -102,6 +125,97 @@ class DateFunctionsTest(unittest.TestCase):
         self.assertEquals(6, convert_to_24_hours(6, 'a'))
         self.assertEquals(20, convert_to_24_hours(20, 'a'))
 
+class CalendarArithmeticTest(unittest.TestCase):
+    
+    def test_ordinals(self):
+        for (y, m, d) in [(1, 1, 1), (1815, 6, 18), (1900, 2, 28), (2000, 2, 29), (2000, 12, 31), (2010, 8, 3)]:
+            ordinal = calendar_arithmetic.to_ordinal(y, m, d)
+            self.assertEquals(ordinal, datetime.date(y, m, d).toordinal())
+            self.assertEquals(calendar_arithmetic.from_ordinal(ordinal), (y, m, d))
+            self.assertEquals(calendar_arithmetic.day_of_week(ordinal), datetime.date(y, m, d).weekday())
+        self.assertEquals(calendar_arithmetic.from_ordinal(calendar_arithmetic.to_ordinal(-43, 3, 15)), (-43, 3, 15))
+    
+    def test_check_date(self):
+        self.assertRaises(ValueError, calendar_arithmetic.to_ordinal, 1900, 2, 29)
+        self.assertRaises(ValueError, calendar_arithmetic.to_ordinal, 2010, 13, 1)
+        self.assertRaises(ValueError, calendar_arithmetic.to_ordinal, 2010, 4, 0)
+    
+    def test_week_of_year(self):
+        self.assertEquals(calendar_arithmetic.week_of_year(calendar_arithmetic.to_ordinal(2010, 1, 3)), (2010, 0))
+        self.assertEquals(calendar_arithmetic.week_of_year(calendar_arithmetic.to_ordinal(2010, 1, 4)), (2010, 1))
+    
+    def test_add_months(self):
+        self.assertEquals(calendar_arithmetic.add_months(2010, 8, 5), (2011, 1))
+        self.assertEquals(calendar_arithmetic.add_months(2010, 8, -8), (2009, 12))
+        self.assertEquals(calendar_arithmetic.add_months(2010, 8, -20), (2008, 12))
+
+class TemporalValueTest(unittest.TestCase):
+    
+    def _fields(self, value):
+        return (value.year, value.month, value.week, value.day, value.hour, value.minute, value.second, value.zone,
+                value.granularity)
+    
+    def test_parse(self):
+        self.assertEquals(self._fields(TemporalValue.of('2010')), (2010, None, None, None, None, None, None, None, 'Y'))
+        self.assertEquals(self._fields(TemporalValue.of('2010W31')), (2010, None, 31, None, None, None, None, None, 'W'))
+        self.assertEquals(self._fields(TemporalValue.of('20100804')), (2010, 8, None, 4, None, None, None, None, 'D'))
+        self.assertEquals(self._fields(TemporalValue.of('20100804T16')), (2010, 8, None, 4, 16, None, None, None, 'TH'))
+        self.assertEquals(self._fields(TemporalValue.of('20100804T163604-0500')),
+                          (2010, 8, None, 4, 16, 36, 4, '-0500', 'TS'))
+    
+    def test_not_values(self):
+        for value in ['', 'XXXXXXXX', '20100804TMO', 'PAST_REF', '201013', '20100230', '20100804T25']:
+            self.assertRaises(ValueError, TemporalValue.of, value)
+    
+    def test_shared(self):
+        value = TemporalValue.of('20100804')
+        self.assertTrue(TemporalValue.of('20100804') is value)
+        self.assertTrue(TemporalValue.of(value) is value)
+        self.assertEquals(value, '20100804')
+        self.assertEquals(str(value), '20100804')
+        self.assertEquals(hash(value), hash('20100804'))
+        self.assertRaises(AttributeError, setattr, value, 'day', 5)
+    
+    def test_helpers_accept_values(self):
+        self.assertEquals('20100801', offset_from_date(TemporalValue.of('20100804'), -3))
+        self.assertEquals('20100730', compute_offset_base(TemporalValue.of('20100804'), 'Friday', -1))
+    
+    def test_helpers_return_strings(self):
+        # Values and strings share cache entries, so a value passed in earlier
+        # must not be what's returned for a string
+        for (value, expression) in [('20100101', 'foo'), ('20100102', None)]:
+            compute_offset_base.cache_clear()
+            self.assertEquals(type(compute_offset_base(TemporalValue.of(value), expression, 0)), str)
+            self.assertEquals(type(compute_offset_base(value, expression, 0)), str)
+            self.assertEquals(compute_offset_base(value, expression, 0)[:4], '2010')
+        offset_from_date.cache_clear()
+        self.assertEquals(type(offset_from_date(TemporalValue.of('20100804'), 0, 'X')), str)
+        self.assertEquals(type(offset_from_date('20100804', 0, 'X')), str)
+
+class LruCacheTest(unittest.TestCase):
+    
+    def test_lru_cache(self):
+        calls = []
+        @lru_cache(2)
+        def double(n):
+            calls.append(n)
+            return n * 2
+        self.assertEquals([double(1), double(2), double(1), double(3), double(1), double(2)], [2, 4, 2, 6, 2, 4])
+        # 2 is the least recently used when 3 comes in, so is forgotten
+        self.assertEquals(calls, [1, 2, 3, 2])
+        double.cache_clear()
+        double(1)
+        self.assertEquals(calls, [1, 2, 3, 2, 1])
+    
+    def test_lru_cache_keywords(self):
+        calls = []
+        @lru_cache(10)
+        def add(a, b=0):
+            calls.append((a, b))
+            return a + b
+        self.assertEquals([add(1, b=2), add(1, b=2), add(1, 2), add(1)], [3, 3, 3, 1])
+        self.assertEquals(calls, [(1, 2), (1, 2), (1, 0)])
+
 class StringConversionsTest(unittest.TestCase):
     
     def test_month_to_num_abbr(self):
@@ -232,9 +346,93 @@ class WordsToNumTest(unittest.TestCase):
     
     def test_words_to_num_bad_ordinal(self):
         self.assertEquals(0, words_to_num('first two'))
+    
+    def test_words_to_num_empty(self):
+        self.assertRaises(ValueError, words_to_num, 'NUM_START NUM_END')
+    
+    def test_words_to_num_cached(self):
+        words_to_num.cache_clear()
+        self.assertEquals(2010, words_to_num('two thousand and ten'))
+        self.assertEquals(2010, words_to_num('two thousand and ten'))
+        self.assertEquals(0, words_to_num('two thousand and ten days'))
+    
+    def test_words_to_num_same_as_gutime(self):
+        # Phrases made up at random out of number words, and other things
+        # which get in the way of them, give the same number as the
+        # conversion from GUTime did
+        words = sorted(_word_to_num) + sorted(_ordinal_to_num) + \
+                ['a', 'the', 'and', 'And', 'band', 'andover', 'april', 'them', 'bread', '0', '7', '+3', '1999', '-',
+                 ',', 'NUM_START', 'NUM_END', '<four~CD>', '<324~.+>', '<a>b~c>', '<and~CC>', '']
+        separators = [' ', ' ', ' ', '-', ', ', '\t', '', ' and ', '  ']
+        rand = random.Random(20)
+        for i in range(5000):
+            phrase = ''.join(rand.choice(words) + rand.choice(separators) for j in range(rand.randint(0, 6)))
+            try:
+                expected = _gutime_words_to_num(phrase)
+            except ValueError:
+                self.assertRaises(ValueError, words_to_num, phrase)
+            else:
+                self.assertEquals(expected, words_to_num(phrase), phrase)
+
+def _gutime_words_to_num(words):
+    """
+    words_to_num as it was converted from GUTime, which the quicker version
+    is checked against
+    """
+    words = words.replace('NUM_START', '').strip()
+    words = words.replace('NUM_END', '').strip()
+    words = words.lower()
+    words = re.sub(r'<([^~]*)[^>]*>', r'\1 ', words).strip()
+    words = words.strip()
+    words = re.sub(r'-', '', words)
+    words = re.sub(r',', '', words)
+    words = re.sub(r'\sand', '', words)
+    words = re.sub(r'^a', 'one', words)
+    words = re.sub(r'^the', 'one', words)
+    words = words.split()
+    for i in range(len(words)):
+        if words[i] in _word_to_num:
+            words[i] = _word_to_num[words[i]]
+        elif words[i] in _ordinal_to_num and len(words) - 1 == i:
+            words[i] = ordinal_to_num(words[i])
+        else:
+            try:
+                words[i] = int(words[i])
+            except ValueError:
+                return 0
+    return _gutime_break_down(words)
+
+def _gutime_break_down(nums):
+    if len(nums) == 1:
+        return nums[0]
+    (highest_num, highest_num_i) = max(zip(nums, range(len(nums))), key=itemgetter(0))
+    before = nums[:highest_num_i]
+    after = nums[highest_num_i + 1:]
+    if len(before) > 0:
+        before = _gutime_break_down(before)
+    else:
+        before = 1
+    if len(after) > 0:
+        after = _gutime_break_down(after)
+    else:
+        after = 0
+    return (before * highest_num) + after
 
 class RelativeDateFunctionsTest(unittest.TestCase):
     
+    def test_offset_from_date(self):
+        self.assertEquals('20100801', offset_from_date('20100804', -3))
+        self.assertEquals('20100804T1530', offset_from_date('20100804T1500', 30, 'TM'))
+        self.assertEquals('20100803T23', offset_from_date('20100804T01', -2, 'TH'))
+        self.assertEquals('2010W32', offset_from_date('20100804', 1, 'W'))
+        self.assertEquals('20100228', offset_from_date('20100131', 1, 'M', True))
+        self.assertEquals('FUTURE_REF', offset_from_date('', 2))
+    
+    def test_offset_from_date_historical(self):
+        self.assertEquals('18150617', offset_from_date('18150618', -1))
+        self.assertEquals('1815W23', offset_from_date('18150618', -1, 'W'))
+        self.assertEquals('181412', offset_from_date('18150618', -6, 'M'))
+    
     def test_compute_offset_base_yesterday(self):
         self.assertEquals('20100803', compute_offset_base('20100804', 'Yesterday', 1))
         self.assertEquals('20100803', compute_offset_base('20100804', 'yesterday', -1))
@@ -319,6 +517,10 @@ class RelativeDateFunctionsTest(unittest.TestCase):
         self.assertEquals('20100404', compute_offset_base('20100404', '<easter~foo>', 1))
         self.assertEquals('20100404', compute_offset_base('20100404', '<easter~foo>', -1))
     
+    def test_compute_offset_base_historical(self):
+        self.assertEquals('18151123', compute_offset_base('18150618', 'thanksgiving', 1))
+        self.assertEquals('18150326', compute_offset_base('18150618', '<easter~foo>', -1))
+    
     def test_offset_minute(self):
         self.assertEquals('20100804T1628', offset_from_date('20100804T163604', -8, 'TM'))
         self.assertEquals('20100804T1642', offset_from_date('20100804T1636', 6, 'TM'))
@@ -1,8 +1,12 @@
 #!/usr/bin/env python
 
+import logging
+import pickle
 import unittest
 from ternip.timex import Timex
 from ternip.rule_engine.normalisation_rule import NormalisationRule
+from ternip.rule_engine.timex_context import TimexContext
+from ternip.sentence import Sentence
 
 class normalisation_rule_Test(unittest.TestCase):
     
@@ -291,4 +295,97 @@ class normalisation_rule_Test(unittest.TestCase):
             [('to', 'POS', set()),
              ('Atlanta', 'POS', set())]
         )
-        self.assertFalse(rule.apply(t, '', '', body, before, after)[0])
\ No newline at end of file
+        self.assertFalse(rule.apply(t, '', '', body, before, after)[0])
+    
+    def _body(self, t):
+        return [('06', 'POS', set([t])), ('th', 'POS', set([t])), ('January', 'POS', set([t])), ('1996', 'POS', set([t]))]
+    
+    def _logged(self, f):
+        records = []
+        class handler(logging.Handler):
+            def emit(self, record):
+                records.append(record)
+        h = handler()
+        logger = logging.getLogger('ternip.rule_engine.normalisation_rule')
+        logger.addHandler(h)
+        try:
+            f()
+        finally:
+            logger.removeHandler(h)
+        return records
+    
+    def testApplyMod(self):
+        rule = NormalisationRule(r'<(\d+)~.+><th~.+><January~.+><(\d{4})~.+>', 'date', 'testApplyMod', mod=r'"APPROX" if int({#1}) > 5 else None')
+        t = Timex(type='date')
+        self.assertTrue(rule.apply(t, '', '', self._body(t), [], [])[0])
+        self.assertEquals(t.mod, 'APPROX')
+    
+    def testApplyUsesArguments(self):
+        rule = NormalisationRule(r'<(\d+)~.+><th~.+><January~.+><(\d{4})~.+>', 'date', 'testApplyUsesArguments',
+                                 r'dct + cur_context + str(len(body)) + self._toks_to_str(after)')
+        t = Timex(type='date')
+        self.assertTrue(rule.apply(t, 'B', 'A', self._body(t), [], [('now', 'RB', set())])[0])
+        self.assertEquals(t.value, 'AB4<now~RB>')
+    
+    def testGroupInString(self):
+        # The group short form is replaced inside strings too
+        rule = NormalisationRule(r'<(\d+)~.+><th~.+><January~.+><(\d{4})~.+>', 'date', 'testGroupInString', r'"{#1}"')
+        t = Timex(type='date')
+        self.assertTrue(rule.apply(t, '', '', self._body(t), [], [])[0])
+        self.assertEquals(t.value, 'match.group(1)')
+    
+    def testExpressionErrorLogged(self):
+        rule = NormalisationRule(r'<(\d+)~.+><th~.+><January~.+><(\d{4})~.+>', 'date', 'testExpressionErrorLogged',
+                                 r'{#2} + "01" + {#1}', change_type=r'{#1} + 1', freq=r'"1D"')
+        t = Timex(type='date')
+        records = self._logged(lambda: self.assertTrue(rule.apply(t, '', '', self._body(t), [], [])[0]))
+        self.assertEquals(len(records), 1)
+        self.assertEquals(records[0].exc_info[0], TypeError)
+
+        # Expressions up to the error are still applied, but not after
+        self.assertEquals(t.value, '19960106')
+        self.assertEquals(t.type, 'date')
+        self.assertEquals(t.freq, None)
+    
+    def testMissingGroupLogged(self):
+        rule = NormalisationRule(r'<(\d+)~.+><th~.+><January~.+><(\d{4})~.+>', 'date', 'testMissingGroupLogged',
+                                 r'{#2} if True else {#3}', freq=r'{#3}')
+        t = Timex(type='date')
+        records = self._logged(lambda: self.assertTrue(rule.apply(t, '', '', self._body(t), [], [])[0]))
+        self.assertEquals(len(records), 1)
+        self.assertEquals(records[0].exc_info[0], IndexError)
+        self.assertEquals(t.value, '1996')
+    
+    def testMalformedExpression(self):
+        self.assertRaises(SyntaxError, NormalisationRule, r'<(\d+)~.+>', 'date', 'testMalformedExpression', r'{#1} +')
+    
+    def testPickle(self):
+        rule = pickle.loads(pickle.dumps(NormalisationRule(r'<(\d+)~.+><th~.+><January~.+><(\d{4})~.+>', 'date',
+                                                           'testPickle', r'{#2} + "01" + {#1}', quant=r'"EVERY"')))
+        t = Timex(type='date')
+        self.assertTrue(rule.apply(t, '', '', self._body(t), [], [])[0])
+        self.assertEquals(t.value, '19960106')
+        self.assertEquals(t.quant, 'EVERY')
+    
+    def testSharedPatterns(self):
+        rule1 = NormalisationRule(r'<(\d+)~.+><th~.+>', 'date', 'testSharedPatterns1', r'{#1}', guards=[r'!<th~.+>'])
+        rule2 = NormalisationRule(r'<(\d+)~.+><th~.+>', 'date', 'testSharedPatterns2', r'{#1}', after_guards=[r'!<th~.+>'])
+        self.assertTrue(rule1._match is rule2._match)
+        self.assertTrue(rule1._guards[1][0] is rule2._after_guards[1][0])
+    
+    def testGuardSearchesShared(self):
+        rule1 = NormalisationRule(r'<(\d+)~.+><th~.+><January~.+><(\d{4})~.+>', 'date', 'testGuardSearchesShared1',
+                                  r'{#2} + "01" + {#1}', sent_guards=[r'<plane~.+>'])
+        rule2 = NormalisationRule(r'<(\d+)~.+><th~.+><January~.+><(\d{4})~.+>', 'date', 'testGuardSearchesShared2',
+                                  r'{#2} + "02" + {#1}', sent_guards=[r'<plane~.+>'])
+        t = Timex(type='date')
+        sent = Sentence(self._body(t))
+        (before, body, after) = (sent[:0], sent[:], sent[4:])
+        self.assertFalse(rule1.apply(t, '', '', body, before, after)[0])
+        context = TimexContext.of(body, before, after)
+        self.assertEquals(context.searches.values(), [False])
+        
+        # rule2 uses the result rule1 got, rather than searching again
+        context.searches[context.searches.keys()[0]] = True
+        self.assertTrue(rule2.apply(t, '', '', body, before, after)[0])
+        self.assertEquals(t.value, '19960206')
@@ -33,4 +33,46 @@ class NormalisationRuleBlockTest(unittest.TestCase):
     def testRaiseError(self):
         rules = [NormalisationRule(r'<(\d+)~.+><th~.+><January~.+><(\d{4})~.+>', 'date', 'testRaiseError1', r'{#2} + "01" + {#1}'),
                  NormalisationRule(r'<(\d+)~.+><th~.+><January~.+><(\d{4})~.+>', 'date', 'testRaiseError2', r'{#2} + "02" + {#1}')]
-        self.assertRaises(RuleLoadError, NormalisationRuleBlock, None, [], 'invalid', rules)
\ No newline at end of file
+        self.assertRaises(RuleLoadError, NormalisationRuleBlock, None, [], 'invalid', rules)
+    
+    def testApplyUntilSuccessByType(self):
+        rules = [NormalisationRule(r'<(\d+)~.+><th~.+><January~.+><(\d{4})~.+>', 'time', 'testApplyUntilSuccessByTypeA', r'{#2} + "03" + {#1}'),
+                 NormalisationRule(r'<(\d+)~.+><th~.+><January~.+><(\d{4})~.+>', None, 'testApplyUntilSuccessByTypeB', r'{#2} + "01" + {#1}'),
+                 NormalisationRule(r'<(\d+)~.+><th~.+><January~.+><(\d{4})~.+>', 'date', 'testApplyUntilSuccessByTypeC', r'{#2} + "02" + {#1}')]
+        b = NormalisationRuleBlock(None, [], 'until-success', rules)
+        for (type, value) in [('date', '19960106'), ('DATE', '19960106'), ('time', '19960306'), ('set', '19960106')]:
+            t = Timex(type=type)
+            self.assertTrue(b.apply(t, '', '', [('06', 'POS', {t}), ('th', 'POS', {t}), ('January', 'POS', {t}), ('1996', 'POS', {t})], [], [])[0])
+            self.assertEquals(t.value, value)
+    
+    def testApplyOnlyMatchingType(self):
+        rules = [NormalisationRule(r'<(\d+)~.+><th~.+><January~.+><(\d{4})~.+>', 'time', 'testApplyOnlyMatchingTypeA', r'{#2} + "03" + {#1}'),
+                 NormalisationRule(r'<(\d+)~.+><th~.+><February~.+><(\d{4})~.+>', 'date', 'testApplyOnlyMatchingTypeB', r'{#2} + "02" + {#1}')]
+        b = NormalisationRuleBlock(None, [], 'until-success', rules)
+        t = Timex(type='date')
+        self.assertFalse(b.apply(t, '', '', [('06', 'POS', {t}), ('th', 'POS', {t}), ('January', 'POS', {t}), ('1996', 'POS', {t})], [], [])[0])
+        self.assertEquals(t.value, None)
+    
+    def testApplyAllChangeType(self):
+        rules = [NormalisationRule(r'<every~.+><week~.+>', 'date', 'testApplyAllChangeTypeA', change_type='"set"'),
+                 NormalisationRule(r'<every~.+><week~.+>', 'date', 'testApplyAllChangeTypeB', '"XXXX-WXX-1"'),
+                 NormalisationRule(r'<every~.+><week~.+>', 'set', 'testApplyAllChangeTypeC', '"XXXX-WXX"'),
+                 NormalisationRule(r'<every~.+><week~.+>', 'set', 'testApplyAllChangeTypeD', freq='"1W"')]
+        b = NormalisationRuleBlock(None, [], 'all', rules)
+        t = Timex(type='date')
+        self.assertTrue(b.apply(t, '', '', [('every', 'POS', {t}), ('week', 'POS', {t})], [], [])[0])
+        self.assertEquals(t.type, 'set')
+        self.assertEquals(t.value, 'XXXX-WXX')
+        self.assertEquals(t.freq, '1W')
+    
+    def testApplyTooFewTokens(self):
+        rules = [NormalisationRule(r'<(\d+)~.+>(<th~.+>)?<January~.+><(\d{4})~.+>', 'date', 'testApplyTooFewTokensA', r'{#3} + "01" + {#1}'),
+                 NormalisationRule(r'<(\d+)~.+>(<th~.+>)?<(\d{4})~.+>', 'date', 'testApplyTooFewTokensB', r'{#3} + "00" + {#1}')]
+        self.assertEquals([rule.min_tokens for rule in rules], [3, 2])
+        b = NormalisationRuleBlock(None, [], 'until-success', rules)
+        t = Timex(type='date')
+        self.assertTrue(b.apply(t, '', '', [('06', 'POS', {t}), ('January', 'POS', {t}), ('1996', 'POS', {t})], [], [])[0])
+        self.assertEquals(t.value, '19960106')
+        t = Timex(type='date')
+        self.assertTrue(b.apply(t, '', '', [('06', 'POS', {t}), ('1996', 'POS', {t})], [], [])[0])
+        self.assertEquals(t.value, '19960006')
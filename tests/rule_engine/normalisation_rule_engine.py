@@ -1,5 +1,7 @@
 import os.path
 import unittest
+import ternip
+from ternip.rule_engine.normalisation_functions.temporal_value import TemporalValue
 from ternip.rule_engine.normalisation_rule_engine import NormalisationRuleEngine
 from ternip.rule_engine.rule_engine import RuleLoadErrors
 from ternip.timex import Timex
@@ -24,6 +26,13 @@ class NormalisationRuleEngineTest(unittest.TestCase):
              ('Atlanta', 'POS', set())]], '')
         self.assertEquals(t.value, '19960106')
     
+    def testTemporalValueDct(self):
+        t = Timex(type='date')
+        ternip.normaliser().annotate([[('We', 'POS', set()),
+             ('left', 'VBD', set()),
+             ('yesterday', 'NN', {t})]], TemporalValue.of('20100804'))
+        self.assertEquals(t.value, '20100803')
+    
     def testBadErrors(self):
         r = NormalisationRuleEngine()
         try:
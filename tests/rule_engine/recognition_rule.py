@@ -269,4 +269,20 @@ class RecognitionRuleTest(unittest.TestCase):
                                       ('first', 'POS', set()), ('two', 'POS', set()), ('hundred', 'POS', set()),
                                       ('and', 'POS', set()), ('sixty', 'POS', set()), ('eight', 'POS', set()),
                                       ('balloons', 'POS', set())])
-        self.assertTrue(success)
\ No newline at end of file
+        self.assertTrue(success)
+    
+    def testDeliminateNumbersExtent(self):
+        rule = RecognitionRule(r'NUM_START<two~.+><hundred~.+>NUM_END<days~.+>', 'date', 'test', deliminate_numbers=True)
+        (sent, success) = rule.apply([('in', 'POS', set()), ('two', 'POS', set()), ('hundred', 'POS', set()),
+                                      ('days', 'POS', set()), ('time', 'POS', set())])
+        self.assertEquals([len(s[2]) for s in sent], [0,1,1,1,0], 'actual result was '+str(sent))
+        self.assertTrue(success)
+    
+    def testTokenContainingAngleBracket(self):
+        rule = RecognitionRule(r'<Friday~.+>', 'date', 'test')
+        (sent, success) = rule.apply([('<', 'SYM', set()),
+                           ('<<', 'SYM', set()),
+                           ('on', 'POS', set()),
+                           ('Friday', 'POS', set())])
+        self.assertEquals([len(s[2]) for s in sent], [0,0,0,1], 'actual result was '+str(sent))
+        self.assertTrue(success)
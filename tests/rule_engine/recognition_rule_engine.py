@@ -2,8 +2,9 @@
 
 import unittest
 import os.path
+from ternip.rule_engine.recognition_rule import RecognitionRule
 from ternip.rule_engine.recognition_rule_engine import RecognitionRuleEngine
-from ternip.rule_engine.rule_engine import RuleLoadErrors
+from ternip.rule_engine.rule_engine import RuleLoadError, RuleLoadErrors
 
 class RecognitionRuleEngineTest(unittest.TestCase):
     
@@ -20,6 +21,7 @@ class RecognitionRuleEngineTest(unittest.TestCase):
             r.load_rules(os.path.join(os.path.dirname(__file__), 'test_recognition_rules_malformed/'))
         except RuleLoadErrors as e:
             self.assertEquals(len(e.errors), 12, "These errors were raised: " + str(e))
+            self.assertTrue(all(isinstance(error, RuleLoadError) for error in e.errors))
         else:
             self.fail('No exceptions were raised/caught')
     
@@ -29,6 +31,7 @@ class RecognitionRuleEngineTest(unittest.TestCase):
             r.load_rules(os.path.join(os.path.dirname(__file__), 'test_recognition_rules_after/'))
         except RuleLoadErrors as e:
             self.assertEquals(len(e.errors), 2, "These errors were raised: " + str(e))
+            self.assertTrue(all(isinstance(error, RuleLoadError) for error in e.errors))
         else:
             self.fail('No exceptions were raised/caught')
     
@@ -38,6 +41,7 @@ class RecognitionRuleEngineTest(unittest.TestCase):
             r.load_rules(os.path.join(os.path.dirname(__file__), 'test_recognition_rules_circular/'))
         except RuleLoadErrors as e:
             self.assertEquals(len(e.errors), 2, "These errors were raised: " + str(e))
+            self.assertTrue(all(isinstance(error, RuleLoadError) for error in e.errors))
         else:
             self.fail('No exceptions were raised/caught')
     
@@ -54,5 +58,38 @@ class RecognitionRuleEngineTest(unittest.TestCase):
             r.load_rules(os.path.join(os.path.dirname(__file__), 'test_recognition_rule_blocks_malformed/'))
         except RuleLoadErrors as e:
             self.assertEquals(len(e.errors), 9, "These errors were raised: " + str(e))
+            self.assertTrue(all(isinstance(error, RuleLoadError) for error in e.errors))
         else:
-            self.fail('No exceptions were raised/caught')
\ No newline at end of file
+            self.fail('No exceptions were raised/caught')
+    
+    def testPlanRespectsAfter(self):
+        e = RecognitionRuleEngine()
+        e._rules = [RecognitionRule(r'<Friday~.+>', 'date', 'C', after=['B']),
+                    RecognitionRule(r'<Friday~.+>', 'date', 'B', after=['A']),
+                    RecognitionRule(r'<Friday~.+>', 'date', 'D'),
+                    RecognitionRule(r'<Friday~.+>', 'date', 'A')]
+        e._check_rule_consistency()
+        self.assertEquals([rule.id for rule in e._plan], ['D', 'A', 'B', 'C'])
+    
+    def testUnrunnableRulesLeftOutOfPlan(self):
+        r = RecognitionRuleEngine()
+        try:
+            r.load_rules(os.path.join(os.path.dirname(__file__), 'test_recognition_rules_circular/'))
+        except RuleLoadErrors:
+            pass
+        self.assertEquals(r._plan, [])
+        tagged = r.tag([[('We', 'POS', set()), ('went', 'POS', set()), ('shopping', 'POS', set()), ('on', 'POS', set()), ('Friday', 'POS', set())]])
+        self.assertEquals([[len(s[2]) for s in sent] for sent in tagged], [[0,0,0,0,0]])
+    
+    def testCircularErrorsLongChain(self):
+        e = RecognitionRuleEngine()
+        e._rules = [RecognitionRule(r'<Friday~.+>', 'date', str(i), after=[str(i + 1)]) for i in range(2000)]
+        e._rules.append(RecognitionRule(r'<Friday~.+>', 'date', '2000', after=['0']))
+        e._rules.append(RecognitionRule(r'<Friday~.+>', 'date', 'independent'))
+        try:
+            e._check_rule_consistency()
+        except RuleLoadErrors as ex:
+            self.assertEquals(len(ex.errors), 2001)
+        else:
+            self.fail('No exceptions were raised/caught')
+        self.assertEquals([rule.id for rule in e._plan], ['independent'])
\ No newline at end of file
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+import os
+import os.path
+import shutil
+import stat
+import tempfile
+import unittest
+from ternip.rule_engine import rule_cache
+from ternip.rule_engine.normalisation_rule_engine import NormalisationRuleEngine
+from ternip.rule_engine.recognition_rule_engine import RecognitionRuleEngine
+from ternip.timex import Timex
+
+class RuleCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self._cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._cache_dir)
+
+    def _path(self, rules):
+        return os.path.join(os.path.dirname(__file__), rules)
+
+    def _sents(self):
+        return [[('We', 'POS', set()), ('went', 'POS', set()), ('shopping', 'POS', set()), ('on', 'POS', set()), ('Friday', 'POS', set())],
+                [('We', 'POS', set()), ('went', 'POS', set()), ('shopping', 'POS', set()), ('last', 'POS', set()), ('Thursday', 'POS', set())]]
+
+    def _tag(self, e):
+        return [[len(s[2]) for s in sent] for sent in e.tag(self._sents())]
+
+    def testRecognitionRulesCached(self):
+        e = RecognitionRuleEngine()
+        e.load_rules(self._path('test_recognition_rules/'), self._cache_dir)
+        self.assertEquals(len(os.listdir(self._cache_dir)), 1)
+
+        cached = RecognitionRuleEngine()
+        cached.load_rules(self._path('test_recognition_rules/'), self._cache_dir)
+        self.assertEquals(cached.num_rules, e.num_rules)
+        self.assertEquals([rule.id for rule in cached._plan], [rule.id for rule in e._plan])
+        self.assertEquals(self._tag(cached), self._tag(e))
+
+    def testNormalisationRulesCached(self):
+        e = NormalisationRuleEngine()
+        e.load_rules(self._path('test_normalisation_rules/'), self._cache_dir)
+        cached = NormalisationRuleEngine()
+        cached.load_rules(self._path('test_normalisation_rules/'), self._cache_dir)
+        self.assertEquals(cached.num_rules, e.num_rules)
+
+        # The value expression survives caching
+        t = Timex(type='date')
+        cached.annotate([[('on', 'POS', set()), ('the', 'POS', set()), ('06', 'POS', set([t])), ('th', 'POS', set([t])),
+                          ('January', 'POS', set([t])), ('1996', 'POS', set([t]))]], '')
+        self.assertEquals(t.value, '19960106')
+
+    def testKeyChangesWithRules(self):
+        path = os.path.join(self._cache_dir, 'rules')
+        shutil.copytree(self._path('test_recognition_rules/'), path)
+        key = rule_cache.cache_key(RecognitionRuleEngine, path)
+        self.assertEquals(rule_cache.cache_key(RecognitionRuleEngine, path), key)
+        self.assertNotEquals(rule_cache.cache_key(NormalisationRuleEngine, path), key)
+        with open(os.path.join(path, 'test.rule'), 'a') as fd:
+            fd.write('\n# changed\n')
+        self.assertNotEquals(rule_cache.cache_key(RecognitionRuleEngine, path), key)
+
+    def testBrokenCacheIgnored(self):
+        key = rule_cache.cache_key(RecognitionRuleEngine, self._path('test_recognition_rules/'))
+        with open(os.path.join(self._cache_dir, key + '.rules'), 'wb') as fd:
+            fd.write('not a cache')
+        e = RecognitionRuleEngine()
+        e.load_rules(self._path('test_recognition_rules/'), self._cache_dir)
+        self.assertEquals(self._tag(e), [[0,0,0,0,1],[0,0,0,0,0]])
+
+    def testCacheDirPrivate(self):
+        cache_dir = os.path.join(self._cache_dir, 'rules')
+        e = RecognitionRuleEngine()
+        e.load_rules(self._path('test_recognition_rules/'), cache_dir)
+        self.assertEquals(stat.S_IMODE(os.stat(cache_dir).st_mode), 0700)
+        [filename] = os.listdir(cache_dir)
+        self.assertFalse(os.stat(os.path.join(cache_dir, filename)).st_mode & (stat.S_IWGRP | stat.S_IWOTH))
+
+    def testWritableCacheIgnored(self):
+        e = RecognitionRuleEngine()
+        e.load_rules(self._path('test_recognition_rules/'), self._cache_dir)
+        key = rule_cache.cache_key(RecognitionRuleEngine, self._path('test_recognition_rules/'))
+        self.assertNotEquals(rule_cache.load(self._cache_dir, key), None)
+        os.chmod(os.path.join(self._cache_dir, key + '.rules'), 0666)
+        self.assertEquals(rule_cache.load(self._cache_dir, key), None)
+
+    def testSharedEngine(self):
+        a = rule_cache.shared_engine(RecognitionRuleEngine, self._path('test_recognition_rules/'))
+        b = rule_cache.shared_engine(RecognitionRuleEngine, self._path('test_recognition_rules/'))
+        self.assertFalse(a is b)
+        self.assertEquals(a.num_rules, b.num_rules)
+        self.assertTrue(a._rules[0] is b._rules[0])
+        self.assertEquals(self._tag(b), [[0,0,0,0,1],[0,0,0,0,0]])
+
+    def testSharedEngineRulesChanged(self):
+        path = os.path.join(self._cache_dir, 'rules')
+        shutil.copytree(self._path('test_recognition_rules/'), path)
+        a = rule_cache.shared_engine(RecognitionRuleEngine, path)
+        with open(os.path.join(path, 'test.rule'), 'a') as fd:
+            fd.write('\n# changed\n')
+        b = rule_cache.shared_engine(RecognitionRuleEngine, path)
+        self.assertFalse(a._rules[0] is b._rules[0])
+        self.assertTrue(rule_cache.shared_engine(RecognitionRuleEngine, path)._rules[0] is b._rules[0])
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+
+import marshal
+import re
+import unittest
+from ternip.rule_engine import rule_compiler
+from ternip.rule_engine.normalisation_functions.words_to_num import words_to_num
+
+class RuleCompilerTest(unittest.TestCase):
+
+    def _call(self, f, match):
+        return f(match, None, None, None, None, None, None, None)
+
+    def testGroupsAndHelpers(self):
+        code = rule_compiler.compile_expressions('test', [('value', r'str(words_to_num({#1})) + {#2}')], 2)
+        f = rule_compiler.load_expressions(code)['_value']
+        self.assertEquals(f.func_defaults, (words_to_num,))
+        self.assertEquals(self._call(f, re.match(r'(\w+) (\w+)', 'twelve days')), '12days')
+
+    def testSeveralExpressions(self):
+        code = rule_compiler.compile_expressions('test', [('value', r'{#1}'), ('freq', r'"1D"')], 1)
+        namespace = rule_compiler.load_expressions(marshal.loads(marshal.dumps(code)))
+        self.assertEquals(self._call(namespace['_value'], re.match(r'(\w+)', 'today')), 'today')
+        self.assertEquals(self._call(namespace['_freq'], None), '1D')
+        self.assertFalse('_mod' in namespace)
+
+    def testGroupNotInMatch(self):
+        code = rule_compiler.compile_expressions('test', [('value', r'{#1} or {#2}')], 1)
+        f = rule_compiler.load_expressions(code)['_value']
+        self.assertEquals(self._call(f, re.match(r'(\w+)', 'today')), 'today')
+        self.assertRaises(IndexError, self._call, f, re.match(r'(\w*)', ''))
+
+    def testOnlyHelpersBound(self):
+        namespace = rule_compiler.load_expressions(rule_compiler.compile_expressions('test', [('value', r'"1D"')], 0))
+        self.assertTrue(namespace['words_to_num'] is words_to_num)
+        self.assertTrue('re' in namespace)
+        for name in ['tokenize', 'StringIO', 'keyword', 'compile_expressions', 'ARGUMENTS', 'calendar', 'lru_cache']:
+            self.assertFalse(name in namespace, name)
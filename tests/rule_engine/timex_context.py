@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+import unittest
+from ternip.rule_engine.timex_context import TimexContext
+from ternip.sentence import Sentence
+
+class TimexContextTest(unittest.TestCase):
+
+    def _slices(self):
+        sent = Sentence([('on', 'IN', set()), ('the', 'DT', set()), ('sixth', 'JJ', set()), ('of', 'IN', set()),
+                         ('July', 'NNP', set()), ('.', '.', set())])
+        return sent[:2], sent[2:5], sent[5:]
+
+    def testRenderings(self):
+        (before, body, after) = self._slices()
+        context = TimexContext.of(body, before, after)
+        self.assertEquals(context.before_text, '<on~IN><the~DT>')
+        self.assertEquals(context.body_text, '<sixth~JJ><of~IN><July~NNP>')
+        self.assertEquals(context.after_text, '<.~.>')
+        self.assertEquals(context.sent_text, '<on~IN><the~DT><sixth~JJ><of~IN><July~NNP><.~.>')
+
+    def testMatchText(self):
+        (before, body, after) = self._slices()
+        context = TimexContext.of(body, before, after)
+        self.assertEquals(context.match_text(True, False), '<sixth~JJ><of~IN><July~NNP>')
+        self.assertEquals(context.match_text(True, True), 'NUM_ORD_START<sixth~JJ>NUM_ORD_END<of~IN><July~NNP>')
+        self.assertEquals(context.match_text(' ', False), 'sixth of July')
+        self.assertEquals(context.match_text('', False), 'sixthofJuly')
+        self.assertEquals(context.trigger_text((' ', False)), 'sixth of july')
+
+    def testSharedBetweenRules(self):
+        (before, body, after) = self._slices()
+        context = TimexContext.of(body, before, after)
+        self.assertTrue(TimexContext.of(body, before, after) is context)
+        self.assertTrue(context.body_text is context.body_text)
+
+        # A different sentence around the same body is a different context
+        self.assertFalse(TimexContext.of(body, [], []) is context)
+        self.assertEquals(TimexContext.of(body, [], []).sent_text, '<sixth~JJ><of~IN><July~NNP>')
+
+    def testLists(self):
+        context = TimexContext.of([('today', 'NN', set())], [], [('.', '.', set())])
+        self.assertEquals(context.body_text, '<today~NN>')
+        self.assertEquals(context.sent_text, '<today~NN><.~.>')
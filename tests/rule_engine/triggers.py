@@ -0,0 +1,112 @@
+import unittest
+import os.path
+import re
+from ternip.rule_engine.recognition_rule import RecognitionRule
+from ternip.rule_engine.recognition_rule_block import RecognitionRuleBlock
+from ternip.rule_engine.recognition_rule_engine import RecognitionRuleEngine
+from ternip.rule_engine.rule import Rule
+from ternip.rule_engine.triggers import find_triggers, TriggerIndex
+from ternip.timex import Timex
+
+class TriggersTest(unittest.TestCase):
+
+    def _find(self, exp, flags=re.I):
+        return find_triggers(Rule()._prep_re(exp), flags)
+
+    def _sent(self, words):
+        return [(w, 'POS', set()) for w in words.split()]
+
+    def testLiteral(self):
+        self.assertEquals(self._find(r'<ago~.+>'), [frozenset(['ago~'])])
+
+    def testAllRequired(self):
+        self.assertEquals(self._find(r'<a~.+><fortnight~.+>'), [frozenset(['fortnight~']), frozenset(['a~'])])
+
+    def testBranch(self):
+        self.assertEquals(self._find(r'<(January|February)~.+>'), [frozenset(['january', 'february'])])
+
+    def testDigits(self):
+        self.assertEquals(self._find(r'<\d+~.+>'), [frozenset('0123456789')])
+
+    def testCaseSensitive(self):
+        self.assertEquals(self._find(r'<Friday~.+>', 0), [frozenset(['Friday~'])])
+
+    def testOptional(self):
+        self.assertEquals(self._find(r'<(the~.+>)?<[a-z]+~.+>'), None)
+
+    def testBranchOfDifferentParts(self):
+        self.assertEquals(self._find(r'(<ago~.+>|<.+~CD>)'), [frozenset(['ago~', '~cd'])])
+
+    def testBranchWithAnything(self):
+        self.assertEquals(self._find(r'(<ago~.+>|<.+~.+>)'), None)
+
+    def testRepeat(self):
+        self.assertEquals(self._find(r'(<very~.+>)+<[a-z]+~.+>'), [frozenset(['very~'])])
+
+    def testRuleTriggers(self):
+        rule = RecognitionRule(r'<Friday~.+>', 'date', 'test')
+        self.assertEquals(rule.triggers, [((False, False), [frozenset(['friday~'])])])
+
+    def testDeclaredTriggers(self):
+        rule = RecognitionRule(r'<Friday~.+>', 'date', 'test', deliminate_numbers=True, triggers=['Fri'])
+        self.assertEquals(rule.triggers, [((True, False), [frozenset(['fri'])])])
+
+    def testIndexSelect(self):
+        a = RecognitionRule(r'<Friday~.+>', 'date', 'a')
+        b = RecognitionRule(r'<(last|next)~.+><week~.+>', 'date', 'b')
+        c = RecognitionRule(r'<.+~.+>', 'date', 'c')
+        d = RecognitionRule(r'<last~.+><month~.+>', 'date', 'd')
+        index = TriggerIndex([a, b, c, d])
+        sent = self._sent('We met last week')
+        self.assertEquals(index.select(lambda key: RecognitionRule._trigger_text(key, sent)), [(1, b), (2, c)])
+
+    def testBlockTriggers(self):
+        a = RecognitionRule(r'<Friday~.+>', 'date', 'a')
+        b = RecognitionRule(r'<Saturday~.+>', 'date', 'b', case_sensitive=True)
+        block = RecognitionRuleBlock('block', [], 'until-success', [a, b])
+        self.assertEquals(block.triggers, [((False, False), [frozenset(['friday~'])]), ((False, True), [frozenset(['Saturday~'])])])
+
+    def testCouldMatch(self):
+        index = TriggerIndex([RecognitionRule(r'<last~.+><month~.+>', 'date', 'a'),
+                              RecognitionRule(r'<\d+~.+><days~.+>', 'date', 'b')])
+        could_match = lambda words: index.could_match(lambda key: RecognitionRule._trigger_text(key, self._sent(words)))
+        self.assertTrue(could_match('We met last month'))
+        self.assertTrue(could_match('We met 3 days ago'))
+        self.assertFalse(could_match('We met last night'))
+        self.assertFalse(could_match('We met 3 people'))
+
+    def testEngineUsesTriggers(self):
+        e = RecognitionRuleEngine()
+        e.load_rules(os.path.join(os.path.dirname(__file__), 'test_recognition_rules_triggers/'))
+        tagged = e.tag([self._sent('See you on Saturday'),
+                        self._sent('See you at the weekend on Sunday'),
+                        self._sent('See you on Friday')])
+        self.assertEquals([[len(s[2]) for s in sent] for sent in tagged], [[0,0,0,0],[0,0,0,0,0,0,1],[0,0,0,1]], 'actual result was '+str([[len(s[2]) for s in sent] for sent in tagged]))
+
+    def testGateVerification(self):
+        e = RecognitionRuleEngine()
+        e.load_rules(os.path.join(os.path.dirname(__file__), 'test_recognition_rules_triggers/'))
+        e.verify_gate = True
+        e.tag([self._sent('See you on Saturday'), self._sent('See you on Friday'), self._sent('See you soon')])
+
+        # The declared trigger on the weekend rule means it is skipped, which
+        # the full set of rules disagrees with
+        self.assertEquals(e.gate_disagreements, ['<See~POS><you~POS><on~POS><Saturday~POS>'])
+
+    def testGateKeepsExistingTimexes(self):
+        class merge(object):
+            id = 'merge'
+            after = []
+            needs_timexes = True
+            def apply(self, sent):
+                for (tok, pos, ts) in sent:
+                    ts.clear()
+                return sent, True
+        e = RecognitionRuleEngine()
+        e._rules.append(RecognitionRule(r'<Friday~.+>', 'date', 'friday'))
+        e._rules.append(merge())
+        e._check_rule_consistency()
+        sent = self._sent('See you soon')
+        sent[2][2].add(Timex())
+        (tagged,) = e.tag([sent])
+        self.assertEquals([len(s[2]) for s in tagged], [0,0,0])
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+import unittest
+from ternip.rule_engine.verb_table import VerbTable
+from ternip.sentence import Sentence
+
+class VerbTableTest(unittest.TestCase):
+
+    def _sent(self):
+        return Sentence([('He', 'PRP', set()), ('said', 'VBD', set()), ('he', 'PRP', set()), ('is', 'VBZ', set()),
+                         ('going', 'VBG', set()), ('to', 'TO', set()), ('leave', 'VB', set()), ('and', 'CC', set()),
+                         ('will', 'MD', set()), ('Going', 'VBG', set()), ('To', 'TO', set()), ('stay', 'VB', set())])
+
+    def testTense(self):
+        table = VerbTable.of(self._sent())
+        self.assertEquals(table.tense(0, 3), ('said', 'VBD'))
+        self.assertEquals(table.tense(0, 4), ('going_to', 'MD'))
+        self.assertEquals(table.tense(4, 8), (None, None))
+        self.assertEquals(table.tense(6, 9), ('will', 'MD'))
+        self.assertEquals(table.tense(4, 9), ('going_to', 'MD'))
+        self.assertEquals(table.tense(8, 10), ('will', 'MD'))
+        self.assertEquals(table.tense(8), ('going_to', 'MD'))
+        self.assertEquals(table.tense(), ('going_to', 'MD'))
+
+    def testSlices(self):
+        sent = self._sent()
+        table = VerbTable.of(sent)
+        self.assertTrue(VerbTable.of(sent) is table)
+        self.assertEquals(VerbTable.of(sent[6:10]).tense(), ('will', 'MD'))
+        self.assertEquals(VerbTable.of(sent[4:11]).tense(), ('going_to', 'MD'))
+        self.assertEquals(VerbTable.of(sent[4:11]).tense(1, 5), ('will', 'MD'))
+        self.assertEquals(VerbTable.of(sent[:3]).tense(2), (None, None))
+
+    def testSameAsTokens(self):
+        sent = self._sent()
+        VerbTable.of(sent)
+        for start in range(len(sent)):
+            for stop in range(start, len(sent) + 1):
+                self.assertEquals(VerbTable.of(sent[start:stop]).tense(), VerbTable.of(list(sent[start:stop])).tense())
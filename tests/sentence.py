@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+
+import copy
+import pickle
+import unittest
+from ternip.sentence import Sentence, copy_sents
+from ternip.rule_engine.sentence_text import SentenceText
+from ternip.timex import Timex
+
+class SentenceTest(unittest.TestCase):
+
+    def _sent(self):
+        return Sentence([('We', 'PRP', set()), ('met', 'VBD', set()), ('last', 'JJ', set()), ('week', 'NN', set())])
+
+    def _words(self):
+        return Sentence.from_words([('We', 'PRP'), ('met', 'VBD'), ('last', 'JJ'), ('week', 'NN')])
+
+    def testEqualsList(self):
+        self.assertEquals(self._sent(), [('We', 'PRP', set()), ('met', 'VBD', set()), ('last', 'JJ', set()), ('week', 'NN', set())])
+
+    def testRenderingCached(self):
+        sent = self._sent()
+        text = SentenceText.of(sent)
+        self.assertEquals(text.text, '<We~PRP><met~VBD><last~JJ><week~NN>')
+        self.assertTrue(SentenceText.of(sent) is text)
+
+    def testRenderingNotCachedForLists(self):
+        sent = list(self._sent())
+        self.assertEquals(SentenceText.of(sent).text, '<We~PRP><met~VBD><last~JJ><week~NN>')
+        self.assertFalse(SentenceText.of(sent) is SentenceText.of(sent))
+
+    def testSliceCutFromParent(self):
+        sent = self._sent()
+        SentenceText.of(sent)
+        self.assertEquals(SentenceText.of(sent[2:]).text, '<last~JJ><week~NN>')
+        self.assertEquals(SentenceText.of(sent[:0]).text, '')
+        self.assertEquals(SentenceText.of(sent[-3:-1]).text, '<met~VBD><last~JJ>')
+
+    def testSliceJoinedBackTogether(self):
+        sent = self._sent()
+        SentenceText.of(sent)
+        joined = sent[:1] + sent[1:3] + sent[3:]
+        self.assertEquals(joined, sent)
+        self.assertEquals(SentenceText.of(joined).text, '<We~PRP><met~VBD><last~JJ><week~NN>')
+
+    def testTimexChangeKeepsRendering(self):
+        sent = self._sent()
+        text = SentenceText.of(sent)
+        sent[3][2].add(1)
+        sent[2] = ('last', 'JJ', set([1]))
+        self.assertTrue(SentenceText.of(sent) is text)
+
+    def testTokenChangeInvalidates(self):
+        sent = self._sent()
+        SentenceText.of(sent)
+        sent[3] = ('month', 'NN', set())
+        self.assertEquals(SentenceText.of(sent).text, '<We~PRP><met~VBD><last~JJ><month~NN>')
+        sent.append(('.', '.', set()))
+        self.assertEquals(SentenceText.of(sent).text, '<We~PRP><met~VBD><last~JJ><month~NN><.~.>')
+        del sent[0]
+        self.assertEquals(SentenceText.of(sent).text, '<met~VBD><last~JJ><month~NN><.~.>')
+
+    def testSliceOfChangedSentence(self):
+        sent = self._sent()
+        SentenceText.of(sent)
+        before = sent[2:]
+        sent[3] = ('month', 'NN', set())
+        self.assertEquals(SentenceText.of(before).text, '<last~JJ><week~NN>')
+        self.assertEquals(SentenceText.of(sent[2:]).text, '<last~JJ><month~NN>')
+
+    def testDeepCopyDropsRendering(self):
+        sent = self._sent()
+        SentenceText.of(sent)
+        c = copy.deepcopy(sent)
+        self.assertEquals(c, sent)
+        self.assertEquals(c._cache, None)
+
+    def testTokenSpan(self):
+        text = SentenceText.of(self._sent())
+        self.assertEquals(len(text), 4)
+        self.assertEquals(text.token_offset(2), 17)
+        self.assertEquals(text.token_offset(4), len(text.text))
+        self.assertEquals(text.token_span(17, len(text.text)), (2, 4))
+        self.assertEquals(text.token_index(18), 3)
+
+    def testTokenSpanWithAngleBrackets(self):
+        text = SentenceText.of(Sentence([('<', 'SYM', set()), ('a<b', 'SYM', set()), ('now', 'RB', set())]))
+        self.assertEquals(text.text, '<<~SYM><a<b~SYM><now~RB>')
+        self.assertEquals(text.token_span(text.text.index('<now'), len(text.text)), (2, 3))
+
+    def testDeliminatedOffsets(self):
+        text = SentenceText.of(Sentence([('in', 'IN', set()), ('two', 'CD', set()), ('days', 'NNS', set())]))
+        deliminated = text.deliminated
+        self.assertEquals(deliminated.text, '<in~IN>NUM_START<two~CD>NUM_END<days~NNS>')
+        self.assertEquals(deliminated.token_offset(1), len('<in~IN>NUM_START'))
+        self.assertEquals(deliminated.token_span(deliminated.text.index('NUM_START'), deliminated.text.index('<days')), (1, 2))
+
+    def testDeliminatedWithoutNumbers(self):
+        text = SentenceText.of(self._sent())
+        self.assertTrue(text.deliminated is text)
+
+    def testColumns(self):
+        sent = Sentence.from_words([('We', 'PRP'), ('met', 'VBD')])
+        self.assertEquals(sent, [('We', 'PRP', set()), ('met', 'VBD', set())])
+        self.assertEquals(sent.words(), [('We', 'PRP'), ('met', 'VBD')])
+        self.assertTrue(sent[0][0] is Sentence.from_words([('W' + 'e', 'PRP')])[0][0])
+        self.assertEquals(sent._timexes, {})
+
+    def testTimexesAdded(self):
+        sent = self._words()
+        sent[2][2].add(1)
+        sent[3][2].update([1, 2])
+        self.assertEquals([ts for (tok, pos, ts) in sent], [set(), set(), set([1]), set([1, 2])])
+        self.assertTrue(sent[2][2] is sent[2][2])
+        self.assertEquals(sent.timexes(), set([1, 2]))
+        self.assertEquals(sorted(sent._timexes), [2, 3])
+
+    def testSliceSharesTimexes(self):
+        sent = self._words()
+        after = sent[2:]
+        after[0][2].add(1)
+        sent[3][2].add(2)
+        self.assertEquals(sent[2][2], set([1]))
+        self.assertEquals(after[1][2], set([2]))
+
+        # until the tokens change
+        before = sent[:2]
+        sent.append(('.', '.', set()))
+        after[0][2].add(3)
+        self.assertEquals(sent[2][2], set([1, 3]))
+        before[0][2].add(4)
+        self.assertEquals(sent[0][2], set())
+        self.assertEquals(repr(sent[0][2]), 'set([])')
+
+    def testTokensMoved(self):
+        sent = self._sent()
+        sent[2][2].add(1)
+        sent.insert(0, ('So', 'RB', set([2])))
+        self.assertEquals([len(ts) for (tok, pos, ts) in sent], [1, 0, 0, 1, 0])
+        del sent[1]
+        self.assertEquals(sent.pop(), ('week', 'NN', set()))
+        self.assertEquals(sent, [('So', 'RB', set([2])), ('met', 'VBD', set()), ('last', 'JJ', set([1]))])
+        sent[2] = ('last', 'JJ', set())
+        self.assertEquals(sent.timexes(), set([2]))
+
+    def testPickle(self):
+        sent = self._sent()
+        sent[1][2].add('t')
+        self.assertEquals(pickle.loads(pickle.dumps(sent)), sent)
+        c = copy.deepcopy(sent)
+        self.assertEquals(type(c[1][2]), set)
+        self.assertEquals(c[3][2], set())
+
+    def testSharesGivenTimexes(self):
+        # As with a list of tuples, timexes added to the sentence or its
+        # slices are added to the sets it was given
+        toks = [('We', 'PRP', set()), ('met', 'VBD', set()), ('last', 'JJ', set()), ('week', 'NN', set())]
+        sent = Sentence(toks)
+        sent[2][2].add(1)
+        sent[2:][1][2].add(1)
+        sent.append(('.', '.', set()))
+        sent[:1][0][2].add(2)
+        self.assertEquals([ts for (tok, pos, ts) in toks], [set([2]), set(), set([1]), set([1])])
+        self.assertTrue(all(sent[i][2] is toks[i][2] for i in range(len(toks))))
+
+    def testSpans(self):
+        sent = self._sent()
+        for i in range(1, 4):
+            sent[i][2].add('a')
+        sent[3][2].add('b')
+        self.assertEquals(sent.spans(), {'a': (1, 4), 'b': (3, 4)})
+        self.assertEquals(sent[2:].spans(), {'a': (0, 2), 'b': (1, 2)})
+        self.assertEquals(Sentence().spans(), {})
+        sent[2][2].discard('a')
+        self.assertEquals(sent.spans(), {'a': (1, 4), 'b': (3, 4)})
+
+    def testSpansOfSlice(self):
+        sent = self._sent()
+        after = sent[1:]
+        sent[2][2].add('a')
+        self.assertEquals(after.spans(), {'a': (1, 2)})
+        self.assertEquals(after[1:][:1].timexes(), set(['a']))
+
+
+    def testDeepCopySharesColumns(self):
+        sent = self._sent()
+        sent[2][2].add('a')
+        c = copy.deepcopy(sent)
+        self.assertTrue(c._tokens is sent._tokens)
+        c[0] = ('They', 'PRP', set())
+        c[2][2].add('b')
+        self.assertEquals(sent, [('We', 'PRP', set()), ('met', 'VBD', set()), ('last', 'JJ', set(['a'])), ('week', 'NN', set())])
+        sent.append(('.', '.', set()))
+        self.assertEquals(c, [('They', 'PRP', set()), ('met', 'VBD', set()), ('last', 'JJ', set(['a', 'b'])), ('week', 'NN', set())])
+
+    def testCopySents(self):
+        sent = self._sent()
+        anchor = Timex(type='date')
+        sent[2][2].add(anchor)
+        t = Timex(type='date')
+        t.context = anchor
+        sents = copy_sents([[('then', 'RB', set([t]))], sent[1:]])
+        self.assertTrue(isinstance(sents[0], Sentence))
+        (copied,) = sents[0].timexes()
+        self.assertFalse(copied is t)
+        self.assertTrue(copied.context is sents[1][1][2].pop())
+        self.assertFalse(copied.context is anchor)
@@ -1,5 +1,7 @@
 #!/usr/bin/env python
 
+import copy
+import pickle
 import unittest
 from ternip.timex import Timex, add_timex_ids
 
@@ -67,4 +69,19 @@ class TimexTest(unittest.TestCase):
         self.assertTrue(1 in tids)
         self.assertTrue(2 in tids)
         self.assertTrue(3 in tids)
-        self.assertTrue(4 in tids)
\ No newline at end of file
+        self.assertTrue(4 in tids)
+    
+    def test_copy(self):
+        t = Timex(type='date', value='2010')
+        t.context = Timex(type='time')
+        for c in [copy.deepcopy(t), pickle.loads(pickle.dumps(t)), pickle.loads(pickle.dumps(t, 2))]:
+            self.assertEquals((c.type, c.value, c.context.type, c.non_consuming), ('date', '2010', 'time', False))
+    
+    def test_other_attributes(self):
+        t = Timex()
+        t.granuality = '1D'
+        t.non_specific = True
+        c = copy.deepcopy(t)
+        self.assertEquals((c.granuality, c.non_specific), ('1D', True))
+        self.assertRaises(AttributeError, setattr, t, 'granularity', '1D')
+